@@ -31,8 +31,8 @@ def run_dashboard(host: str = "0.0.0.0", port: int = 5001, debug: bool = True):
     run_server(host=host, port=port, debug=debug)
 
 
-def run_training(model_type: str = "high_value"):
-    """运行模型训练"""
+def run_training(model_type: str = "high_value", chunksize: int = None):
+    """运行模型训练（指定 chunksize 时分块读取数据，适用于超过内存的数据量）"""
     from src.data import DataLoader
     from src.models import HighValuePredictor, CustomerClustering
     
@@ -43,9 +43,12 @@ def run_training(model_type: str = "high_value"):
     if model_type == "high_value":
         # 高价值客户预测模型
         predictor = HighValuePredictor()
-        df = loader.load_merged_data()
-        X, y = predictor.prepare_data(df)
-        metrics = predictor.fit(X, y)
+        if chunksize:
+            metrics = predictor.fit_chunked(loader.iter_merged_chunks(chunksize=chunksize))
+        else:
+            df = loader.load_merged_data()
+            X, y = predictor.prepare_data(df)
+            metrics = predictor.fit(X, y)
         
         print("\n训练完成！评估指标:")
         for k, v in metrics.items():
@@ -58,9 +61,14 @@ def run_training(model_type: str = "high_value"):
     elif model_type == "clustering":
         # 客户分群模型
         clustering = CustomerClustering()
-        df = loader.load_merged_data()
-        X = clustering.prepare_data(df)
-        metrics = clustering.fit(X)
+        if chunksize:
+            metrics = clustering.fit_streaming(
+                lambda: loader.iter_merged_chunks(chunksize=chunksize)
+            )
+        else:
+            df = loader.load_merged_data()
+            X = clustering.prepare_data(df)
+            metrics = clustering.fit(X)
         
         print("\n训练完成！评估指标:")
         for k, v in metrics.items():
@@ -69,6 +77,10 @@ def run_training(model_type: str = "high_value"):
         # 保存模型
         path = clustering.save()
         print(f"\n模型已保存到: {path}")
+        
+        # 导出在线分群分配器
+        assigner_path = clustering.export_assigner()
+        print(f"分群分配器已导出到: {assigner_path}")
 
 
 def run_analysis(analysis_type: str = "association"):
@@ -125,6 +137,7 @@ def main():
   python main.py dashboard                 # 启动可视化大屏
   python main.py train --model high_value  # 训练高价值预测模型
   python main.py train --model clustering  # 训练客户分群模型
+  python main.py train --model clustering --chunksize 200000  # 流式训练客户分群模型
   python main.py analyze --type association # 执行产品关联分析
   python main.py analyze --type trend       # 执行资产趋势分析
         """
@@ -164,6 +177,10 @@ def main():
         "--model", choices=["high_value", "clustering"], default="high_value",
         help="模型类型"
     )
+    train_parser.add_argument(
+        "--chunksize", type=int, default=None,
+        help="分块训练的每块行数（数据超过内存时使用）"
+    )
     
     # 数据分析命令
     analyze_parser = subparsers.add_parser("analyze", help="执行数据分析")
@@ -179,7 +196,7 @@ def main():
     elif args.command == "dashboard":
         run_dashboard(host=args.host, port=args.port, debug=not args.no_debug)
     elif args.command == "train":
-        run_training(model_type=args.model)
+        run_training(model_type=args.model, chunksize=args.chunksize)
     elif args.command == "analyze":
         run_analysis(analysis_type=args.type)
     else:
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+客户预测解释索引生成脚本（每晚更新）
+
+使用示例:
+    python scripts/build_explanations.py
+    python scripts/build_explanations.py --top-n 5 --chunksize 200000
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.data import DataLoader
+from src.models import HighValuePredictor
+from src.analysis import ModelExplainer
+from src.analysis.explainer import model_version
+from src.serving import ExplanationStore
+from src.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="客户预测解释索引生成")
+    parser.add_argument("--top-n", type=int, default=settings.EXPLANATION_TOP_N, help="每位客户保存的影响因素数")
+    parser.add_argument("--chunksize", type=int, default=100000, help="每块计算的行数")
+    parser.add_argument(
+        "--output", type=Path, default=settings.MODEL_DIR / "customer_explanations.npz",
+        help="索引文件路径"
+    )
+    args = parser.parse_args()
+    
+    print("=" * 60)
+    print("客户预测解释索引生成")
+    print("=" * 60)
+    
+    # 1. 加载模型（TreeExplainer 只构建一次，各数据块复用）
+    print("\n🔧 加载模型...")
+    predictor = HighValuePredictor().load_model()
+    explainer = ModelExplainer(predictor.model, predictor.feature_names).create_explainer()
+    version = model_version(predictor.model, predictor.calibration_state())
+    print(f"   特征数: {len(predictor.feature_names)}")
+    print(f"   模型版本: {version}")
+    
+    # 2. 分块计算 SHAP，每块只保留 Top-N 影响因素
+    print(f"\n🚀 分块计算 SHAP (Top {args.top_n})...")
+    ids, feature_idx, shap_values, scores = [], [], [], []
+    for chunk in DataLoader().iter_merged_chunks(chunksize=args.chunksize):
+        df = predictor.feature_engineer.create_high_value_features(chunk)
+        X = df.reindex(columns=predictor.feature_names).fillna(0)
+        
+        explainer.explain(X)
+        idx, vals = explainer.top_factors(args.top_n)
+        
+        ids.append(df["customer_id"].to_numpy())
+        feature_idx.append(idx)
+        shap_values.append(vals)
+        scores.append(predictor.predict_proba(X))
+        print(f"   已处理: {sum(len(block) for block in ids)} 位客户")
+    
+    if not ids:
+        raise ValueError("没有读取到任何数据块")
+    
+    # 3. 保存索引（同一客户出现在多行时保留最后一行）
+    print("\n💾 保存结果...")
+    store = ExplanationStore(
+        np.concatenate(ids),
+        np.concatenate(feature_idx),
+        np.concatenate(shap_values),
+        predictor.feature_names,
+        scores=np.concatenate(scores),
+        model_version=version
+    )
+    print(f"   索引文件: {store.save(args.output)}")
+    
+    print("\n✅ 索引生成完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
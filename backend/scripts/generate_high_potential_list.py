@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+高潜力客户名单生成脚本（每日更新）
+
+使用示例:
+    python scripts/generate_high_potential_list.py
+    python scripts/generate_high_potential_list.py --top-k 50000 --chunksize 200000
+"""
+
+import sys
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.data import DataLoader
+from src.models import HighValuePredictor
+from src.config import settings
+
+
+def find_previous_list(output_dir: Path, today: str):
+    """查找今天之前最近一期名单"""
+    candidates = sorted(
+        p for p in output_dir.glob("high_potential_list_*.csv")
+        if p.stem.rsplit("_", 1)[-1] < today
+    )
+    return candidates[-1] if candidates else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="高潜力客户名单生成")
+    parser.add_argument("--top-k", type=int, default=50000, help="名单容量")
+    parser.add_argument("--chunksize", type=int, default=100000, help="每块打分行数")
+    args = parser.parse_args()
+    
+    today = datetime.now().strftime("%Y%m%d")
+    output_dir = settings.OUTPUT_DIR / "reports"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    print("=" * 60)
+    print("高潜力客户名单生成")
+    print("=" * 60)
+    
+    # 1. 加载模型
+    print("\n🔧 加载模型...")
+    predictor = HighValuePredictor().load_model()
+    print(f"   特征数: {len(predictor.feature_names)}")
+    
+    # 2. 分块打分并选出 Top-K
+    print(f"\n🚀 分块打分 (Top {args.top_k})...")
+    loader = DataLoader()
+    ranked = predictor.rank_top_k(
+        loader.iter_merged_chunks(chunksize=args.chunksize),
+        k=args.top_k,
+        attributes=loader.load_customer_base(),
+    )
+    print(f"   入选客户: {len(ranked)}")
+    
+    # 3. 与上期名单对比
+    print("\n🔄 对比上期名单...")
+    previous_path = find_previous_list(output_dir, today)
+    previous = pd.read_csv(previous_path, encoding="utf-8-sig") if previous_path else None
+    diff = predictor.diff_top_k(ranked, previous)
+    for status, count in diff["status"].value_counts().items():
+        print(f"   {status}: {count}")
+    
+    # 4. 保存结果
+    print("\n💾 保存结果...")
+    list_path = output_dir / f"high_potential_list_{today}.csv"
+    diff_path = output_dir / f"high_potential_diff_{today}.csv"
+    ranked.to_csv(list_path, index=False, encoding="utf-8-sig")
+    diff.to_csv(diff_path, index=False, encoding="utf-8-sig")
+    print(f"   名单文件: {list_path}")
+    print(f"   变化文件: {diff_path}")
+    
+    print("\n✅ 名单生成完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,9 @@
 使用示例:
     python scripts/run_association.py
     python scripts/run_association.py --min-support 0.1
+    python scripts/run_association.py --engine fpgrowth
+    python scripts/run_association.py --partition 2026-10-19 --window 7
+    python scripts/run_association.py --transactions BreadBasket_DMS.csv --min-support 0.02
 """
 
 import sys
@@ -16,18 +19,145 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.data import DataLoader
-from src.analysis import ProductAssociationAnalyzer
+from src.analysis import ProductAssociationAnalyzer, SlidingWindowMiner, TransactionMiner
 from src.config import settings
 
 
+def run_transaction_mining(args) -> None:
+    """交易明细购物篮分析（Transaction, Item 两列）"""
+    engine = "eclat" if args.engine == "auto" else args.engine
+    
+    print("=" * 60)
+    print(f"交易购物篮分析 ({engine})")
+    print("=" * 60)
+    
+    # 1. 流式读取交易明细并构建稀疏交易矩阵
+    print(f"\n📊 读取交易明细 (每块 {args.chunksize} 行)...")
+    miner = TransactionMiner(
+        min_support=args.min_support,
+        min_lift=args.min_lift,
+        engine=engine
+    )
+    matrix = miner.fit_chunks(
+        DataLoader().iter_csv_chunks(
+            args.transactions,
+            chunksize=args.chunksize,
+            usecols=[miner.transaction_col, miner.item_col]
+        )
+    )
+    print(f"   交易数: {matrix.shape[0]}, 商品数: {matrix.shape[1]}, 明细数: {matrix.nnz}")
+    
+    # 2. 挖掘频繁项集与规则
+    print("\n🚀 执行关联分析...")
+    itemsets = miner.find_frequent_itemsets()
+    miner.generate_rules()
+    
+    print("\n📦 频繁商品组合:")
+    print("-" * 50)
+    for _, row in itemsets.head(10).iterrows():
+        print(f"   {row['products']:30s} 支持度: {row['support']:.2%}")
+    
+    print("\n🔗 关联规则 Top 10:")
+    print("-" * 70)
+    for _, row in miner.get_top_rules(10).iterrows():
+        print(f"   {row['rule']:40s}")
+        print(f"      置信度: {row['confidence']:.2%}  提升度: {row['lift']:.2f}")
+    
+    # 3. 保存结果
+    print("\n💾 保存结果...")
+    paths = miner.save_results(prefix="transaction_")
+    print(f"   频繁项集: {paths[0]}")
+    print(f"   关联规则: {paths[1]}")
+    
+    print("\n✅ 分析完成！")
+    print("=" * 60)
+
+
+def run_window_mining(args) -> None:
+    """滑动窗口增量关联分析：本次数据作为一个分区加入窗口，只用累计计数刷新规则"""
+    print("=" * 60)
+    print(f"产品关联分析 (滑动窗口, 分区 {args.partition})")
+    print("=" * 60)
+    
+    miner = SlidingWindowMiner(
+        min_support=args.min_support,
+        min_lift=args.min_lift,
+        window=args.window
+    )
+    state_path = settings.MODEL_DIR / "association_window.npz"
+    if state_path.exists():
+        miner.load_state(state_path)
+        print(f"\n📂 已加载窗口状态: {list(miner.partitions)}")
+    
+    # 1. 加入新分区
+    print("\n📊 加载本期数据...")
+    df = DataLoader().load_merged_data()
+    print(f"   数据量: {len(df)} 条记录")
+    expired = miner.add_partition(args.partition, df)
+    print(f"   窗口分区: {list(miner.partitions)}")
+    if expired:
+        print(f"   过期分区: {expired}")
+    
+    # 2. 刷新频繁项集与规则
+    print("\n🚀 刷新关联规则...")
+    itemsets, _ = miner.refresh()
+    
+    print("\n📦 频繁产品组合:")
+    print("-" * 50)
+    for _, row in itemsets.head(10).iterrows():
+        print(f"   {row['products']:30s} 支持度: {row['support']:.2%}")
+    
+    print("\n🔗 关联规则 Top 10:")
+    print("-" * 70)
+    for _, row in miner.get_top_rules(10).iterrows():
+        print(f"   {row['rule']:40s}")
+        print(f"      置信度: {row['confidence']:.2%}  提升度: {row['lift']:.2f}")
+    
+    # 3. 保存结果与窗口状态
+    print("\n💾 保存结果...")
+    paths = miner.save_results()
+    print(f"   频繁项集: {paths[0]}")
+    print(f"   关联规则: {paths[1]}")
+    print(f"   规则索引: {miner.export_rule_index()}")
+    print(f"   窗口状态: {miner.save_state(state_path)}")
+    
+    print("\n✅ 分析完成！")
+    print("=" * 60)
+
+
 def main():
     parser = argparse.ArgumentParser(description="产品关联分析")
     parser.add_argument("--min-support", type=float, default=0.05, help="最小支持度")
     parser.add_argument("--min-lift", type=float, default=1.0, help="最小提升度")
+    parser.add_argument(
+        "--engine",
+        choices=ProductAssociationAnalyzer.ENGINES + ("eclat",),
+        default="auto",
+        help="挖掘引擎: auto(产品数少时用位掩码精确计数) / bitmask / apriori / fpgrowth；"
+             "交易明细模式可选 eclat(默认) / fpgrowth"
+    )
+    parser.add_argument(
+        "--transactions", type=str, default=None,
+        help="交易明细 CSV 文件名（相对 data 目录，含 Transaction、Item 列），指定后按交易挖掘商品组合"
+    )
+    parser.add_argument("--chunksize", type=int, default=1000000, help="交易明细每块读取行数")
+    parser.add_argument(
+        "--partition", type=str, default=None,
+        help="滑动窗口模式：将本次数据作为该时间分区加入窗口（如 2026-10-19），只刷新累计计数"
+    )
+    parser.add_argument("--window", type=int, default=7, help="滑动窗口保留的分区数")
     args = parser.parse_args()
     
+    if args.transactions:
+        run_transaction_mining(args)
+        return
+    
+    if args.partition:
+        run_window_mining(args)
+        return
+    
     print("=" * 60)
-    print("产品关联分析 (Apriori)")
+    print(f"产品关联分析 ({args.engine})")
     print("=" * 60)
     
     # 1. 加载数据
@@ -42,7 +172,8 @@ def main():
     print(f"   最小提升度: {args.min_lift}")
     analyzer = ProductAssociationAnalyzer(
         min_support=args.min_support,
-        min_lift=args.min_lift
+        min_lift=args.min_lift,
+        engine=args.engine
     )
     
     # 3. 执行分析
@@ -80,6 +211,7 @@ def main():
     paths = analyzer.save_results()
     print(f"   频繁项集: {paths[0]}")
     print(f"   关联规则: {paths[1]}")
+    print(f"   规则索引: {analyzer.export_rule_index()}")
     
     print("\n✅ 分析完成！")
     print("=" * 60)
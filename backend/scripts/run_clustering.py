@@ -6,6 +6,7 @@
 使用示例:
     python scripts/run_clustering.py
     python scripts/run_clustering.py --n-clusters 5
+    python scripts/run_clustering.py --incremental
 """
 
 import sys
@@ -24,6 +25,10 @@ from src.config import settings
 def main():
     parser = argparse.ArgumentParser(description="客户分群分析")
     parser.add_argument("--n-clusters", type=int, default=3, help="聚类数量")
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="基于上次保存的模型和快照增量分群，只输出群组变化的客户"
+    )
     args = parser.parse_args()
     
     print("=" * 60)
@@ -37,8 +42,19 @@ def main():
     print(f"   数据量: {len(df)} 条记录")
     
     # 2. 初始化模型
-    print(f"\n🔧 初始化聚类模型 (K={args.n_clusters})...")
     clustering = CustomerClustering(n_clusters=args.n_clusters)
+    snapshot_path = settings.MODEL_DIR / f"{clustering.name}_snapshot.pkl"
+    incremental = args.incremental and snapshot_path.exists()
+    if args.incremental and not incremental:
+        print("\n⚠️  未找到上次的分群快照，改为全量分群")
+    
+    if incremental:
+        print("\n🔧 加载上次的聚类模型和快照...")
+        clustering.load()
+        snapshot = clustering.load_snapshot()
+        args.n_clusters = clustering.n_clusters
+    else:
+        print(f"\n🔧 初始化聚类模型 (K={args.n_clusters})...")
     
     # 3. 准备数据
     print("\n🔄 准备聚类数据...")
@@ -46,11 +62,30 @@ def main():
     print(f"   使用特征: {clustering.features}")
     
     # 4. 训练模型
-    print("\n🚀 执行聚类...")
-    metrics = clustering.fit(X)
-    
-    # 5. 预测并添加标签
-    df["cluster"] = clustering.predict(X)
+    if incremental:
+        print("\n🚀 执行增量分群...")
+        delta, snapshot = clustering.fit_incremental(X, df["customer_id"], snapshot)
+        stats = clustering.metadata["incremental"]
+        print(f"   模式: {stats['mode']}, 变动客户: {stats['n_changed']}, "
+              f"新增: {stats['n_new']}, 移除: {stats['n_removed']}")
+        print(f"   群组变化客户: {len(delta)}")
+        
+        delta_path = settings.OUTPUT_DIR / "reports" / "customer_clusters_delta.csv"
+        delta_path.parent.mkdir(parents=True, exist_ok=True)
+        delta.to_csv(delta_path, index=False, encoding="utf-8-sig")
+        print(f"   变化明细: {delta_path}")
+        
+        metrics = clustering.evaluate(
+            clustering.scaler.transform(X), labels=snapshot["cluster"].to_numpy()
+        )
+        df["cluster"] = snapshot["cluster"].to_numpy()
+    else:
+        print("\n🚀 执行聚类...")
+        metrics = clustering.fit(X)
+        
+        # 5. 预测并添加标签
+        df["cluster"] = clustering.predict(X)
+        snapshot = clustering.build_snapshot(X, df["customer_id"], labels=df["cluster"].to_numpy())
     
     # 6. 输出评估结果
     print("\n📈 聚类评估结果:")
@@ -58,41 +93,49 @@ def main():
     for metric, value in metrics.items():
         print(f"   {metric:25s}: {value:.4f}")
     
-    # 7. 各群组统计
+    # 7. 各群组统计（一次计算全部画像，并随模型缓存）
+    profile_df = clustering.feature_engineer.create_clustering_features(df)
+    profiles = clustering.get_cluster_profiles(profile_df)
+    
     print("\n👥 各群组客户数:")
     print("-" * 40)
-    for cluster_id in range(args.n_clusters):
-        count = (df["cluster"] == cluster_id).sum()
-        pct = count / len(df) * 100
-        label = clustering.CLUSTER_LABELS.get(cluster_id, f"群组{cluster_id}")
-        print(f"   {label}: {count} ({pct:.1f}%)")
+    for profile in profiles.values():
+        print(f"   {profile['label']}: {profile['count']} ({profile['percentage']:.1f}%)")
     
     # 8. 各群组特征均值
     print("\n📊 各群组特征均值:")
     print("-" * 40)
-    summary = df.groupby("cluster")[clustering.features].mean()
+    summary = clustering.profile().numeric.xs("mean", axis=1, level=1)[clustering.features]
     print(summary.round(2).to_string())
     
     # 9. 保存结果
     print("\n💾 保存结果...")
     output_path = settings.OUTPUT_DIR / "reports" / "customer_clusters.csv"
     output_path.parent.mkdir(parents=True, exist_ok=True)
-    df[["customer_id"] + clustering.features + ["cluster"]].to_csv(
+    profile_df[["customer_id"] + clustering.features + ["cluster"]].to_csv(
         output_path, index=False, encoding="utf-8-sig"
     )
     print(f"   结果文件: {output_path}")
     
+    profile_path = settings.OUTPUT_DIR / "reports" / "customer_cluster_profiles.csv"
+    clustering.profile().to_frame().to_csv(profile_path, encoding="utf-8-sig")
+    print(f"   群组画像: {profile_path}")
+    
+    # 保存模型（含群组画像）和快照，作为下次增量分群的基准；
+    # 同时导出 /api/segment 使用的分群分配器，与保存的模型保持一致
+    clustering.save()
+    clustering.save_snapshot(snapshot)
+    print(f"   分群分配器: {clustering.export_assigner()}")
+    
     # 10. 生成可视化图表
     print("\n📊 生成可视化图表...")
     chart = ChartGenerator()
     
-    # PCA 降维可视化
-    X_pca = clustering.get_pca_coordinates(X)
-    df["pca_1"] = X_pca[:, 0]
-    df["pca_2"] = X_pca[:, 1]
+    # PCA 降维可视化（使用训练时缓存的分层抽样坐标）
+    projection = clustering.get_projection_sample()
     
     _, chart_path = chart.cluster_scatter(
-        df, "pca_1", "pca_2",
+        projection, "pca_1", "pca_2",
         cluster_col="cluster",
         title="客户聚类分布 (PCA降维)"
     )
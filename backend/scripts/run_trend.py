@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+资产趋势预测脚本
+
+使用示例:
+    python scripts/run_trend.py
+    python scripts/run_trend.py --segments
+    python scripts/run_trend.py --segments --group-by branch_name customer_tier --jobs 8 --timeout 20
+    python scripts/run_trend.py --segments --auto-order --criterion bic
+    python scripts/run_trend.py --segments --engine holt
+    python scripts/run_trend.py --segments --update
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.data import DataLoader
+from src.analysis import AssetTrendAnalyzer
+
+
+def build_analyzer(args) -> AssetTrendAnalyzer:
+    """按命令行参数创建分析器"""
+    return AssetTrendAnalyzer(
+        order="auto" if args.auto_order else (1, 1, 1),
+        forecast_periods=args.periods,
+        criterion=args.criterion
+    )
+
+
+def run_segment_forecast(args, df) -> None:
+    """分组批量预测"""
+    print(f"\n🚀 按 {' × '.join(args.group_by)} 分组批量预测...")
+    analyzer = build_analyzer(args)
+    if args.update:
+        # 沿用上次保存的拟合状态，只把新月份接到各序列之后
+        analyzer.load_segment_state()
+        forecasts = analyzer.update_segments(
+            df,
+            group_cols=args.group_by,
+            n_jobs=args.jobs,
+            timeout=args.timeout,
+            refit=args.refit
+        )
+    else:
+        forecasts = analyzer.forecast_segments(
+            df,
+            group_cols=args.group_by,
+            n_jobs=args.jobs,
+            timeout=args.timeout,
+            engine=args.engine
+        )
+    
+    n_series = len(forecasts) // args.periods
+    print(f"   序列数: {n_series}")
+    
+    print("\n📈 拟合状态:")
+    print("-" * 40)
+    status_counts = forecasts["status"].value_counts() // args.periods
+    for status, count in status_counts.items():
+        print(f"   {status:10s}: {count}")
+    
+    print("\n💾 保存结果...")
+    print(f"   分组预测: {analyzer.save_segment_forecasts()}")
+    if analyzer.segment_states:
+        print(f"   拟合状态: {analyzer.save_segment_state()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="资产趋势预测")
+    parser.add_argument("--periods", type=int, default=4, help="预测月数")
+    parser.add_argument("--segments", action="store_true", help="按分组批量预测")
+    parser.add_argument(
+        "--group-by", nargs="+", default=["branch_name", "customer_tier"],
+        help="分组列（--segments 模式）"
+    )
+    parser.add_argument(
+        "--engine", choices=AssetTrendAnalyzer.ENGINES, default="arima",
+        help="分组预测引擎: arima(逐条拟合) / ses / holt / seasonal_naive(向量化，一次预测全部分组)"
+    )
+    parser.add_argument(
+        "--update", action="store_true",
+        help="增量更新：加载上次的分组拟合状态，沿用参数只追加新月份（仅 arima 引擎，需配合 --segments）"
+    )
+    parser.add_argument("--refit", action="store_true", help="增量更新时以原参数为初值重新估计")
+    parser.add_argument("--jobs", type=int, default=None, help="并行进程数，默认使用全部 CPU")
+    parser.add_argument("--timeout", type=float, default=30.0, help="单条序列的拟合时限（秒）")
+    parser.add_argument(
+        "--auto-order", action="store_true",
+        help="按信息准则自动选择 ARIMA 阶数（结果缓存在 models/saved/arima_orders.json）"
+    )
+    parser.add_argument("--criterion", choices=AssetTrendAnalyzer.CRITERIA, default="aic", help="自动定阶的信息准则")
+    args = parser.parse_args()
+    
+    if args.update and not args.segments:
+        parser.error("--update 需要配合 --segments 使用")
+    if args.update and args.engine != "arima":
+        parser.error(f"--update 仅支持 arima 引擎，{args.engine} 引擎每次直接对全部分组重新预测")
+    
+    print("=" * 60)
+    print("资产趋势预测")
+    print("=" * 60)
+    
+    # 1. 加载数据
+    print("\n📊 加载数据...")
+    df = DataLoader().load_merged_data()
+    print(f"   数据量: {len(df)} 条记录")
+    
+    if args.segments:
+        run_segment_forecast(args, df)
+    else:
+        # 2. 整体趋势预测
+        print("\n🚀 执行趋势分析...")
+        analyzer = build_analyzer(args)
+        result = analyzer.analyze(df)
+        
+        print("\n📈 趋势分析结果:")
+        print("-" * 40)
+        print(f"   ARIMA 阶数: {analyzer.selected_order}")
+        for k, v in result["trend"].items():
+            print(f"   {k}: {v}")
+        
+        print("\n💾 保存结果...")
+        print(f"   趋势预测: {analyzer.save_results()}")
+    
+    print("\n✅ 分析完成！")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,13 @@
 使用示例:
     python scripts/train_high_value.py
     python scripts/train_high_value.py --data path/to/data.csv
+    python scripts/train_high_value.py --mode continue --rounds 20
+    python scripts/train_high_value.py --mode refit
+    python scripts/train_high_value.py --chunksize 200000
 """
 
 import sys
+import argparse
 from pathlib import Path
 
 # 添加项目根目录到路径
@@ -21,17 +25,25 @@ from src.config import settings
 
 
 def main():
+    parser = argparse.ArgumentParser(description="高价值客户预测模型训练")
+    parser.add_argument(
+        "--mode", choices=["full", "continue", "refit"], default="full",
+        help="训练方式: full(从头训练) / continue(追加轮数) / refit(仅更新叶子值)"
+    )
+    parser.add_argument("--rounds", type=int, default=20, help="continue 模式追加的轮数")
+    parser.add_argument(
+        "--chunksize", type=int, default=None,
+        help="分块训练的每块行数（数据超过内存时使用，仅 full 模式）"
+    )
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("高价值客户预测模型训练")
     print("=" * 60)
     
-    # 1. 加载数据
-    print("\n📊 加载数据...")
     loader = DataLoader()
-    df = loader.load_merged_data()
-    print(f"   数据量: {len(df)} 条记录")
     
-    # 2. 初始化模型
+    # 1. 初始化模型
     print("\n🔧 初始化模型...")
     predictor = HighValuePredictor(
         num_boost_round=100,
@@ -41,15 +53,31 @@ def main():
         }
     )
     
-    # 3. 准备数据
-    print("\n🔄 准备训练数据...")
-    X, y = predictor.prepare_data(df)
-    print(f"   特征数: {len(predictor.feature_names)}")
-    print(f"   正样本比例: {y.mean():.2%}")
-    
-    # 4. 训练模型
-    print("\n🚀 开始训练...")
-    metrics = predictor.fit(X, y, test_size=0.2)
+    if args.chunksize and args.mode == "full":
+        # 2. 分块训练
+        print(f"\n🚀 开始分块训练 (每块 {args.chunksize} 行)...")
+        metrics = predictor.fit_chunked(loader.iter_merged_chunks(chunksize=args.chunksize))
+        print(f"   训练集: {predictor.metadata['n_train']} 条, 验证集: {predictor.metadata['n_valid']} 条")
+    else:
+        # 2. 加载数据
+        print("\n📊 加载数据...")
+        df = loader.load_merged_data()
+        print(f"   数据量: {len(df)} 条记录")
+        
+        # 3. 准备数据
+        print("\n🔄 准备训练数据...")
+        X, y = predictor.prepare_data(df)
+        print(f"   特征数: {len(predictor.feature_names)}")
+        print(f"   正样本比例: {y.mean():.2%}")
+        
+        # 4. 训练模型
+        if args.mode == "full":
+            print("\n🚀 开始训练...")
+            metrics = predictor.fit(X, y, test_size=0.2)
+        else:
+            print(f"\n🚀 基于已有模型增量训练 ({args.mode})...")
+            predictor.load_model()
+            metrics = predictor.update(X, y, mode=args.mode, num_boost_round=args.rounds)
     
     # 5. 输出评估结果
     print("\n📈 模型评估结果:")
@@ -1,7 +1,24 @@
 # 分析模块
-from .association import ProductAssociationAnalyzer
-from .time_series import AssetTrendAnalyzer
-from .explainer import ModelExplainer
+from .association import ProductAssociationAnalyzer, SlidingWindowMiner, TransactionMiner
+from .time_series import (
+    AssetTrendAnalyzer,
+    VectorForecaster,
+    SESForecaster,
+    HoltForecaster,
+    SeasonalNaiveForecaster,
+)
+from .explainer import ModelExplainer, ExplanationService
 
-__all__ = ["ProductAssociationAnalyzer", "AssetTrendAnalyzer", "ModelExplainer"]
+__all__ = [
+    "ProductAssociationAnalyzer",
+    "SlidingWindowMiner",
+    "TransactionMiner",
+    "AssetTrendAnalyzer",
+    "VectorForecaster",
+    "SESForecaster",
+    "HoltForecaster",
+    "SeasonalNaiveForecaster",
+    "ModelExplainer",
+    "ExplanationService",
+]
 
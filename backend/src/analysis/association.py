@@ -1,14 +1,20 @@
 """
 产品关联分析模块
 使用 Apriori 算法挖掘产品组合模式
+产品数较少时用位掩码精确计数，产品数较多时对去重后的持有组合做加权 Apriori
+交易明细数据（Transaction, Item）使用稀疏矩阵 + Eclat / FP-Growth
 """
 
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional, Tuple
-from mlxtend.frequent_patterns import apriori, association_rules
+from pathlib import Path
+from scipy import sparse
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from mlxtend.frequent_patterns import apriori, fpgrowth
 
 from ..config import settings
 from ..data import FeatureEngineer
+from ..serving import RuleIndex
 
 
 class ProductAssociationAnalyzer:
@@ -26,16 +32,33 @@ class ProductAssociationAnalyzer:
         "insurance_flag": "保险",
     }
     
+    ENGINES = ("auto", "bitmask", "apriori", "fpgrowth")
+    
+    # 位掩码引擎的产品数上限（计数数组长度为 2^产品数）
+    MAX_BITMASK_ITEMS = 20
+    
+    # prepare_data 输出中记录每种持有组合人数的列
+    WEIGHT_COLUMN = "count"
+    
+    RULE_METRICS = ("support", "confidence", "lift", "leverage", "conviction", "zhangs_metric")
+    
     def __init__(
         self,
         min_support: float = None,
-        min_lift: float = None
+        min_lift: float = None,
+        engine: str = "auto"
     ):
+        if engine not in self.ENGINES:
+            raise ValueError(f"不支持的挖掘引擎: {engine}，可选 {self.ENGINES}")
+        
         self.min_support = min_support or settings.APRIORI_MIN_SUPPORT
         self.min_lift = min_lift or settings.APRIORI_MIN_LIFT
+        self.engine = engine
         self.feature_engineer = FeatureEngineer()
         self.frequent_itemsets: Optional[pd.DataFrame] = None
         self.rules: Optional[pd.DataFrame] = None
+        self.items: List[str] = []
+        self._rule_index: Optional[RuleIndex] = None
     
     def prepare_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -45,7 +68,7 @@ class ProductAssociationAnalyzer:
             df: 原始数据
         
         Returns:
-            产品持有矩阵（0/1）
+            去重后的产品持有组合（0/1），count 列为持有该组合的客户数
         """
         # 创建产品标志
         df = self.feature_engineer.create_product_flags(df)
@@ -53,9 +76,9 @@ class ProductAssociationAnalyzer:
         # 选择产品列
         available_cols = [col for col in self.PRODUCT_COLUMNS if col in df.columns]
         
-        # 创建购物篮矩阵
+        # 创建购物篮矩阵，并压缩为不重复的持有组合 + 人数（最多 2^产品数 行）
         basket = df[available_cols].fillna(0).astype(int)
-        basket = basket.drop_duplicates()
+        basket = basket.value_counts(sort=False).reset_index(name=self.WEIGHT_COLUMN)
         
         return basket
     
@@ -67,8 +90,12 @@ class ProductAssociationAnalyzer:
         """
         挖掘频繁项集
         
+        auto 引擎在产品数不超过位掩码上限时用位掩码精确计数，否则用 FP-Growth。
+        mlxtend 的 apriori / fpgrowth 不支持样本权重：含 count 列的加权持有组合
+        改用加权 Apriori 直接在去重后的组合上计数，结果与 mlxtend 在逐客户矩阵上一致。
+        
         Args:
-            basket: 产品持有矩阵
+            basket: 产品持有矩阵，含 count 列时按该列加权计算支持度
             min_support: 最小支持度
         
         Returns:
@@ -76,11 +103,29 @@ class ProductAssociationAnalyzer:
         """
         min_support = min_support or self.min_support
         
-        self.frequent_itemsets = apriori(
-            basket,
-            min_support=min_support,
-            use_colnames=True
-        )
+        weights = None
+        if self.WEIGHT_COLUMN in basket.columns:
+            weights = basket[self.WEIGHT_COLUMN].to_numpy()
+            basket = basket.drop(columns=self.WEIGHT_COLUMN)
+        self.items = list(basket.columns)
+        
+        engine = self.engine
+        if engine == "auto":
+            engine = "bitmask" if basket.shape[1] <= self.MAX_BITMASK_ITEMS else "fpgrowth"
+        
+        if engine == "bitmask":
+            self.frequent_itemsets = self._bitmask_itemsets(basket, min_support, weights)
+        elif weights is not None:
+            self.frequent_itemsets = _weighted_apriori(
+                basket.to_numpy(dtype=bool), weights, self.items, min_support
+            )
+        else:
+            miner = fpgrowth if engine == "fpgrowth" else apriori
+            self.frequent_itemsets = miner(
+                basket.astype(bool),
+                min_support=min_support,
+                use_colnames=True
+            )
         
         # 添加可读的产品名称
         self.frequent_itemsets["products"] = self.frequent_itemsets["itemsets"].apply(
@@ -89,19 +134,46 @@ class ProductAssociationAnalyzer:
         
         return self.frequent_itemsets.sort_values("support", ascending=False)
     
+    def _bitmask_itemsets(
+        self,
+        basket: pd.DataFrame,
+        min_support: float,
+        weights: Optional[np.ndarray] = None
+    ) -> pd.DataFrame:
+        """
+        位掩码精确计数
+        
+        每位客户的持有情况编码为一个整数掩码（第 j 位表示是否持有第 j 个产品），
+        一次 bincount 得到每种持有组合的人数；再做一次超集求和变换，
+        得到每个项集的支持人数 support[S] = Σ_{T ⊇ S} count[T]。
+        复杂度 O(n·m + m·2^m)，与 min_support 无关。
+        
+        Args:
+            basket: 产品持有矩阵
+            min_support: 最小支持度
+            weights: 每行的客户数（去重后的持有组合），默认每行 1 人
+        
+        Returns:
+            与 mlxtend 一致的频繁项集 DataFrame（support, itemsets）
+        """
+        counts = _pattern_counts(basket.to_numpy(dtype=bool), weights)
+        return _itemsets_from_pattern_counts(counts, list(basket.columns), min_support)
+    
     def generate_rules(
         self,
         frequent_itemsets: pd.DataFrame = None,
         metric: str = "lift",
-        min_threshold: float = None
+        min_threshold: float = None,
+        top_n_per_consequent: Optional[int] = None
     ) -> pd.DataFrame:
         """
         生成关联规则
         
         Args:
             frequent_itemsets: 频繁项集，默认使用已计算的
-            metric: 评估指标 ('lift', 'confidence', 'support')
+            metric: 评估指标 ('lift', 'confidence', 'support', 'leverage', 'conviction', 'zhangs_metric')
             min_threshold: 最小阈值
+            top_n_per_consequent: 每个后件只保留 metric 最高的 N 条规则（边生成边裁剪）
         
         Returns:
             关联规则 DataFrame
@@ -111,19 +183,19 @@ class ProductAssociationAnalyzer:
                 raise ValueError("请先调用 find_frequent_itemsets()")
             frequent_itemsets = self.frequent_itemsets
         
+        if metric not in self.RULE_METRICS:
+            raise ValueError(f"不支持的规则指标: {metric}，可选 {self.RULE_METRICS}")
+        
         min_threshold = min_threshold or self.min_lift
         
-        self.rules = association_rules(
+        self.rules = _generate_rules(
             frequent_itemsets,
             metric=metric,
-            min_threshold=min_threshold
-        )
-        
-        # 添加可读的规则描述
-        self.rules["rule"] = self.rules.apply(
-            lambda row: f"{self._format_itemset(row['antecedents'])} → {self._format_itemset(row['consequents'])}",
-            axis=1
+            min_threshold=min_threshold,
+            top_n_per_consequent=top_n_per_consequent,
+            format_itemset=self._format_itemset
         )
+        self._rule_index = None
         
         return self.rules.sort_values("lift", ascending=False)
     
@@ -178,36 +250,53 @@ class ProductAssociationAnalyzer:
         Returns:
             推荐产品列表
         """
+        return self.rule_index.recommend(current_products)
+    
+    @property
+    def rule_index(self) -> RuleIndex:
+        """按前件位掩码预编译的规则索引（规则重新生成后自动重建）"""
         if self.rules is None:
             raise ValueError("请先调用 analyze()")
         
-        recommendations = []
+        if self._rule_index is None:
+            items = self.items or sorted(
+                set().union(*self.rules["antecedents"], *self.rules["consequents"])
+            )
+            self._rule_index = RuleIndex.from_rules(self.rules, items, names=self.PRODUCT_NAMES)
+        return self._rule_index
+    
+    def recommend_batch(
+        self,
+        holdings: pd.DataFrame,
+        top_n: int = 3
+    ) -> pd.DataFrame:
+        """
+        批量产品推荐
         
-        for _, rule in self.rules.iterrows():
-            antecedents = set(rule["antecedents"])
-            consequents = set(rule["consequents"])
-            
-            # 如果当前产品包含前件，且不包含后件
-            if antecedents.issubset(set(current_products)):
-                new_products = consequents - set(current_products)
-                if new_products:
-                    for product in new_products:
-                        recommendations.append({
-                            "product": self.PRODUCT_NAMES.get(product, product),
-                            "confidence": rule["confidence"],
-                            "lift": rule["lift"],
-                            "reason": f"因为您持有 {self._format_itemset(antecedents)}"
-                        })
-        
-        # 按置信度排序并去重
-        seen = set()
-        unique_recs = []
-        for rec in sorted(recommendations, key=lambda x: -x["confidence"]):
-            if rec["product"] not in seen:
-                seen.add(rec["product"])
-                unique_recs.append(rec)
-        
-        return unique_recs
+        Args:
+            holdings: 客户产品持有矩阵（列为产品标志，0/1）
+            top_n: 每位客户推荐的产品数
+        
+        Returns:
+            与 holdings 行对应的推荐结果（product_i / confidence_i）
+        """
+        recommendations = self.rule_index.recommend_batch(holdings, top_n=top_n)
+        recommendations.index = holdings.index
+        return recommendations
+    
+    def export_rule_index(self, filepath: Optional[Path] = None) -> Path:
+        """
+        导出规则索引（供 Web 接口加载）
+        
+        Args:
+            filepath: 保存路径，默认保存到 models/saved 目录
+        
+        Returns:
+            保存的文件路径
+        """
+        if filepath is None:
+            filepath = settings.MODEL_DIR / "product_rule_index.npz"
+        return self.rule_index.save(filepath)
     
     def save_results(
         self,
@@ -224,8 +313,6 @@ class ProductAssociationAnalyzer:
         Returns:
             (频繁项集文件路径, 规则文件路径)
         """
-        from pathlib import Path
-        
         output_dir = Path(output_dir) if output_dir else settings.OUTPUT_DIR / "reports"
         output_dir.mkdir(parents=True, exist_ok=True)
         
@@ -240,3 +327,636 @@ class ProductAssociationAnalyzer:
         
         return str(itemsets_path), str(rules_path)
 
+
+class SlidingWindowMiner(ProductAssociationAnalyzer):
+    """
+    滑动窗口增量关联分析
+    
+    每个时间分区（如天、周）只保存一个长度为 2^产品数 的持有组合计数数组，
+    窗口内计数之和随分区加入 / 过期增量维护；刷新规则时只需对合计计数做一次
+    超集求和变换，无需重新扫描历史明细。
+    """
+    
+    def __init__(
+        self,
+        min_support: float = None,
+        min_lift: float = None,
+        window: int = 7
+    ):
+        super().__init__(min_support=min_support, min_lift=min_lift, engine="bitmask")
+        self.window = window
+        self.partitions: Dict[str, np.ndarray] = {}
+        self.total: Optional[np.ndarray] = None
+    
+    def add_partition(self, key: str, df: pd.DataFrame) -> List[str]:
+        """
+        加入一个时间分区（同名分区会被替换），并使超出窗口的旧分区过期
+        
+        Args:
+            key: 分区标识，按字符串排序须与时间先后一致，如 "2026-10-19" 或 "2026-W42"
+            df: 该分区的原始数据
+        
+        Returns:
+            过期移除的分区标识
+        """
+        basket = self.prepare_data(df)
+        weights = basket.pop(self.WEIGHT_COLUMN).to_numpy()
+        
+        if self.items and list(basket.columns) != self.items:
+            raise ValueError(f"分区产品列 {list(basket.columns)} 与窗口 {self.items} 不一致")
+        if len(basket.columns) > self.MAX_BITMASK_ITEMS:
+            raise ValueError(f"滑动窗口模式最多支持 {self.MAX_BITMASK_ITEMS} 个产品")
+        self.items = list(basket.columns)
+        
+        counts = _pattern_counts(basket.to_numpy(dtype=bool), weights)
+        if key in self.partitions:
+            self.total -= self.partitions.pop(key)
+        
+        self.partitions[key] = counts
+        self.total = counts.copy() if self.total is None else self.total + counts
+        
+        return self.expire()
+    
+    def expire(self, window: Optional[int] = None) -> List[str]:
+        """
+        移除超出窗口的最早分区（按分区标识排序，与加入顺序无关）
+        
+        Args:
+            window: 保留的分区数，默认使用初始化时的 window
+        
+        Returns:
+            过期移除的分区标识
+        """
+        if window is None:
+            window = self.window
+        expired = sorted(self.partitions)[:max(len(self.partitions) - window, 0)]
+        for key in expired:
+            self.total -= self.partitions.pop(key)
+        return expired
+    
+    def refresh(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        按窗口内合计计数重新生成频繁项集与规则
+        
+        Returns:
+            (频繁项集, 关联规则)
+        """
+        if self.total is None:
+            raise ValueError("窗口中没有分区，请先调用 add_partition()")
+        
+        self.frequent_itemsets = _itemsets_from_pattern_counts(self.total, self.items, self.min_support)
+        self.frequent_itemsets["products"] = self.frequent_itemsets["itemsets"].apply(
+            lambda x: ", ".join([self.PRODUCT_NAMES.get(item, item) for item in x])
+        )
+        rules = self.generate_rules(self.frequent_itemsets)
+        
+        return self.frequent_itemsets.sort_values("support", ascending=False), rules
+    
+    def save_state(self, filepath: Optional[Path] = None) -> Path:
+        """
+        保存窗口状态（各分区计数）
+        
+        Args:
+            filepath: 保存路径，默认保存到 models/saved 目录
+        
+        Returns:
+            保存的文件路径
+        """
+        if filepath is None:
+            filepath = settings.MODEL_DIR / "association_window.npz"
+        
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        
+        np.savez(
+            filepath,
+            items=np.array(self.items),
+            keys=np.array(list(self.partitions)),
+            counts=np.stack(list(self.partitions.values())) if self.partitions else np.zeros((0, 0), dtype=np.int64),
+        )
+        return filepath
+    
+    def load_state(self, filepath: Optional[Path] = None) -> "SlidingWindowMiner":
+        """
+        加载窗口状态
+        
+        Args:
+            filepath: 状态文件路径
+        
+        Returns:
+            self
+        """
+        if filepath is None:
+            filepath = settings.MODEL_DIR / "association_window.npz"
+        
+        with np.load(filepath, allow_pickle=False) as data:
+            self.items = data["items"].tolist()
+            self.partitions = dict(zip(data["keys"].tolist(), data["counts"]))
+        
+        self.total = np.sum(list(self.partitions.values()), axis=0) if self.partitions else None
+        return self
+
+
+class TransactionMiner(ProductAssociationAnalyzer):
+    """
+    交易级购物篮挖掘（BreadBasket 类的 (Transaction, Item) 明细数据）
+    
+    商品编码为整数 ID 后构建稀疏 CSR 交易矩阵（交易 × 商品），全程不生成稠密矩阵；
+    频繁项集用 Eclat（按商品的交易 ID 列表求交集）或 FP-Growth（稀疏输入）挖掘。
+    规则生成、Top 规则和结果保存沿用 ProductAssociationAnalyzer。
+    """
+    
+    PRODUCT_NAMES: Dict[str, str] = {}
+    
+    ENGINES = ("eclat", "fpgrowth")
+    
+    def __init__(
+        self,
+        min_support: float = None,
+        min_lift: float = None,
+        engine: str = "eclat",
+        transaction_col: str = "Transaction",
+        item_col: str = "Item",
+        lowercase: bool = True,
+        exclude_items: Iterable[str] = ("none",),
+        max_len: Optional[int] = None
+    ):
+        super().__init__(min_support=min_support, min_lift=min_lift, engine=engine)
+        self.transaction_col = transaction_col
+        self.item_col = item_col
+        self.lowercase = lowercase
+        self.exclude_items = set(exclude_items)
+        self.max_len = max_len
+        self.matrix: Optional[sparse.csr_matrix] = None
+    
+    def prepare_data(self, df: pd.DataFrame) -> sparse.csr_matrix:
+        """
+        由 (Transaction, Item) 明细构建稀疏交易矩阵
+        
+        Args:
+            df: 交易明细
+        
+        Returns:
+            CSR 交易矩阵（行为交易，列为商品）
+        """
+        return self.fit_chunks([df])
+    
+    def fit_chunks(self, chunks: Iterable[pd.DataFrame]) -> sparse.csr_matrix:
+        """
+        流式构建稀疏交易矩阵
+        
+        商品词表跨数据块累积（商品数通常远小于明细行数），每块只保留
+        (交易, 商品编号) 两列整数数组；全部读完后对交易做一次编码，
+        由 COO 转 CSR 时合并重复的 (交易, 商品)。
+        
+        Args:
+            chunks: 交易明细数据块迭代器，如 loader.iter_csv_chunks(path, chunksize)
+        
+        Returns:
+            CSR 交易矩阵
+        """
+        vocab: Dict[str, int] = {}
+        transactions, item_ids = [], []
+        
+        for chunk in chunks:
+            items = chunk[self.item_col].astype(str)
+            if self.lowercase:
+                items = items.str.lower()
+            keep = ~items.isin(self.exclude_items).to_numpy()
+            
+            codes, uniques = pd.factorize(items[keep])
+            for item in uniques:
+                vocab.setdefault(item, len(vocab))
+            mapping = np.array([vocab[item] for item in uniques], dtype=np.int64)
+            
+            item_ids.append(mapping[codes])
+            transactions.append(chunk[self.transaction_col].to_numpy()[keep])
+        
+        if not item_ids:
+            raise ValueError("没有可用的交易明细")
+        
+        rows, tx_values = pd.factorize(np.concatenate(transactions))
+        cols = np.concatenate(item_ids)
+        n_tx, n_items = len(tx_values), len(vocab)
+        
+        # (交易, 商品) 去重：同一交易多次购买同一商品只计一次
+        matrix = sparse.coo_matrix(
+            (np.ones(len(cols), dtype=np.int32), (rows, cols)), shape=(n_tx, n_items)
+        ).tocsr()
+        matrix.sum_duplicates()
+        
+        self.items = list(vocab)
+        self.matrix = matrix.astype(bool)
+        return self.matrix
+    
+    def find_frequent_itemsets(
+        self,
+        matrix: sparse.csr_matrix = None,
+        min_support: float = None
+    ) -> pd.DataFrame:
+        """
+        挖掘频繁项集
+        
+        Args:
+            matrix: 稀疏交易矩阵，默认使用 prepare_data / fit_chunks 构建的
+            min_support: 最小支持度
+        
+        Returns:
+            频繁项集 DataFrame（support, itemsets, products）
+        """
+        if matrix is None:
+            if self.matrix is None:
+                raise ValueError("请先调用 prepare_data() 或 fit_chunks()")
+            matrix = self.matrix
+        
+        min_support = min_support or self.min_support
+        n_tx = matrix.shape[0]
+        min_count = int(np.ceil(min_support * n_tx))
+        
+        # 先按单品支持度过滤，后续只处理频繁商品
+        item_counts = np.diff(matrix.tocsc().indptr)
+        frequent = np.flatnonzero(item_counts >= min_count)
+        
+        if self.engine == "fpgrowth":
+            sub = pd.DataFrame.sparse.from_spmatrix(
+                matrix[:, frequent], columns=[self.items[j] for j in frequent]
+            )
+            self.frequent_itemsets = fpgrowth(
+                sub, min_support=min_support, use_colnames=True, max_len=self.max_len
+            )
+        else:
+            self.frequent_itemsets = self._eclat(matrix, frequent, min_count, n_tx)
+        
+        self.frequent_itemsets["products"] = self.frequent_itemsets["itemsets"].apply(
+            lambda x: ", ".join(sorted(x))
+        )
+        
+        return self.frequent_itemsets.sort_values("support", ascending=False)
+    
+    def _eclat(
+        self,
+        matrix: sparse.csr_matrix,
+        frequent: np.ndarray,
+        min_count: int,
+        n_tx: int
+    ) -> pd.DataFrame:
+        """Eclat：深度优先扩展项集，支持数为交易 ID 集合交集的大小"""
+        csc = matrix[:, frequent].tocsc()
+        candidates = []
+        for j in range(len(frequent)):
+            tids = np.sort(csc.indices[csc.indptr[j]:csc.indptr[j + 1]])
+            candidates.append((int(frequent[j]), _to_tidset(tids, n_tx), len(tids)))
+        
+        # 按支持度升序扩展，交集尽早变小
+        candidates.sort(key=lambda c: c[2])
+        
+        supports, itemsets = [], []
+        self._eclat_extend((), candidates, min_count, n_tx, supports, itemsets)
+        
+        return pd.DataFrame({"support": supports, "itemsets": itemsets})
+    
+    def _eclat_extend(
+        self,
+        prefix: Tuple[int, ...],
+        candidates: List[Tuple[int, np.ndarray, int]],
+        min_count: int,
+        n_tx: int,
+        supports: List[float],
+        itemsets: List[frozenset]
+    ) -> None:
+        """以 prefix 为前缀递归扩展（递归深度为最长项集长度，同时只保留一条路径的交集）"""
+        for i, (item, tidset, count) in enumerate(candidates):
+            itemset = prefix + (item,)
+            supports.append(count / n_tx)
+            itemsets.append(frozenset(self.items[j] for j in itemset))
+            
+            if self.max_len is not None and len(itemset) >= self.max_len:
+                continue
+            
+            suffix = []
+            for other, other_set, _ in candidates[i + 1:]:
+                common, common_count = _intersect_tidsets(tidset, other_set)
+                if common_count >= min_count:
+                    suffix.append((other, common, common_count))
+            
+            if suffix:
+                self._eclat_extend(itemset, suffix, min_count, n_tx, supports, itemsets)
+
+
+# ===== Eclat 交易 ID 集合 =====
+# 稀疏集合用有序交易 ID 数组（int32），稠密集合（超过 1/32 的交易）用位图（uint8，
+# 每字节 8 笔交易），两种表示按 dtype 区分；单个集合的内存都在 n_tx / 8 字节量级
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(bits: np.ndarray) -> int:
+    """位图中 1 的个数"""
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(bits).sum())
+    return int(_POPCOUNT[bits].sum())
+
+
+def _to_tidset(tids: np.ndarray, n_tx: int) -> np.ndarray:
+    """有序交易 ID 数组转为合适的表示"""
+    if len(tids) * 32 > n_tx:
+        mask = np.zeros(n_tx, dtype=bool)
+        mask[tids] = True
+        return np.packbits(mask, bitorder="little")
+    return tids.astype(np.int32)
+
+
+def _intersect_tidsets(a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, int]:
+    """交易 ID 集合求交集，返回 (交集, 大小)"""
+    a_bits, b_bits = a.dtype == np.uint8, b.dtype == np.uint8
+    
+    if a_bits and b_bits:
+        # 位图按位与的成本与交集大小无关，结果保留为位图
+        bits = a & b
+        return bits, _popcount(bits)
+    
+    if a_bits:
+        a, b = b, a
+    if b_bits:
+        # 有序 ID 数组逐个查位图
+        common = a[((b[a >> 3] >> (a & 7)) & 1).astype(bool)]
+    else:
+        common = _intersect_sorted(a, b)
+    return common, len(common)
+
+
+def _intersect_sorted(small: np.ndarray, large: np.ndarray) -> np.ndarray:
+    """有序交易 ID 列表求交集：在较长列表中二分查找较短列表，O(短 · log 长)"""
+    if len(small) > len(large):
+        small, large = large, small
+    if len(small) == 0:
+        return small
+    pos = np.minimum(np.searchsorted(large, small), len(large) - 1)
+    return small[large[pos] == small]
+
+
+# ===== 位掩码计数 =====
+
+def _pattern_counts(holdings: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    各持有组合的人数
+    
+    Args:
+        holdings: (n, m) 布尔持有矩阵
+        weights: 每行的人数，默认每行 1 人
+    
+    Returns:
+        长度为 2^m 的计数数组，下标为持有组合的位掩码
+    """
+    m = holdings.shape[1]
+    bits = np.left_shift(1, np.arange(m), dtype=np.int64)
+    masks = holdings @ bits
+    counts = np.bincount(masks, weights=weights, minlength=1 << m)
+    return np.rint(counts).astype(np.int64)
+
+
+def _itemsets_from_pattern_counts(
+    counts: np.ndarray,
+    columns: List[str],
+    min_support: float
+) -> pd.DataFrame:
+    """
+    由持有组合计数得到频繁项集（超集求和变换，不修改输入）
+    
+    Args:
+        counts: _pattern_counts 的结果
+        columns: 各位对应的产品
+        min_support: 最小支持度
+    
+    Returns:
+        与 mlxtend 一致的频繁项集 DataFrame（support, itemsets）
+    """
+    m = len(columns)
+    n = counts.sum()
+    
+    if n == 0 or m == 0:
+        return pd.DataFrame({"support": pd.Series(dtype=float), "itemsets": pd.Series(dtype=object)})
+    
+    # 超集求和：逐位把“含该位”的计数累加到“不含该位”的位置
+    counts = counts.copy()
+    for j in range(m):
+        view = counts.reshape(-1, 2, 1 << j)
+        view[:, 0, :] += view[:, 1, :]
+    
+    support = counts / n
+    candidates = np.flatnonzero(support >= min_support)
+    candidates = candidates[candidates > 0]
+    
+    # 按项集大小、再按掩码排序，与 apriori 输出顺序一致
+    sizes = np.array([bin(mask).count("1") for mask in candidates], dtype=np.int64)
+    order = np.lexsort((candidates, sizes))
+    candidates = candidates[order]
+    
+    itemsets = [
+        frozenset(columns[j] for j in range(m) if mask >> j & 1)
+        for mask in candidates
+    ]
+    
+    return pd.DataFrame({"support": support[candidates], "itemsets": itemsets})
+
+
+# ===== 加权 Apriori =====
+
+def _weighted_apriori(
+    holdings: np.ndarray,
+    weights: np.ndarray,
+    columns: List[str],
+    min_support: float
+) -> pd.DataFrame:
+    """
+    在去重后的持有组合上逐层挖掘频繁项集，支持数为覆盖行的人数之和
+    
+    每个频繁项集保留一个覆盖行的布尔向量（长度为组合数，远小于客户数），
+    候选项集由同前缀的两个频繁项集连接，覆盖向量按位与一次得到。
+    
+    Args:
+        holdings: (组合数, m) 布尔持有矩阵
+        weights: 每个组合的人数
+        columns: 各列对应的产品
+        min_support: 最小支持度
+    
+    Returns:
+        与 mlxtend 一致的频繁项集 DataFrame（support, itemsets）
+    """
+    weights = np.asarray(weights, dtype=np.int64)
+    n = weights.sum()
+    supports, itemsets = [], []
+    
+    if n > 0:
+        item_support = (weights @ holdings) / n
+        level = {(j,): holdings[:, j] for j in np.flatnonzero(item_support >= min_support).tolist()}
+    else:
+        level = {}
+    
+    while level:
+        keys = sorted(level)
+        for key in keys:
+            supports.append(weights[level[key]].sum() / n)
+            itemsets.append(frozenset(columns[j] for j in key))
+        
+        # 同前缀的频繁项集两两连接，所有 k-1 子集都频繁的候选才计数
+        next_level = {}
+        for a, key in enumerate(keys):
+            for other in keys[a + 1:]:
+                if other[:-1] != key[:-1]:
+                    break
+                candidate = key + other[-1:]
+                if any(candidate[:i] + candidate[i + 1:] not in level for i in range(len(candidate) - 2)):
+                    continue
+                cover = level[key] & holdings[:, other[-1]]
+                if weights[cover].sum() / n >= min_support:
+                    next_level[candidate] = cover
+        level = next_level
+    
+    return pd.DataFrame({"support": pd.Series(supports, dtype=float), "itemsets": pd.Series(itemsets, dtype=object)})
+
+
+# ===== 向量化规则生成 =====
+
+def _row_keys(rows: np.ndarray) -> np.ndarray:
+    """二维整数数组的每一行视为一个定长字节串，用于整行查找"""
+    rows = np.ascontiguousarray(rows, dtype=np.int32)
+    return rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))).ravel()
+
+
+def _top_n_per_group(groups: np.ndarray, scores: np.ndarray, n: int) -> np.ndarray:
+    """每组按分数降序保留前 n 个，返回保留的下标"""
+    order = np.lexsort((-scores, groups))
+    sorted_groups = groups[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_groups)) + 1]
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    return order[rank < n]
+
+
+def _generate_rules(
+    frequent_itemsets: pd.DataFrame,
+    metric: str = "lift",
+    min_threshold: float = 1.0,
+    top_n_per_consequent: Optional[int] = None,
+    format_itemset: Callable = None
+) -> pd.DataFrame:
+    """
+    由频繁项集表向量化生成关联规则
+    
+    每个项集表示为补 -1 的有序商品编号行，整行作为字节串排序后可二分查找支持度。
+    按项集大小 k 和前件位模式（2^k - 2 种）分批计算：每批一次取出所有 k 项集的
+    前件 / 后件行，查出支持度后整列计算各指标，先按阈值过滤，
+    再与已保留的规则一起按后件裁剪为 Top-N，保留的规则数始终有上界。
+    前件、后件及可读描述只对最终规则按项集下标查表生成。
+    
+    Args:
+        frequent_itemsets: 频繁项集（support, itemsets）
+        metric: 过滤与裁剪使用的指标
+        min_threshold: 指标最小阈值
+        top_n_per_consequent: 每个后件保留的规则数，None 表示不裁剪
+        format_itemset: 项集格式化函数
+    
+    Returns:
+        与 mlxtend association_rules 列一致的规则表（另含 rule 描述列）
+    """
+    format_itemset = format_itemset or (lambda itemset: " + ".join(map(str, itemset)))
+    itemsets = frequent_itemsets["itemsets"].tolist()
+    supports = frequent_itemsets["support"].to_numpy(dtype=np.float64)
+    
+    vocab = {item: i for i, item in enumerate(sorted(set().union(*itemsets), key=str))} if itemsets else {}
+    sizes = np.array([len(itemset) for itemset in itemsets], dtype=np.int64)
+    width = int(sizes.max()) if len(sizes) else 1
+    
+    table = np.full((len(itemsets), width), -1, dtype=np.int32)
+    for row, itemset in enumerate(itemsets):
+        ids = sorted(vocab[item] for item in itemset)
+        table[row, :len(ids)] = ids
+    
+    keys = _row_keys(table)
+    key_order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[key_order]
+    
+    def lookup(rows: np.ndarray) -> np.ndarray:
+        """子项集行 → 项集下标（不存在时为 -1）"""
+        padded = np.full((len(rows), width), -1, dtype=np.int32)
+        padded[:, :rows.shape[1]] = rows
+        query = _row_keys(padded)
+        pos = np.minimum(np.searchsorted(sorted_keys, query), len(sorted_keys) - 1)
+        return np.where(sorted_keys[pos] == query, key_order[pos], -1)
+    
+    columns = ["ante", "cons", "whole", "score"]
+    kept = {col: np.empty(0, dtype=np.float64 if col == "score" else np.int64) for col in columns}
+    
+    for k in range(2, width + 1):
+        whole = np.flatnonzero(sizes == k)
+        if len(whole) == 0:
+            continue
+        rows = table[whole, :k]
+        
+        for pattern in range(1, (1 << k) - 1):
+            ante_cols = [j for j in range(k) if pattern >> j & 1]
+            cons_cols = [j for j in range(k) if not pattern >> j & 1]
+            ante = lookup(rows[:, ante_cols])
+            cons = lookup(rows[:, cons_cols])
+            
+            # 子项集必然频繁；若输入被截断而查不到则跳过
+            valid = (ante >= 0) & (cons >= 0)
+            ante, cons, batch_whole = ante[valid], cons[valid], whole[valid]
+            
+            score = _rule_metrics(supports[ante], supports[cons], supports[batch_whole])[metric]
+            passed = score >= min_threshold
+            
+            batch = {"ante": ante[passed], "cons": cons[passed], "whole": batch_whole[passed], "score": score[passed]}
+            kept = {col: np.concatenate([kept[col], batch[col]]) for col in columns}
+            
+            if top_n_per_consequent is not None:
+                keep = _top_n_per_group(kept["cons"], kept["score"], top_n_per_consequent)
+                kept = {col: kept[col][keep] for col in columns}
+    
+    ante, cons, whole = kept["ante"], kept["cons"], kept["whole"]
+    itemset_array = np.empty(len(itemsets), dtype=object)
+    itemset_array[:] = itemsets
+    
+    rules = pd.DataFrame({
+        "antecedents": itemset_array[ante],
+        "consequents": itemset_array[cons],
+        "antecedent support": supports[ante],
+        "consequent support": supports[cons],
+        **_rule_metrics(supports[ante], supports[cons], supports[whole]),
+    })
+    
+    # 描述只按项集下标查表：每个项集格式化一次
+    labels = np.empty(len(itemsets), dtype=object)
+    labels[:] = [format_itemset(itemset) for itemset in itemsets]
+    rules["rule"] = pd.Series(labels[ante] + " → " + labels[cons], dtype=object)
+    
+    return rules
+
+
+def _rule_metrics(
+    antecedent_support: np.ndarray,
+    consequent_support: np.ndarray,
+    support: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """规则兴趣度指标（与 mlxtend 定义一致）"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        confidence = support / antecedent_support
+        lift = confidence / consequent_support
+        leverage = support - antecedent_support * consequent_support
+        conviction = np.where(
+            confidence >= 1, np.inf, (1 - consequent_support) / (1 - confidence)
+        )
+        zhang_denom = np.maximum(
+            support * (1 - antecedent_support),
+            antecedent_support * (consequent_support - support)
+        )
+        zhangs_metric = np.where(zhang_denom == 0, 0.0, leverage / zhang_denom)
+    
+    return {
+        "support": support,
+        "confidence": confidence,
+        "lift": lift,
+        "leverage": leverage,
+        "conviction": conviction,
+        "zhangs_metric": zhangs_metric,
+    }
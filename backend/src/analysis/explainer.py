@@ -3,13 +3,23 @@
 使用 SHAP 解释模型预测
 """
 
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
 import numpy as np
 import pandas as pd
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any, Tuple
 import shap
 
 from ..config import settings
+from ..serving import ExplanationStore
+from ..utils.logger import get_app_logger
 
 
 class ModelExplainer:
@@ -38,9 +48,9 @@ class ModelExplainer:
         Returns:
             self
         """
-        # 尝试创建 TreeExplainer（适用于树模型）
+        # 尝试创建 TreeExplainer（适用于树模型，同一模型版本复用已构建的实例）
         try:
-            self.explainer = shap.TreeExplainer(self.model)
+            self.explainer = get_tree_explainer(self.model)
         except Exception:
             # 回退到 KernelExplainer
             if X_background is None:
@@ -73,6 +83,45 @@ class ModelExplainer:
         
         return self.shap_values
     
+    def explain_rows(self, X: pd.DataFrame) -> np.ndarray:
+        """
+        只计算给定行的正类 SHAP 值，不覆盖 self.shap_values
+        
+        Args:
+            X: 需要解释的若干行
+        
+        Returns:
+            (行数, 特征数) SHAP 值
+        """
+        if self.explainer is None:
+            self.create_explainer()
+        
+        if self.feature_names is None and isinstance(X, pd.DataFrame):
+            self.feature_names = X.columns.tolist()
+        
+        return _positive_class(self.explainer.shap_values(X))
+    
+    def _row_values(self, X: pd.DataFrame, index: int) -> np.ndarray:
+        """单个样本的 SHAP 值；尚未计算全量矩阵时只计算这一行"""
+        if self.shap_values is None:
+            return self.explain_rows(X.iloc[[index]])
+        return self._positive_values()[index:index + 1]
+    
+    def top_factors(self, top_n: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        每个样本按 |SHAP| 降序的前 N 个影响因素
+        
+        Args:
+            top_n: 每个样本保留的特征数
+        
+        Returns:
+            (特征下标, SHAP 值)，形状均为 (样本数, top_n)
+        """
+        if self.shap_values is None:
+            raise ValueError("请先调用 explain()")
+        
+        return _top_features(self._positive_values(), top_n)
+    
     def get_feature_importance(self) -> pd.DataFrame:
         """
         获取基于 SHAP 的特征重要性
@@ -83,12 +132,7 @@ class ModelExplainer:
         if self.shap_values is None:
             raise ValueError("请先调用 explain()")
         
-        # 处理二分类情况（shap_values 可能是列表）
-        values = self.shap_values
-        if isinstance(values, list):
-            values = values[1]  # 取正类的 SHAP 值
-        
-        importance = np.abs(values).mean(axis=0)
+        importance = np.abs(self._positive_values()).mean(axis=0)
         
         df = pd.DataFrame({
             "feature": self.feature_names,
@@ -97,6 +141,95 @@ class ModelExplainer:
         
         return df.sort_values("importance", ascending=False).reset_index(drop=True)
     
+    def explain_chunked(
+        self,
+        X: pd.DataFrame,
+        output_path: Optional[Path] = None,
+        chunk_size: int = 50000,
+        n_jobs: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> np.ndarray:
+        """
+        分块并行计算 TreeSHAP，结果写入磁盘上的 float32 memmap
+        
+        特征矩阵先写入临时 .npy，各工作进程以 memmap 只读方式共享；每个进程初始化时
+        构建一次 TreeExplainer，之后按行区间计算并直接写入输出文件的对应行，
+        主进程只收发行区间，同时在途的任务数有上限，内存占用与样本总数无关。
+        仅支持树模型。
+        
+        Args:
+            X: 需要解释的数据
+            output_path: 输出 .npy 路径，默认 OUTPUT_DIR/reports/shap_values.npy
+            chunk_size: 每个任务的行数
+            n_jobs: 并行进程数，默认使用全部 CPU；1 表示在当前进程内顺序执行
+            max_in_flight: 同时提交的任务数上限，默认 2 * n_jobs
+            progress: 进度回调 progress(已完成行数, 总行数)，默认写日志
+        
+        Returns:
+            只读 memmap 形式的 (样本数, 特征数) float32 SHAP 值，同时赋给 self.shap_values
+        """
+        if self.feature_names is None and isinstance(X, pd.DataFrame):
+            self.feature_names = X.columns.tolist()
+        
+        output_path = Path(output_path or settings.OUTPUT_DIR / "reports" / "shap_values.npy")
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        n_rows, n_cols = X.shape
+        output = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.float32, shape=(n_rows, n_cols))
+        del output
+        
+        if progress is None:
+            logger = get_app_logger()
+            progress = lambda done, total: logger.info(f"SHAP 计算进度: {done}/{total} ({done / max(total, 1):.0%})")
+        
+        bounds = [(start, min(start + chunk_size, n_rows)) for start in range(0, n_rows, chunk_size)]
+        n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, len(bounds)))
+        done = 0
+        
+        with tempfile.TemporaryDirectory(prefix="shap_") as tmp_dir:
+            # 特征矩阵分块写入临时文件，不额外复制一份完整矩阵
+            data_path = os.path.join(tmp_dir, "X.npy")
+            data = np.lib.format.open_memmap(data_path, mode="w+", dtype=np.float64, shape=(n_rows, n_cols))
+            rows = X.iloc if isinstance(X, pd.DataFrame) else X
+            for start, stop in bounds:
+                data[start:stop] = np.asarray(rows[start:stop], dtype=np.float64)
+            data.flush()
+            del data
+            
+            initargs = (self.model, data_path, str(output_path))
+            
+            if n_jobs == 1:
+                _init_shap_worker(*initargs)
+                try:
+                    for start, stop in bounds:
+                        done += _shap_chunk(start, stop)
+                        progress(done, n_rows)
+                finally:
+                    _init_shap_worker(None, None, None)
+            else:
+                max_in_flight = max_in_flight or 2 * n_jobs
+                pending_bounds = iter(bounds)
+                with ProcessPoolExecutor(
+                    max_workers=n_jobs,
+                    initializer=_init_shap_worker,
+                    initargs=initargs
+                ) as pool:
+                    in_flight = {pool.submit(_shap_chunk, *b) for b in _take(pending_bounds, max_in_flight)}
+                    while in_flight:
+                        finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            done += future.result()
+                            progress(done, n_rows)
+                        in_flight |= {pool.submit(_shap_chunk, *b) for b in _take(pending_bounds, len(finished))}
+        
+        self.shap_values = np.load(output_path, mmap_mode="r")
+        return self.shap_values
+    
+    def _positive_values(self) -> np.ndarray:
+        """正类的二维 SHAP 值矩阵 (样本数, 特征数)"""
+        return _positive_class(self.shap_values)
+    
     def explain_single(
         self,
         X: pd.DataFrame,
@@ -112,23 +245,12 @@ class ModelExplainer:
         Returns:
             各特征对预测的贡献
         """
-        if self.shap_values is None:
-            self.explain(X)
-        
-        values = self.shap_values
-        if isinstance(values, list):
-            values = values[1]
-        
-        contributions = {}
-        for i, feature in enumerate(self.feature_names):
-            contributions[feature] = float(values[index, i])
-        
         # 按贡献绝对值排序
-        return dict(sorted(
-            contributions.items(),
-            key=lambda x: abs(x[1]),
-            reverse=True
-        ))
+        row = self._row_values(X, index)
+        idx, vals = _top_features(row, row.shape[1])
+        names = np.asarray(self.feature_names, dtype=object)[idx[0]]
+        
+        return dict(zip(names.tolist(), vals[0].tolist()))
     
     def generate_explanation_text(
         self,
@@ -147,7 +269,8 @@ class ModelExplainer:
         Returns:
             解释文本
         """
-        contributions = self.explain_single(X, index)
+        idx, vals = _top_features(self._row_values(X, index), top_n)
+        names = np.asarray(self.feature_names, dtype=object)[idx[0]]
         
         # 获取预测结果
         if hasattr(self.model, "predict_proba"):
@@ -160,7 +283,7 @@ class ModelExplainer:
         # 构建解释文本
         lines = [prediction_text, "", "主要影响因素:"]
         
-        for i, (feature, value) in enumerate(list(contributions.items())[:top_n]):
+        for i, (feature, value) in enumerate(zip(names, vals[0])):
             direction = "↑ 正向" if value > 0 else "↓ 负向"
             lines.append(f"  {i+1}. {feature}: {direction} ({value:+.4f})")
         
@@ -169,45 +292,39 @@ class ModelExplainer:
     def batch_explain(
         self,
         X: pd.DataFrame,
-        top_n: int = 3
+        top_n: int = 3,
+        categorical: bool = False
     ) -> pd.DataFrame:
         """
         批量解释多个样本
         
+        对 |SHAP| 按行做 argpartition 选出前 N 个特征，再只对这 N 列排序，
+        特征名和 SHAP 值都用花式索引整列取出，不逐行构造字典。
+        
         Args:
             X: 数据
             top_n: 每个样本显示前 N 个特征
+            categorical: 特征名列是否输出为 Categorical（大批量时省内存）
         
         Returns:
-            解释结果 DataFrame
+            解释结果 DataFrame（index, feature_1, shap_1, feature_2, shap_2, ...）
         """
         if self.shap_values is None:
             self.explain(X)
         
-        values = self.shap_values
-        if isinstance(values, list):
-            values = values[1]
+        values = self._positive_values()
+        idx, vals = _top_features(values, top_n)
+        names = np.asarray(self.feature_names, dtype=object)
         
-        results = []
-        for i in range(len(X)):
-            # 获取该样本的 SHAP 值
-            sample_shap = dict(zip(self.feature_names, values[i]))
-            
-            # 排序并取 top N
-            sorted_features = sorted(
-                sample_shap.items(),
-                key=lambda x: abs(x[1]),
-                reverse=True
-            )[:top_n]
-            
-            result = {"index": i}
-            for j, (feature, shap_val) in enumerate(sorted_features):
-                result[f"feature_{j+1}"] = feature
-                result[f"shap_{j+1}"] = shap_val
-            
-            results.append(result)
+        columns = {"index": np.arange(len(values))}
+        for j in range(idx.shape[1]):
+            if categorical:
+                columns[f"feature_{j+1}"] = pd.Categorical.from_codes(idx[:, j], categories=self.feature_names)
+            else:
+                columns[f"feature_{j+1}"] = names[idx[:, j]]
+            columns[f"shap_{j+1}"] = vals[:, j]
         
-        return pd.DataFrame(results)
+        return pd.DataFrame(columns)
     
     def save_explanation(
         self,
@@ -239,3 +356,234 @@ class ModelExplainer:
         
         return str(importance_path)
 
+
+class ExplanationService:
+    """
+    客户解释查询服务
+    
+    查询顺序为 LRU 缓存 → 夜间预计算的 ExplanationStore → 现场计算单行 SHAP。
+    TreeExplainer 按模型版本只构建一次；预计算结果的模型版本与当前模型不一致时不使用。
+    """
+    
+    def __init__(
+        self,
+        model: Any,
+        feature_names: List[str],
+        store: Optional[ExplanationStore] = None,
+        feature_loader: Optional[Callable[[str], Optional[pd.DataFrame]]] = None,
+        predict: Optional[Callable[[pd.DataFrame], np.ndarray]] = None,
+        top_n: int = 5,
+        cache_size: int = 10000,
+        calibration: Optional[Dict[str, Any]] = None
+    ):
+        """
+        初始化查询服务
+        
+        Args:
+            model: 训练好的树模型
+            feature_names: 模型特征名
+            store: 预计算的解释索引
+            feature_loader: 按客户 ID 返回模型特征行的函数（未命中预计算结果时使用）
+            predict: 预测分数函数，默认使用模型自身的 predict_proba / predict
+            top_n: 现场计算时保留的影响因素数
+            cache_size: LRU 缓存容量
+            calibration: predict 使用的阈值 / 校准器参数，计入模型版本
+        """
+        self.model_version = model_version(model, calibration)
+        self.explainer = ModelExplainer(model, feature_names).create_explainer()
+        self.feature_loader = feature_loader
+        self.predict = predict or _default_predict(model)
+        self.top_n = top_n
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        if store is not None and store.model_version != self.model_version:
+            get_app_logger().warning(
+                f"预计算解释的模型版本 {store.model_version} 与当前模型 {self.model_version} 不一致，改为现场计算"
+            )
+            store = None
+        self.store = store
+    
+    def explain(self, customer_id: Any) -> Optional[Dict[str, Any]]:
+        """
+        查询单个客户的预测解释
+        
+        Args:
+            customer_id: 客户 ID
+        
+        Returns:
+            {'customer_id', 'score', 'factors', 'model_version', 'source'}，客户不存在时返回 None
+        """
+        key = str(customer_id)
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                return result
+        
+        # 查询与现场计算在锁外进行，避免慢请求阻塞其他客户
+        result = self.store.lookup(key) if self.store is not None else None
+        if result is None:
+            result = self._explain_on_demand(key)
+        if result is None:
+            return None
+        
+        with self._cache_lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+    
+    def _explain_on_demand(self, customer_id: str) -> Optional[Dict[str, Any]]:
+        """现场计算单个客户的 SHAP 值"""
+        if self.feature_loader is None:
+            return None
+        X = self.feature_loader(customer_id)
+        if X is None or len(X) == 0:
+            return None
+        
+        X = X.iloc[:1]
+        idx, vals = _top_features(self.explainer.explain_rows(X), self.top_n)
+        store = ExplanationStore(
+            [customer_id], idx, vals, self.explainer.feature_names,
+            scores=self.predict(X), model_version=self.model_version
+        )
+        return {**store.lookup(customer_id), "source": "on_demand"}
+    
+    def clear_cache(self) -> None:
+        """清空 LRU 缓存"""
+        with self._cache_lock:
+            self._cache.clear()
+
+
+# TreeExplainer 按模型版本缓存，同一模型只构建一次
+_TREE_EXPLAINERS: "OrderedDict[str, Any]" = OrderedDict()
+_TREE_EXPLAINER_CACHE_SIZE = 4
+
+
+def model_version(model: Any, calibration: Optional[Dict[str, Any]] = None) -> str:
+    """
+    模型版本指纹（树模型文本导出内容的哈希，无法导出时使用 pickle 内容）
+    
+    Args:
+        model: 训练好的模型
+        calibration: 影响输出分数的阈值 / 校准器参数（可 JSON 序列化），一并计入指纹
+    
+    Returns:
+        16 位十六进制字符串
+    """
+    booster = getattr(model, "booster_", model)
+    if hasattr(booster, "model_to_string"):
+        payload = booster.model_to_string().encode("utf-8")
+    else:
+        payload = pickle.dumps(model)
+    if calibration is not None:
+        payload += json.dumps(calibration, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+def get_tree_explainer(model: Any) -> Any:
+    """
+    获取模型对应的 TreeExplainer，同一模型版本只构建一次
+    
+    Args:
+        model: 训练好的树模型
+    
+    Returns:
+        shap.TreeExplainer
+    """
+    version = model_version(model)
+    explainer = _TREE_EXPLAINERS.get(version)
+    if explainer is None:
+        explainer = shap.TreeExplainer(model)
+        _TREE_EXPLAINERS[version] = explainer
+        if len(_TREE_EXPLAINERS) > _TREE_EXPLAINER_CACHE_SIZE:
+            _TREE_EXPLAINERS.popitem(last=False)
+    else:
+        _TREE_EXPLAINERS.move_to_end(version)
+    return explainer
+
+
+def _default_predict(model: Any) -> Callable[[pd.DataFrame], np.ndarray]:
+    """模型自身的预测分数函数（分类器取正类概率）"""
+    if hasattr(model, "predict_proba"):
+        return lambda X: model.predict_proba(X)[:, 1]
+    return model.predict
+
+
+def _top_features(values: np.ndarray, top_n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    每行按 |SHAP| 降序取前 N 个特征
+    
+    先用 np.partition 在 O(特征数) 内求出每行第 N 大的 |SHAP|，不小于该值的列为候选
+    （并列时可能多于 N 列），再只对候选列做稳定排序；绝对值相同时特征顺序在前者
+    优先，结果与按 |SHAP| 对全部特征做稳定降序排序一致。
+    
+    Args:
+        values: (样本数, 特征数) SHAP 值
+        top_n: 每行保留的特征数
+    
+    Returns:
+        (特征下标, SHAP 值)，形状均为 (样本数, min(top_n, 特征数))
+    """
+    values = np.asarray(values)
+    n_features = values.shape[1]
+    top_n = min(top_n, n_features)
+    magnitude = np.abs(values)
+    
+    if 0 < top_n < n_features:
+        kth = np.partition(magnitude, n_features - top_n, axis=1)[:, [n_features - top_n]]
+        candidate = magnitude >= kth
+        # 布尔数组的稳定排序为 O(特征数)，候选列按特征顺序排在前面
+        idx = np.argsort(~candidate, axis=1, kind="stable")[:, :candidate.sum(axis=1).max()]
+    else:
+        idx = np.broadcast_to(np.arange(n_features), values.shape)
+    
+    order = np.argsort(-np.take_along_axis(magnitude, idx, axis=1), axis=1, kind="stable")
+    idx = np.take_along_axis(idx, order[:, :top_n], axis=1)
+    return idx, np.take_along_axis(values, idx, axis=1)
+
+
+def _positive_class(values) -> np.ndarray:
+    """
+    二分类时 shap 可能返回 [负类, 正类] 列表或 (样本数, 特征数, 类别数) 数组，统一取正类
+    """
+    if isinstance(values, list):
+        values = values[1]
+    values = np.asarray(values)
+    if values.ndim == 3:
+        values = values[:, :, 1]
+    return values
+
+
+def _take(iterator, n: int) -> List:
+    """从迭代器中取出至多 n 个元素"""
+    return [item for _, item in zip(range(n), iterator)]
+
+
+# ===== 分块 SHAP 的工作进程函数 =====
+
+_SHAP_EXPLAINER = None
+_SHAP_DATA: Optional[np.ndarray] = None
+_SHAP_OUTPUT: Optional[np.ndarray] = None
+
+
+def _init_shap_worker(model: Any, data_path: Optional[str], output_path: Optional[str]) -> None:
+    """工作进程初始化：构建一次 TreeExplainer，并以 memmap 打开输入与输出（model 为 None 时释放）"""
+    global _SHAP_EXPLAINER, _SHAP_DATA, _SHAP_OUTPUT
+    if model is None:
+        _SHAP_EXPLAINER = _SHAP_DATA = _SHAP_OUTPUT = None
+        return
+    _SHAP_EXPLAINER = shap.TreeExplainer(model)
+    _SHAP_DATA = np.load(data_path, mmap_mode="r")
+    _SHAP_OUTPUT = np.load(output_path, mmap_mode="r+")
+
+
+def _shap_chunk(start: int, stop: int) -> int:
+    """计算 [start, stop) 行的 SHAP 值并写入输出文件，返回行数"""
+    values = _positive_class(_SHAP_EXPLAINER.shap_values(np.asarray(_SHAP_DATA[start:stop])))
+    _SHAP_OUTPUT[start:stop] = values
+    _SHAP_OUTPUT.flush()
+    return stop - start
@@ -1,14 +1,25 @@
 """
 时间序列分析模块
-使用 ARIMA 预测资产趋势
+使用 ARIMA 预测资产趋势，并提供可一次处理大量序列的向量化指数平滑 / 季节朴素预测器
 """
 
+import itertools
+import json
+import os
+import pickle
+import signal
+import threading
+import warnings
+from abc import ABC, abstractmethod
 import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from functools import partial
 from pathlib import Path
-from typing import Dict, Optional, Tuple
-from statsmodels.tsa.arima.model import ARIMA
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from threadpoolctl import threadpool_limits
 
 from ..config import settings
 
@@ -16,17 +27,48 @@ from ..config import settings
 class AssetTrendAnalyzer:
     """资产趋势分析器"""
     
+    CRITERIA = ("aic", "bic")
+    
+    # 分组批量预测可用的引擎：arima 逐条拟合，其余为向量化预测器（见 FORECASTERS）
+    ENGINES = ("arima", "ses", "holt", "seasonal_naive")
+    
+    # order="auto" 时默认搜索的 (p, d, q) 网格
+    AUTO_ORDER_CANDIDATES = list(itertools.product(range(3), range(2), range(3)))
+    
     def __init__(
         self,
-        order: Tuple[int, int, int] = (1, 1, 1),
-        forecast_periods: int = 4
+        order: Union[Tuple[int, int, int], str] = (1, 1, 1),
+        forecast_periods: int = 4,
+        criterion: str = "aic",
+        order_candidates: Optional[List[Tuple[int, int, int]]] = None,
+        order_cache_path: Optional[Path] = None
     ):
+        """
+        Args:
+            order: ARIMA 阶数；"auto" 表示按信息准则自动选择并缓存
+            forecast_periods: 默认预测周期数
+            criterion: 自动定阶使用的信息准则 ('aic', 'bic')
+            order_candidates: 自动定阶的候选阶数，默认 AUTO_ORDER_CANDIDATES
+            order_cache_path: 阶数缓存文件，默认 MODEL_DIR/arima_orders.json
+        """
+        if criterion not in self.CRITERIA:
+            raise ValueError(f"不支持的信息准则: {criterion}，可选 {self.CRITERIA}")
+        if isinstance(order, str) and order != "auto":
+            raise ValueError(f"order 只能是 (p, d, q) 或 'auto'，收到: {order}")
+        
         self.order = order
         self.forecast_periods = forecast_periods
+        self.criterion = criterion
+        self.order_candidates = [tuple(c) for c in (order_candidates or self.AUTO_ORDER_CANDIDATES)]
+        self.order_cache_path = Path(order_cache_path or settings.MODEL_DIR / "arima_orders.json")
+        self.selected_order: Optional[Tuple[int, int, int]] = None
         self.model = None
         self.model_fit = None
         self.series: Optional[pd.Series] = None
         self.forecast: Optional[pd.Series] = None
+        self.segment_forecasts: Optional[pd.DataFrame] = None
+        # 分组序列的拟合状态 {序列键: {'key', 'order', 'params', 'values', 'last_period'}}
+        self.segment_states: Dict[str, Dict[str, Any]] = {}
     
     def prepare_data(
         self,
@@ -92,17 +134,18 @@ class AssetTrendAnalyzer:
             std_val = 20000
         
         # 生成最近 N 个月的时间序列
-        dates = pd.date_range(end=datetime.now(), periods=num_periods, freq="M")
+        dates = pd.date_range(end=datetime.now(), periods=num_periods, freq="ME")
         values = np.cumsum(np.random.normal(mean_val * 0.02, std_val * 0.1, size=num_periods)) + mean_val
         
         return pd.Series(values, index=dates)
     
-    def fit(self, series: pd.Series = None) -> "AssetTrendAnalyzer":
+    def fit(self, series: pd.Series = None, key: str = "global") -> "AssetTrendAnalyzer":
         """
         拟合 ARIMA 模型
         
         Args:
             series: 时间序列，默认使用 prepare_data 生成的
+            key: order="auto" 时阶数缓存使用的序列键
         
         Returns:
             self
@@ -113,11 +156,106 @@ class AssetTrendAnalyzer:
         if self.series is None:
             raise ValueError("请先调用 prepare_data() 或传入 series")
         
-        self.model = ARIMA(self.series, order=self.order)
+        from statsmodels.tsa.arima.model import ARIMA
+        
+        if self.order == "auto":
+            self.selected_order = self.select_order(key=key)
+        else:
+            self.selected_order = tuple(self.order)
+        
+        self.model = ARIMA(self.series, order=self.selected_order)
         self.model_fit = self.model.fit()
         
         return self
     
+    def select_order(
+        self,
+        series: pd.Series = None,
+        key: str = "global",
+        n_jobs: Optional[int] = None,
+        timeout: Optional[float] = 30.0,
+        refresh: bool = False
+    ) -> Tuple[int, int, int]:
+        """
+        按 AIC / BIC 自动选择 ARIMA 阶数
+        
+        候选阶数按 p + q 由简到繁分波次搜索，同一波次的候选并行拟合；
+        拟合发散（未收敛、似然或参数非有限、超时）的阶数及其更复杂的扩展
+        （相同 d、p 和 q 都不更小）不再尝试，某一波次没有带来改进即停止。
+        结果按 key 写入阶数缓存，下次直接沿用，除非 refresh=True。
+        
+        Args:
+            series: 时间序列，默认使用 prepare_data 生成的
+            key: 缓存键
+            n_jobs: 并行进程数，默认使用全部 CPU；1 表示在当前进程内顺序执行
+            timeout: 单个候选的拟合时限（秒）
+            refresh: 是否忽略缓存重新搜索
+        
+        Returns:
+            (p, d, q)
+        """
+        series = self.series if series is None else series
+        if series is None:
+            raise ValueError("请先调用 prepare_data() 或传入 series")
+        
+        cache = self.load_order_cache()
+        if not refresh and key in cache and cache[key].get("criterion") == self.criterion:
+            return tuple(cache[key]["order"])
+        
+        values = np.asarray(series, dtype=np.float64)
+        score = partial(_score_order, values, criterion=self.criterion, timeout=timeout)
+        n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, len(self.order_candidates)))
+        
+        if n_jobs == 1:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                best = _search_order(self.order_candidates, lambda wave: list(map(score, wave)))
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_forecast_worker) as pool:
+                best = _search_order(self.order_candidates, lambda wave: list(pool.map(score, wave)))
+        
+        if best is None:
+            raise ValueError("所有候选阶数均拟合失败，无法自动定阶")
+        
+        order, value = best
+        self.update_order_cache({key: (order, value)})
+        return order
+    
+    def load_order_cache(self) -> Dict[str, Dict[str, Any]]:
+        """读取阶数缓存 {key: {'order', 'criterion', 'score', 'updated_at'}}"""
+        if not self.order_cache_path.exists():
+            return {}
+        with open(self.order_cache_path, encoding="utf-8") as f:
+            return json.load(f)
+    
+    def update_order_cache(self, orders: Dict[str, Tuple[Tuple[int, int, int], float]]) -> Path:
+        """
+        写入阶数缓存（先写临时文件再替换，避免并发读到半个文件）
+        
+        Args:
+            orders: {key: ((p, d, q), 信息准则值)}
+        
+        Returns:
+            缓存文件路径
+        """
+        cache = self.load_order_cache()
+        updated_at = datetime.now().isoformat(timespec="seconds")
+        for key, (order, value) in orders.items():
+            cache[key] = {
+                "order": [int(x) for x in order],
+                "criterion": self.criterion,
+                "score": float(value),
+                "updated_at": updated_at,
+            }
+        
+        self.order_cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.order_cache_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.order_cache_path)
+        
+        return self.order_cache_path
+    
     def predict(self, periods: int = None) -> pd.Series:
         """
         预测未来趋势
@@ -140,11 +278,91 @@ class AssetTrendAnalyzer:
         self.forecast.index = pd.date_range(
             start=last_date + pd.DateOffset(months=1),
             periods=periods,
-            freq="M"
+            freq="ME"
         )
         
         return self.forecast
     
+    def update(
+        self,
+        new_observations,
+        refit: bool = False
+    ) -> "AssetTrendAnalyzer":
+        """
+        追加新观测并更新模型（不从头拟合）
+        
+        默认沿用已拟合的参数，只用状态空间模型的 append 把卡尔曼滤波推进到新观测；
+        refit=True 时以原参数为初值重新估计，通常几次迭代即可收敛。
+        
+        Args:
+            new_observations: 新观测；Series 需带紧接历史之后的月份索引，数组则按月顺延
+            refit: 是否以原参数为初值重新估计参数
+        
+        Returns:
+            self
+        """
+        if self.model_fit is None:
+            raise ValueError("请先调用 fit() 或 load_state()")
+        
+        if not isinstance(new_observations, pd.Series):
+            values = np.atleast_1d(np.asarray(new_observations, dtype=np.float64))
+            new_observations = pd.Series(values, index=_future_index(self.series.index, len(values)))
+        
+        fit_kwargs = {"start_params": self.model_fit.params} if refit else None
+        self.model_fit = self.model_fit.append(new_observations, refit=refit, fit_kwargs=fit_kwargs)
+        self.model = self.model_fit.model
+        self.series = pd.concat([self.series, new_observations])
+        self.forecast = None
+        
+        return self
+    
+    def save_state(self, filepath: Optional[Path] = None) -> Path:
+        """
+        保存拟合状态（阶数、参数与历史序列），供下次 load_state() 后直接 update()
+        
+        Args:
+            filepath: 保存路径，默认 MODEL_DIR/asset_trend_state.pkl
+        
+        Returns:
+            保存路径
+        """
+        if self.model_fit is None:
+            raise ValueError("请先调用 fit()")
+        
+        filepath = Path(filepath or settings.MODEL_DIR / "asset_trend_state.pkl")
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        with open(filepath, "wb") as f:
+            pickle.dump({
+                "order": self.selected_order,
+                "params": np.asarray(self.model_fit.params),
+                "series": self.series,
+            }, f)
+        
+        return filepath
+    
+    def load_state(self, filepath: Optional[Path] = None) -> "AssetTrendAnalyzer":
+        """
+        加载拟合状态：按保存的参数对历史序列做一次滤波，不重新估计
+        
+        Args:
+            filepath: 状态文件路径，默认 MODEL_DIR/asset_trend_state.pkl
+        
+        Returns:
+            self
+        """
+        from statsmodels.tsa.arima.model import ARIMA
+        
+        filepath = Path(filepath or settings.MODEL_DIR / "asset_trend_state.pkl")
+        with open(filepath, "rb") as f:
+            state = pickle.load(f)
+        
+        self.selected_order = tuple(state["order"])
+        self.series = state["series"]
+        self.model = ARIMA(self.series, order=self.selected_order)
+        self.model_fit = self.model.filter(state["params"])
+        
+        return self
+    
     def analyze(
         self,
         df: pd.DataFrame,
@@ -208,6 +426,278 @@ class AssetTrendAnalyzer:
             "forecast_end_value": round(self.forecast.iloc[-1], 2),
         }
     
+    def prepare_segments(
+        self,
+        df: pd.DataFrame,
+        group_cols: Sequence[str] = ("branch_name", "customer_tier"),
+        date_col: str = "account_open_date",
+        value_col: str = "total_aum"
+    ) -> pd.DataFrame:
+        """
+        一次 groupby 汇总出所有分组的月度序列
+        
+        Args:
+            df: 原始数据
+            group_cols: 分组列
+            date_col: 日期列名
+            value_col: 值列名
+        
+        Returns:
+            宽表：每行一个分组，每列一个月份（pd.Period），无数据的月份为 NaN
+        """
+        group_cols = list(group_cols)
+        months = pd.to_datetime(df[date_col], errors="coerce").dt.to_period("M").rename("month")
+        
+        monthly = df.groupby(
+            [df[col] for col in group_cols] + [months], observed=True, sort=False
+        )[value_col].mean()
+        
+        wide = monthly.unstack("month")
+        full_range = pd.period_range(wide.columns.min(), wide.columns.max(), freq="M")
+        return wide.reindex(columns=full_range).sort_index()
+    
+    def forecast_segments(
+        self,
+        df: pd.DataFrame,
+        group_cols: Sequence[str] = ("branch_name", "customer_tier"),
+        date_col: str = "account_open_date",
+        value_col: str = "total_aum",
+        periods: int = None,
+        min_periods: int = 12,
+        n_jobs: Optional[int] = None,
+        timeout: float = 30.0,
+        engine: str = "arima"
+    ) -> pd.DataFrame:
+        """
+        按分组批量预测（如 支行 × 客户等级）
+        
+        先用一次 groupby 得到所有分组的月度序列，再把序列分批提交到进程池并行拟合 ARIMA。
+        每条序列单独限时（SIGALRM，仅 Unix 主线程可用），超时、拟合失败或样本不足时
+        退化为朴素预测（沿用最后一个观测值），不会拖住整批任务。
+        order="auto" 时各序列优先使用阶数缓存中的阶数，未缓存或缓存阶数拟合失败时
+        才在工作进程内搜索，新选出的阶数写回缓存。
+        engine 为向量化预测器时，整张宽表一次拟合，不再使用进程池。
+        
+        Args:
+            df: 原始数据
+            group_cols: 分组列
+            date_col: 日期列名
+            value_col: 值列名
+            periods: 预测周期数
+            min_periods: 拟合所需的最少月份数
+            n_jobs: 并行进程数，默认使用全部 CPU；1 表示在当前进程内顺序执行
+            timeout: 单条序列的拟合时限（秒），None 表示不限时
+            engine: 预测引擎 ('arima', 'ses', 'holt', 'seasonal_naive')
+        
+        Returns:
+            长表：分组列 + date / forecast / lower / upper / model / order / status / n_obs
+        """
+        if engine not in self.ENGINES:
+            raise ValueError(f"不支持的预测引擎: {engine}，可选 {self.ENGINES}")
+        
+        group_cols = list(group_cols)
+        periods = periods or self.forecast_periods
+        wide = self.prepare_segments(df, group_cols, date_col, value_col)
+        
+        if engine == "arima":
+            results = self._forecast_arima_segments(wide, periods, min_periods, n_jobs, timeout)
+        else:
+            results = _forecast_vectorized(wide, FORECASTERS[engine], periods, min_periods)
+        
+        self.segment_forecasts = _tidy_forecasts(results, group_cols, periods)
+        return self.segment_forecasts
+    
+    def _forecast_arima_segments(
+        self,
+        wide: pd.DataFrame,
+        periods: int,
+        min_periods: int,
+        n_jobs: Optional[int],
+        timeout: Optional[float]
+    ) -> List[Dict[str, Any]]:
+        """逐条序列拟合 ARIMA（进程池并行），返回各序列的预测结果"""
+        auto = self.order == "auto"
+        cache = self.load_order_cache() if auto else {}
+        
+        tasks = []
+        for key, row in zip(wide.index, wide.to_numpy(dtype=np.float64)):
+            observed = np.flatnonzero(~np.isnan(row))
+            if len(observed) == 0:
+                continue
+            # 从首个有数据的月份开始，中间缺失的月份沿用上一个值
+            values = pd.Series(row[observed[0]:]).ffill().to_numpy()
+            
+            if auto:
+                cached = cache.get(_series_key(key), {})
+                order = tuple(cached["order"]) if cached.get("criterion") == self.criterion else None
+            else:
+                order = tuple(self.order)
+            tasks.append((key, values, wide.columns[-1], order, None))
+        
+        return self._run_arima_tasks(tasks, periods, min_periods, n_jobs, timeout)
+    
+    def _run_arima_tasks(
+        self,
+        tasks: List[Tuple[Any, np.ndarray, pd.Period, Optional[Tuple[int, int, int]], Optional[np.ndarray]]],
+        periods: int,
+        min_periods: int,
+        n_jobs: Optional[int],
+        timeout: Optional[float],
+        refit: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        执行 ARIMA 预测任务，并记录阶数缓存与各序列的拟合状态
+        
+        Args:
+            tasks: (分组键, 序列值, 最后月份, 阶数, 已有参数) 列表
+            periods: 预测周期数
+            min_periods: 从头拟合所需的最少观测数
+            n_jobs: 并行进程数
+            timeout: 单次拟合时限（秒）
+            refit: 有已有参数时是否以其为初值重新估计（否则只做滤波）
+        
+        Returns:
+            各序列的预测结果
+        """
+        auto = self.order == "auto"
+        n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, len(tasks)))
+        search = (self.order_candidates, self.criterion) if auto else None
+        args = (periods, min_periods, timeout, search, refit)
+        
+        if n_jobs == 1:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                results = _forecast_chunk(tasks, *args)
+        else:
+            chunk_size = max(1, len(tasks) // (n_jobs * 4))
+            chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_forecast_worker) as pool:
+                futures = [pool.submit(_forecast_chunk, chunk, *args) for chunk in chunks]
+                results = [row for future in futures for row in future.result()]
+        
+        if auto:
+            self.update_order_cache({
+                _series_key(r["key"]): (r["order"], r["score"])
+                for r in results if r["model"] == "ARIMA"
+            })
+        
+        # 退化为朴素预测的序列也保留历史（阶数、参数为 None），下次有足够数据时再拟合
+        for (key, values, last_period, _, _), result in zip(tasks, results):
+            self.segment_states[_series_key(key)] = {
+                "key": key,
+                "order": result["order"],
+                "params": result["params"],
+                "values": values,
+                "last_period": last_period,
+            }
+        
+        return results
+    
+    def update_segments(
+        self,
+        df: pd.DataFrame,
+        group_cols: Sequence[str] = ("branch_name", "customer_tier"),
+        date_col: str = "account_open_date",
+        value_col: str = "total_aum",
+        periods: int = None,
+        min_periods: int = 12,
+        n_jobs: Optional[int] = None,
+        timeout: float = 30.0,
+        refit: bool = False
+    ) -> pd.DataFrame:
+        """
+        用新月份数据增量更新分组预测
+        
+        已有拟合状态的序列只把新月份接到历史之后，沿用原阶数和参数做一次滤波
+        （refit=True 时以原参数为初值重新估计），结果发散或失败时才从头拟合；
+        没有状态的新分组按 forecast_segments 的方式处理。
+        
+        Args:
+            df: 新月份的原始数据
+            group_cols: 分组列（需与生成状态时一致）
+            date_col: 日期列名
+            value_col: 值列名
+            periods: 预测周期数
+            min_periods: 从头拟合所需的最少月份数
+            n_jobs: 并行进程数
+            timeout: 单次拟合时限（秒）
+            refit: 是否以原参数为初值重新估计
+        
+        Returns:
+            与 forecast_segments 相同格式的长表
+        """
+        if not self.segment_states:
+            raise ValueError("请先调用 forecast_segments() 或 load_segment_state()")
+        
+        group_cols = list(group_cols)
+        periods = periods or self.forecast_periods
+        wide = self.prepare_segments(df, group_cols, date_col, value_col)
+        
+        states = list(self.segment_states.values())
+        start = min(wide.columns[0], min(state["last_period"] for state in states) + 1)
+        end = max(wide.columns[-1], max(state["last_period"] for state in states))
+        wide = wide.reindex(columns=pd.period_range(start, end, freq="M"))
+        rows = dict(zip(map(_series_key, wide.index), wide.to_numpy(dtype=np.float64)))
+        
+        default_order = None if self.order == "auto" else tuple(self.order)
+        
+        tasks = []
+        for state in states:
+            row = rows.pop(_series_key(state["key"]), np.full(wide.shape[1], np.nan))
+            new_values = row[wide.columns > state["last_period"]]
+            # 新月份缺失时沿用上一个值
+            values = pd.Series(np.r_[state["values"], new_values]).ffill().to_numpy()
+            order = state["order"] or default_order
+            tasks.append((state["key"], values, end, order, state["params"]))
+        
+        # 新出现的分组从头拟合
+        for key, row in zip(wide.index, wide.to_numpy(dtype=np.float64)):
+            observed = np.flatnonzero(~np.isnan(row))
+            if _series_key(key) not in rows or len(observed) == 0:
+                continue
+            values = pd.Series(row[observed[0]:]).ffill().to_numpy()
+            tasks.append((key, values, end, default_order, None))
+        
+        results = self._run_arima_tasks(tasks, periods, min_periods, n_jobs, timeout, refit=refit)
+        self.segment_forecasts = _tidy_forecasts(results, group_cols, periods)
+        return self.segment_forecasts
+    
+    def save_segment_state(self, filepath: Optional[Path] = None) -> Path:
+        """
+        保存分组序列的拟合状态
+        
+        Args:
+            filepath: 保存路径，默认 MODEL_DIR/asset_trend_segments.pkl
+        
+        Returns:
+            保存路径
+        """
+        if not self.segment_states:
+            raise ValueError("没有可保存的分组拟合状态，请先调用 forecast_segments()")
+        
+        filepath = Path(filepath or settings.MODEL_DIR / "asset_trend_segments.pkl")
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        with open(filepath, "wb") as f:
+            pickle.dump(self.segment_states, f)
+        
+        return filepath
+    
+    def load_segment_state(self, filepath: Optional[Path] = None) -> "AssetTrendAnalyzer":
+        """
+        加载分组序列的拟合状态
+        
+        Args:
+            filepath: 状态文件路径，默认 MODEL_DIR/asset_trend_segments.pkl
+        
+        Returns:
+            self
+        """
+        filepath = Path(filepath or settings.MODEL_DIR / "asset_trend_segments.pkl")
+        with open(filepath, "rb") as f:
+            self.segment_states = pickle.load(f)
+        
+        return self
+    
     def get_combined_series(self) -> pd.Series:
         """获取历史+预测的完整序列"""
         if self.series is None or self.forecast is None:
@@ -245,4 +735,589 @@ class AssetTrendAnalyzer:
         result_df.to_csv(filepath, index=False, encoding="utf-8-sig")
         
         return str(filepath)
+    
+    def save_segment_forecasts(
+        self,
+        output_dir: str = None,
+        prefix: str = ""
+    ) -> str:
+        """
+        保存分组预测结果
+        
+        Args:
+            output_dir: 输出目录
+            prefix: 文件名前缀
+        
+        Returns:
+            结果文件路径
+        """
+        if self.segment_forecasts is None:
+            raise ValueError("请先调用 forecast_segments()")
+        
+        output_dir = Path(output_dir) if output_dir else settings.OUTPUT_DIR / "reports"
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        filepath = output_dir / f"{prefix}asset_trend_segment_forecast.csv"
+        self.segment_forecasts.to_csv(filepath, index=False, encoding="utf-8-sig")
+        
+        return str(filepath)
+
+
+# ===== 分组批量预测的工作进程函数 =====
+
+def _init_forecast_worker() -> None:
+    """工作进程初始化：每个进程单线程 BLAS，并屏蔽 statsmodels 的收敛告警"""
+    threadpool_limits(1)
+    warnings.simplefilter("ignore")
+
+
+@contextmanager
+def _time_limit(seconds: Optional[float]) -> Iterator[None]:
+    """用 SIGALRM 限制代码块的运行时间；不支持时（Windows / 非主线程）不限时"""
+    if (
+        not seconds
+        or not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        yield
+        return
+    
+    def _raise_timeout(signum, frame):
+        raise TimeoutError
+    
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _series_key(key: Any) -> str:
+    """分组键 → 阶数缓存中的字符串键"""
+    return "|".join(map(str, key)) if isinstance(key, tuple) else str(key)
+
+
+def _fit_arima(
+    values: np.ndarray,
+    order: Tuple[int, int, int],
+    timeout: Optional[float],
+    params: Optional[np.ndarray] = None,
+    refit: bool = True,
+    strict: bool = False
+):
+    """
+    限时拟合单个阶数
+    
+    Args:
+        values: 序列值
+        order: ARIMA 阶数
+        timeout: 时限（秒）
+        params: 已有参数；给定时 refit=False 只做滤波，refit=True 以其为初值重新估计
+        refit: 见 params
+        strict: 自动定阶时为 True，AR / MA 根落在单位圆上的退化解也视为发散
+    
+    Returns:
+        (拟合结果, 状态)；超时、异常或发散时结果为 None
+    """
+    from statsmodels.tsa.arima.model import ARIMA
+    
+    try:
+        with _time_limit(timeout):
+            model = ARIMA(values, order=order)
+            if params is None:
+                result = model.fit()
+            elif refit:
+                result = model.fit(start_params=params)
+            else:
+                result = model.filter(params)
+    except TimeoutError:
+        return None, "超时"
+    except Exception:
+        return None, "拟合失败"
+    
+    if _diverged(result, check_roots=strict):
+        return None, "拟合失败"
+    return result, "成功"
+
+
+def _diverged(result, check_roots: bool = False, tol: float = 1e-3) -> bool:
+    """
+    拟合是否发散：未收敛、似然或参数非有限；check_roots=True 时 AR / MA 根落在
+    单位圆上也算（非平稳 / 不可逆的退化解，其信息准则不可信，只在定阶比较时剔除，
+    指定阶数的拟合仍照常使用）
+    """
+    if not (getattr(result, "mle_retvals", None) or {}).get("converged", True):
+        return True
+    if not (np.isfinite(result.llf) and np.all(np.isfinite(result.params))):
+        return True
+    if not check_roots:
+        return False
+    roots = np.r_[result.arroots, result.maroots]
+    return bool(len(roots)) and bool(np.any(np.abs(roots) < 1 + tol))
 
+
+def _score_order(
+    values: np.ndarray,
+    order: Tuple[int, int, int],
+    criterion: str,
+    timeout: Optional[float]
+) -> Optional[float]:
+    """单个候选阶数的信息准则值，发散时返回 None"""
+    result, _ = _fit_arima(values, order, timeout, strict=True)
+    return None if result is None else float(getattr(result, criterion))
+
+
+def _search_order(
+    candidates: List[Tuple[int, int, int]],
+    score_wave: Callable[[List[Tuple[int, int, int]]], List[Optional[float]]]
+) -> Optional[Tuple[Tuple[int, int, int], float]]:
+    """
+    分波次搜索最优阶数
+    
+    Args:
+        candidates: 候选 (p, d, q)
+        score_wave: 对一个波次的候选计算信息准则值（可并行），发散的候选返回 None
+    
+    Returns:
+        (最优阶数, 信息准则值)，全部发散时返回 None
+    """
+    waves: Dict[int, List[Tuple[int, int, int]]] = {}
+    for order in sorted(candidates):
+        waves.setdefault(order[0] + order[2], []).append(order)
+    
+    best = None
+    diverged: List[Tuple[int, int, int]] = []
+    
+    for complexity in sorted(waves):
+        wave = [
+            order for order in waves[complexity]
+            if not any(
+                order[1] == bad[1] and order[0] >= bad[0] and order[2] >= bad[2]
+                for bad in diverged
+            )
+        ]
+        if not wave:
+            continue
+        
+        improved = False
+        for order, value in zip(wave, score_wave(wave)):
+            if value is None:
+                diverged.append(order)
+            elif best is None or value < best[1]:
+                best = (order, value)
+                improved = True
+        
+        if best is not None and not improved:
+            break
+    
+    return best
+
+
+def _forecast_series(
+    values: np.ndarray,
+    order: Optional[Tuple[int, int, int]],
+    periods: int,
+    min_periods: int,
+    timeout: Optional[float],
+    search: Optional[Tuple[List[Tuple[int, int, int]], str]] = None,
+    params: Optional[np.ndarray] = None,
+    refit: bool = True
+) -> Dict[str, Any]:
+    """
+    拟合单条序列并预测；失败时退化为朴素预测
+    
+    Args:
+        values: 序列值
+        order: ARIMA 阶数；None 表示需要搜索
+        periods: 预测周期数
+        min_periods: 拟合所需的最少观测数
+        timeout: 单次拟合时限（秒）
+        search: 自动定阶时的 (候选阶数, 信息准则)；给定时 order 拟合失败也会重新搜索
+        params: 上次拟合的参数；给定时先沿用（热启动），失败再从头拟合
+        refit: 沿用参数时是否重新估计（否则只做滤波）
+    """
+    result, status = None, "样本不足"
+    if params is not None and order is not None:
+        result, status = _fit_arima(values, order, timeout, params=params, refit=refit)
+    
+    if result is None and len(values) >= min_periods:
+        result, status = (None, "拟合失败") if order is None else _fit_arima(values, order, timeout)
+        
+        if result is None and search is not None:
+            candidates, criterion = search
+            best = _search_order(
+                candidates,
+                lambda wave: [_score_order(values, o, criterion, timeout) for o in wave]
+            )
+            if best is not None:
+                order = best[0]
+                result, status = _fit_arima(values, order, timeout)
+    
+    if result is not None:
+        forecast = result.get_forecast(steps=periods)
+        interval = forecast.conf_int()
+        
+        if np.all(np.isfinite(forecast.predicted_mean)):
+            return {
+                "forecast": forecast.predicted_mean,
+                "lower": interval[:, 0],
+                "upper": interval[:, 1],
+                "model": "ARIMA",
+                "order": tuple(order),
+                "params": np.asarray(result.params),
+                "score": float(getattr(result, search[1] if search else "aic")),
+                "status": "成功",
+            }
+        status = "拟合失败"
+    
+    return {
+        "forecast": np.full(periods, values[-1]),
+        "lower": np.full(periods, np.nan),
+        "upper": np.full(periods, np.nan),
+        "model": "naive",
+        "order": None,
+        "params": None,
+        "score": np.nan,
+        "status": status,
+    }
+
+
+def _forecast_chunk(
+    tasks: List[Tuple[Any, np.ndarray, pd.Period, Optional[Tuple[int, int, int]], Optional[np.ndarray]]],
+    periods: int,
+    min_periods: int,
+    timeout: Optional[float],
+    search: Optional[Tuple[List[Tuple[int, int, int]], str]] = None,
+    refit: bool = True
+) -> List[Dict[str, Any]]:
+    """预测一批序列，减少进程间通信次数"""
+    return [
+        {
+            "key": key,
+            "last_period": last_period,
+            "n_obs": len(values),
+            **_forecast_series(values, order, periods, min_periods, timeout, search, params, refit),
+        }
+        for key, values, last_period, order, params in tasks
+    ]
+
+
+def _tidy_forecasts(
+    results: List[Dict[str, Any]],
+    group_cols: List[str],
+    periods: int
+) -> pd.DataFrame:
+    """将各序列的预测结果拼成长表"""
+    columns = group_cols + ["date", "forecast", "lower", "upper", "model", "order", "status", "n_obs"]
+    if not results:
+        return pd.DataFrame(columns=columns)
+    
+    keys = [r["key"] if isinstance(r["key"], tuple) else (r["key"],) for r in results]
+    table = pd.DataFrame(np.repeat(np.array(keys, dtype=object), periods, axis=0), columns=group_cols)
+    
+    steps = np.tile(np.arange(1, periods + 1), len(results))
+    last = pd.PeriodIndex([r["last_period"] for r in results], freq="M").repeat(periods)
+    table["date"] = (last + steps).to_timestamp()
+    
+    for col in ("forecast", "lower", "upper"):
+        table[col] = np.concatenate([r[col] for r in results])
+    for col in ("model", "status", "n_obs"):
+        table[col] = np.repeat([r[col] for r in results], periods)
+    table["order"] = np.repeat(
+        [",".join(map(str, r["order"])) if r["order"] else "" for r in results], periods
+    )
+    
+    return table[columns]
+
+
+
+# ===== 向量化预测器 =====
+
+class VectorForecaster(ABC):
+    """
+    向量化预测器基类
+    
+    一次处理形如 (序列数, 月份数) 的二维数组，每行一条按月对齐的序列，NaN 表示该月
+    没有观测（序列开始之前或中途缺失）。递推沿时间轴逐列进行、在序列维度上整体向量化，
+    10 万条序列的成本与一条序列的 Python 循环次数相同。
+    与 AssetTrendAnalyzer 一样使用 fit() / predict()，也接受一维数组或单个 Series。
+    """
+    
+    name = "base"
+    
+    def __init__(self, forecast_periods: int = 4, chunk_size: int = 1000):
+        """
+        Args:
+            forecast_periods: 默认预测周期数
+            chunk_size: 每次参与参数网格递推的序列数（控制内存）
+        """
+        self.forecast_periods = forecast_periods
+        self.chunk_size = chunk_size
+        self.params: Dict[str, np.ndarray] = {}
+        self.last_value: Optional[np.ndarray] = None
+        self._index = None
+        self._columns = None
+        self._squeeze = False
+    
+    def fit(self, data) -> "VectorForecaster":
+        """
+        拟合所有序列
+        
+        Args:
+            data: 二维数组 / DataFrame（行为序列，列为月份），或一维数组 / Series（单条序列）
+        
+        Returns:
+            self
+        """
+        values = self._to_matrix(data)
+        if values.shape[1] == 0:
+            raise ValueError("序列长度为 0，无法拟合")
+        
+        observed = ~np.isnan(values)
+        last = values.shape[1] - 1 - np.argmax(observed[:, ::-1], axis=1)
+        self.last_value = np.where(observed.any(axis=1), values[np.arange(len(values)), last], np.nan)
+        
+        self._fit(values)
+        return self
+    
+    def predict(self, periods: int = None):
+        """
+        预测未来各期
+        
+        Args:
+            periods: 预测周期数
+        
+        Returns:
+            与输入形式一致：二维输入返回 (序列数, periods) 数组或 DataFrame，
+            一维输入返回一维数组或 Series
+        """
+        if self.last_value is None:
+            raise ValueError("请先调用 fit()")
+        
+        periods = periods or self.forecast_periods
+        forecast = self._predict(periods)
+        future = _future_index(self._columns, periods) if self._columns is not None else None
+        
+        if self._squeeze:
+            return pd.Series(forecast[0], index=future) if future is not None else forecast[0]
+        if self._index is not None:
+            return pd.DataFrame(forecast, index=self._index, columns=future)
+        return forecast
+    
+    def fit_predict(self, data, periods: int = None):
+        """拟合并预测"""
+        return self.fit(data).predict(periods)
+    
+    def _to_matrix(self, data) -> np.ndarray:
+        """统一为二维 float64 数组，并记录行列索引以便还原输出形式"""
+        self._squeeze = np.ndim(data) == 1
+        self._index = data.index if isinstance(data, pd.DataFrame) else None
+        self._columns = (
+            data.columns if isinstance(data, pd.DataFrame)
+            else data.index if isinstance(data, pd.Series) else None
+        )
+        return np.atleast_2d(np.asarray(data, dtype=np.float64))
+    
+    @abstractmethod
+    def _fit(self, values: np.ndarray) -> None:
+        """拟合 (序列数, 月份数) 矩阵，参数存入 self.params"""
+        pass
+    
+    @abstractmethod
+    def _predict(self, periods: int) -> np.ndarray:
+        """预测未来 periods 期，返回 (序列数, periods) 矩阵"""
+        pass
+
+
+class HoltForecaster(VectorForecaster):
+    """
+    Holt 线性趋势指数平滑
+    
+    平滑参数按序列选择：所有 (alpha, beta) 网格点在同一次递推中并行计算，
+    每条序列取一步预测误差平方和最小的组合。缺失月份按趋势外推、不做更新。
+    """
+    
+    name = "Holt"
+    trend = True
+    
+    def __init__(
+        self,
+        forecast_periods: int = 4,
+        alphas: Sequence[float] = tuple(np.linspace(0.1, 1.0, 10)),
+        betas: Sequence[float] = tuple(np.linspace(0.05, 0.5, 10)),
+        chunk_size: int = 1000
+    ):
+        """
+        Args:
+            forecast_periods: 默认预测周期数
+            alphas: 水平平滑系数候选
+            betas: 趋势平滑系数候选
+            chunk_size: 每次参与网格递推的序列数
+        """
+        super().__init__(forecast_periods, chunk_size)
+        self.alphas = np.asarray(alphas, dtype=np.float64)
+        self.betas = np.asarray(betas, dtype=np.float64) if self.trend else np.zeros(1)
+    
+    def _fit(self, values: np.ndarray) -> None:
+        alpha_grid, beta_grid = (g.ravel() for g in np.meshgrid(self.alphas, self.betas, indexing="ij"))
+        
+        fitted = {name: np.empty(len(values)) for name in ("alpha", "beta", "level", "slope", "sigma2")}
+        for start in range(0, len(values), self.chunk_size):
+            rows = slice(start, start + self.chunk_size)
+            chunk = _smooth_grid(values[rows], alpha_grid, beta_grid, self.trend)
+            for name in fitted:
+                fitted[name][rows] = chunk[name]
+        
+        self.params = fitted
+    
+    def _predict(self, periods: int) -> np.ndarray:
+        steps = np.arange(1, periods + 1)
+        return self.params["level"][:, None] + self.params["slope"][:, None] * steps
+
+
+class SESForecaster(HoltForecaster):
+    """简单指数平滑（无趋势，按序列在 alpha 网格上选择平滑系数）"""
+    
+    name = "SES"
+    trend = False
+    
+    def __init__(
+        self,
+        forecast_periods: int = 4,
+        alphas: Sequence[float] = tuple(np.linspace(0.05, 1.0, 20)),
+        chunk_size: int = 1000
+    ):
+        super().__init__(forecast_periods, alphas=alphas, chunk_size=chunk_size)
+
+
+class SeasonalNaiveForecaster(VectorForecaster):
+    """季节朴素预测：第 h 期取上一个季节周期同月的值，历史不足一个周期时沿用最后一个值"""
+    
+    name = "SeasonalNaive"
+    
+    def __init__(self, forecast_periods: int = 4, season_length: int = 12):
+        super().__init__(forecast_periods)
+        self.season_length = season_length
+    
+    def _fit(self, values: np.ndarray) -> None:
+        m = self.season_length
+        season = values[:, -m:] if values.shape[1] >= m else np.full((len(values), m), np.nan)
+        # 同月缺失时退化为最后一个观测值
+        self.params = {"season": np.where(np.isnan(season), self.last_value[:, None], season)}
+    
+    def _predict(self, periods: int) -> np.ndarray:
+        return self.params["season"][:, np.arange(periods) % self.season_length]
+
+
+FORECASTERS = {
+    "ses": SESForecaster,
+    "holt": HoltForecaster,
+    "seasonal_naive": SeasonalNaiveForecaster,
+}
+
+
+def _smooth_grid(
+    values: np.ndarray,
+    alphas: np.ndarray,
+    betas: np.ndarray,
+    trend: bool
+) -> Dict[str, np.ndarray]:
+    """
+    对一批序列同时递推所有平滑参数组合，按一步预测误差平方和为每条序列选出最优组合
+    
+    Args:
+        values: (序列数, 月份数)，NaN 表示无观测
+        alphas: 水平平滑系数，(组合数,)
+        betas: 趋势平滑系数，(组合数,)
+        trend: 是否包含趋势项
+    
+    Returns:
+        每条序列的 alpha / beta / level / slope / sigma2
+    """
+    n, T = values.shape
+    observed = ~np.isnan(values)
+    first = np.argmax(observed, axis=1)
+    rows = np.arange(n)
+    
+    # 初始水平为首个观测值，初始趋势为前两个观测值之差
+    level = np.repeat(values[rows, first][:, None], len(alphas), axis=1)
+    slope = np.zeros_like(level)
+    if trend:
+        second = np.minimum(first + 1, T - 1)
+        slope += np.nan_to_num(values[rows, second] - values[rows, first])[:, None]
+    
+    sse = np.zeros_like(level)
+    n_errors = np.zeros(n)
+    step = alphas * betas
+    
+    # 未观测时误差记为 0：已开始的序列水平按趋势外推、趋势不变，尚未开始的序列保持初值
+    for t in range(T):
+        started = (t > first)[:, None]
+        update = started & observed[:, t:t + 1]
+        
+        prediction = level + slope * started
+        error = np.where(update, values[:, t:t + 1] - prediction, 0.0)
+        sse += error * error
+        n_errors += update[:, 0]
+        
+        level = prediction
+        level += alphas * error
+        if trend:
+            slope += step * error
+    
+    best = np.argmin(sse, axis=1)
+    return {
+        "alpha": alphas[best],
+        "beta": betas[best],
+        "level": level[rows, best],
+        "slope": slope[rows, best],
+        "sigma2": sse[rows, best] / np.maximum(n_errors, 1),
+    }
+
+
+def _future_index(columns: pd.Index, periods: int) -> pd.Index:
+    """历史列索引之后 periods 个月的索引"""
+    if isinstance(columns, pd.PeriodIndex):
+        return pd.period_range(columns[-1] + 1, periods=periods, freq=columns.freq)
+    if isinstance(columns, pd.DatetimeIndex):
+        return pd.DatetimeIndex([columns[-1] + pd.DateOffset(months=h) for h in range(1, periods + 1)])
+    return pd.RangeIndex(len(columns), len(columns) + periods)
+
+
+def _forecast_vectorized(
+    wide: pd.DataFrame,
+    forecaster_cls: type,
+    periods: int,
+    min_periods: int
+) -> List[Dict[str, Any]]:
+    """用向量化预测器一次预测宽表中的所有分组，观测不足的分组退化为朴素预测"""
+    values = wide.to_numpy(dtype=np.float64)
+    observed = ~np.isnan(values)
+    has_data = observed.any(axis=1)
+    values, observed = values[has_data], observed[has_data]
+    
+    forecaster = forecaster_cls(forecast_periods=periods).fit(values)
+    forecast = forecaster.predict(periods)
+    enough = observed.sum(axis=1) >= min_periods
+    forecast[~enough] = forecaster.last_value[~enough, None]
+    
+    n_obs = values.shape[1] - np.argmax(observed, axis=1)
+    nan = np.full(periods, np.nan)
+    
+    return [
+        {
+            "key": key,
+            "last_period": wide.columns[-1],
+            "n_obs": int(count),
+            "forecast": row,
+            "lower": nan,
+            "upper": nan,
+            "model": forecaster.name if ok else "naive",
+            "order": None,
+            "score": np.nan,
+            "status": "成功" if ok else "样本不足",
+        }
+        for key, row, ok, count in zip(wide.index[has_data], forecast, enough, n_obs)
+    ]
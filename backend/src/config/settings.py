@@ -42,11 +42,17 @@ class Settings:
     
     # ===== 聚类配置 =====
     DEFAULT_N_CLUSTERS: int = 3
+    CLUSTER_EVAL_SAMPLE_SIZE: int = 10000  # 轮廓系数抽样样本量
+    CLUSTER_PROJECTION_SAMPLE_SIZE: int = 5000  # 聚类散点图的分层抽样点数
     
     # ===== 关联分析配置 =====
     APRIORI_MIN_SUPPORT: float = 0.05
     APRIORI_MIN_LIFT: float = 1.0
     
+    # ===== 模型解释配置 =====
+    EXPLANATION_TOP_N: int = 5  # 每位客户保存的影响因素数
+    EXPLANATION_CACHE_SIZE: int = 10000  # 解释查询接口的 LRU 缓存容量
+    
     def __post_init__(self):
         """初始化后创建必要的目录"""
         self.DATA_DIR.mkdir(parents=True, exist_ok=True)
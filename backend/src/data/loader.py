@@ -5,7 +5,7 @@
 
 import pandas as pd
 from pathlib import Path
-from typing import Optional, Union
+from typing import Iterator, Optional, Union
 from sqlalchemy import text
 
 from ..config import settings, db_config
@@ -58,6 +58,51 @@ class DataLoader:
         
         raise ValueError(f"无法读取文件 {filepath}，请检查文件编码")
     
+    def iter_csv_chunks(
+        self,
+        filename: str,
+        chunksize: int = 100000,
+        encoding: Optional[str] = None,
+        **kwargs
+    ) -> Iterator[pd.DataFrame]:
+        """
+        分块读取 CSV 文件（用于超过内存的大表）
+        
+        Args:
+            filename: 文件名或完整路径
+            chunksize: 每块行数
+            encoding: 指定编码，默认根据文件头部自动检测
+            **kwargs: 传递给 pd.read_csv 的其他参数
+        
+        Yields:
+            DataFrame 数据块
+        """
+        filepath = Path(filename)
+        if not filepath.is_absolute():
+            filepath = self.data_dir / filename
+        
+        encoding = encoding or self._detect_encoding(filepath)
+        
+        with pd.read_csv(filepath, encoding=encoding, chunksize=chunksize, **kwargs) as reader:
+            yield from reader
+    
+    @staticmethod
+    def _detect_encoding(filepath: Path, sample_bytes: int = 1 << 20) -> str:
+        """根据文件头部字节检测编码，尝试顺序与 load_csv 一致"""
+        with open(filepath, "rb") as f:
+            sample = f.read(sample_bytes)
+        
+        for enc in ["utf-8", "gbk", "utf-8-sig", "latin1"]:
+            try:
+                sample.decode(enc)
+                return enc
+            except UnicodeDecodeError as e:
+                # 采样截断在多字节字符中间时不算解码失败
+                if e.start >= len(sample) - 4:
+                    return enc
+        
+        raise ValueError(f"无法识别文件 {filepath} 的编码")
+    
     def load_customer_base(self) -> pd.DataFrame:
         """加载客户基础信息表"""
         return self.load_csv("customer_base.csv")
@@ -72,6 +117,22 @@ class DataLoader:
         behavior = self.load_customer_behavior()
         return pd.merge(base, behavior, on="customer_id", how="inner")
     
+    def iter_merged_chunks(self, chunksize: int = 100000) -> Iterator[pd.DataFrame]:
+        """
+        分块加载合并后的客户数据
+        
+        客户基础信息表常驻内存，行为资产表按块读取后逐块关联
+        
+        Args:
+            chunksize: 行为资产表每块行数
+        
+        Yields:
+            合并后的 DataFrame 数据块
+        """
+        base = self.load_customer_base()
+        for behavior in self.iter_csv_chunks("customer_behavior_assets.csv", chunksize=chunksize):
+            yield pd.merge(base, behavior, on="customer_id", how="inner")
+    
     def query_sql(self, sql: str, database: Optional[str] = None) -> pd.DataFrame:
         """
         执行 SQL 查询
@@ -2,6 +2,16 @@
 from .high_value_predictor import HighValuePredictor
 from .customer_clustering import CustomerClustering
 from .base import BaseModel
+from .evaluation import ThresholdAnalyzer, ScoreCalibrator
+from .cluster_profiler import ClusterProfiler, ClusterProfile
 
-__all__ = ["HighValuePredictor", "CustomerClustering", "BaseModel"]
+__all__ = [
+    "HighValuePredictor",
+    "CustomerClustering",
+    "BaseModel",
+    "ThresholdAnalyzer",
+    "ScoreCalibrator",
+    "ClusterProfiler",
+    "ClusterProfile",
+]
 
@@ -47,11 +47,7 @@ class BaseModel(ABC):
         filepath.parent.mkdir(parents=True, exist_ok=True)
         
         with open(filepath, "wb") as f:
-            pickle.dump({
-                "model": self.model,
-                "metadata": self.metadata,
-                "is_fitted": self.is_fitted,
-            }, f)
+            pickle.dump(self._get_state(), f)
         
         return filepath
     
@@ -69,13 +65,24 @@ class BaseModel(ABC):
             filepath = settings.MODEL_DIR / f"{self.name}.pkl"
         
         with open(filepath, "rb") as f:
-            data = pickle.load(f)
-            self.model = data["model"]
-            self.metadata = data["metadata"]
-            self.is_fitted = data["is_fitted"]
+            self._set_state(pickle.load(f))
         
         return self
     
+    def _get_state(self) -> Dict[str, Any]:
+        """需要持久化的状态，子类可扩展（如标准化器）"""
+        return {
+            "model": self.model,
+            "metadata": self.metadata,
+            "is_fitted": self.is_fitted,
+        }
+    
+    def _set_state(self, data: Dict[str, Any]) -> None:
+        """从持久化状态恢复"""
+        self.model = data["model"]
+        self.metadata = data["metadata"]
+        self.is_fitted = data["is_fitted"]
+    
     def get_params(self) -> Dict[str, Any]:
         """获取模型参数"""
         if self.model is not None and hasattr(self.model, "get_params"):
@@ -0,0 +1,188 @@
+"""
+聚类质量指标
+提供可线性扩展的近似指标，避免在全量数据上计算 O(n²) 的轮廓系数
+"""
+
+from statistics import NormalDist
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+from sklearn.metrics import silhouette_score
+
+
+def sampled_silhouette(
+    X: np.ndarray,
+    labels: np.ndarray,
+    sample_size: int = 10000,
+    n_repeats: int = 5,
+    confidence: float = 0.95,
+    random_state: int = 42
+) -> Dict[str, float]:
+    """
+    抽样轮廓系数
+    
+    样本量不超过 sample_size 时直接计算精确值；否则重复抽样计算，
+    返回均值及正态近似的置信区间。每次抽样成本为 O(sample_size²)，与总量无关。
+    
+    Args:
+        X: 特征矩阵
+        labels: 群组标签
+        sample_size: 每次抽样的样本量
+        n_repeats: 抽样次数
+        confidence: 置信水平
+        random_state: 随机种子
+    
+    Returns:
+        {'mean', 'std', 'ci_low', 'ci_high'}
+    """
+    X = np.asarray(X)
+    labels = np.asarray(labels)
+    n = len(X)
+    
+    if n <= sample_size:
+        score = float(silhouette_score(X, labels))
+        return {"mean": score, "std": 0.0, "ci_low": score, "ci_high": score}
+    
+    rng = np.random.default_rng(random_state)
+    scores = []
+    for _ in range(n_repeats):
+        idx = rng.choice(n, size=sample_size, replace=False)
+        if len(np.unique(labels[idx])) < 2:
+            continue
+        scores.append(silhouette_score(X[idx], labels[idx]))
+    
+    if not scores:
+        raise ValueError("抽样结果中群组数不足 2 个，无法计算轮廓系数")
+    
+    scores = np.asarray(scores)
+    mean = float(scores.mean())
+    std = float(scores.std(ddof=1)) if len(scores) > 1 else 0.0
+    half_width = NormalDist().inv_cdf((1 + confidence) / 2) * std / float(np.sqrt(len(scores)))
+    
+    return {
+        "mean": mean,
+        "std": std,
+        "ci_low": mean - half_width,
+        "ci_high": mean + half_width,
+    }
+
+
+def _iter_center_distances(
+    X: np.ndarray,
+    centers: np.ndarray,
+    chunk_size: int = 65536
+) -> Iterator[Tuple[slice, np.ndarray]]:
+    """分块计算样本到各质心的欧氏距离，内存占用为 O(chunk_size·k)"""
+    center_sq = np.sum(centers ** 2, axis=1)
+    for start in range(0, len(X), chunk_size):
+        block = X[start:start + chunk_size]
+        sq = np.sum(block ** 2, axis=1, keepdims=True) - 2 * block @ centers.T + center_sq
+        yield slice(start, start + len(block)), np.sqrt(np.maximum(sq, 0))
+
+
+def centroid_statistics(
+    X: np.ndarray,
+    labels: np.ndarray,
+    centers: np.ndarray
+) -> Dict[str, float]:
+    """
+    基于质心的聚类指标（O(n·k)）
+    
+    - simplified_silhouette: 以“到本群质心距离”代替群内平均距离、
+      以“到最近其他质心距离”代替最近群平均距离的简化轮廓系数
+    - davies_bouldin_score: 由群内到质心平均距离与质心间距计算的 DB 指数（越小越好）
+    
+    Args:
+        X: 特征矩阵
+        labels: 群组标签
+        centers: 质心矩阵
+    
+    Returns:
+        {'simplified_silhouette', 'davies_bouldin_score'}
+    """
+    X = np.asarray(X, dtype=np.float64)
+    labels = np.asarray(labels)
+    centers = np.asarray(centers, dtype=np.float64)
+    k = len(centers)
+    
+    silhouette_sum = 0.0
+    intra_sum = np.zeros(k)
+    
+    for rows, dist in _iter_center_distances(X, centers):
+        block_labels = labels[rows]
+        own = dist[np.arange(len(dist)), block_labels]
+        
+        dist[np.arange(len(dist)), block_labels] = np.inf
+        nearest_other = dist.min(axis=1)
+        
+        denom = np.maximum(own, nearest_other)
+        silhouette_sum += np.sum(np.divide(
+            nearest_other - own, denom,
+            out=np.zeros_like(own), where=denom > 0
+        ))
+        intra_sum += np.bincount(block_labels, weights=own, minlength=k)
+    
+    counts = np.bincount(labels, minlength=k)
+    scatter = np.divide(intra_sum, counts, out=np.zeros(k), where=counts > 0)
+    
+    center_dist = np.sqrt(np.sum((centers[:, None, :] - centers[None, :, :]) ** 2, axis=2))
+    
+    # 与 sklearn 的 davies_bouldin_score 一致：群内距离或质心间距全为 0 时记为 0，
+    # 重合（距离近似为 0）的质心对不参与比较
+    if k < 2 or np.allclose(scatter, 0) or np.allclose(center_dist, 0):
+        davies_bouldin = 0.0
+    else:
+        center_dist[np.isclose(center_dist, 0)] = np.inf
+        ratio = (scatter[:, None] + scatter[None, :]) / center_dist
+        davies_bouldin = float(np.mean(ratio.max(axis=1)))
+    
+    return {
+        "simplified_silhouette": float(silhouette_sum / len(X)) if len(X) else 0.0,
+        "davies_bouldin_score": davies_bouldin,
+    }
+
+
+def chunked_calinski_harabasz(
+    X: np.ndarray,
+    labels: np.ndarray,
+    chunk_size: int = 65536
+) -> float:
+    """
+    分块计算 Calinski-Harabasz 指数（与 sklearn 结果一致）
+    
+    sklearn 的实现会按群组复制样本行；这里分两遍扫描：先累加各群组的和与样本数，
+    再按群组均值累加群内离差平方和，只读访问 X，适用于只读 memmap。
+    
+    Args:
+        X: 特征矩阵
+        labels: 群组标签（0 ~ k-1）
+        chunk_size: 每块行数
+    
+    Returns:
+        CH 指数
+    """
+    labels = np.asarray(labels)
+    n = len(X)
+    k = int(labels.max()) + 1 if n else 0
+    counts = np.bincount(labels, minlength=k)
+    if n == 0 or np.count_nonzero(counts) < 2:
+        raise ValueError("群组数不足 2 个，无法计算 CH 指数")
+    
+    sums = np.zeros((k, X.shape[1]))
+    for start in range(0, n, chunk_size):
+        block = np.asarray(X[start:start + chunk_size], dtype=np.float64)
+        np.add.at(sums, labels[start:start + chunk_size], block)
+    
+    means = sums / np.maximum(counts, 1)[:, None]
+    overall = sums.sum(axis=0) / n
+    extra_disp = float(np.sum(counts * np.sum((means - overall) ** 2, axis=1)))
+    
+    intra_disp = 0.0
+    for start in range(0, n, chunk_size):
+        block = np.asarray(X[start:start + chunk_size], dtype=np.float64)
+        intra_disp += float(np.sum((block - means[labels[start:start + chunk_size]]) ** 2))
+    
+    n_labels = np.count_nonzero(counts)
+    if intra_disp == 0.0:
+        return 1.0
+    return extra_disp * (n - n_labels) / (intra_disp * (n_labels - 1))
@@ -0,0 +1,238 @@
+"""
+群组画像引擎
+一次排序 / bincount 计算所有群组的统计量，复杂度与群组数无关
+"""
+
+import hashlib
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class ClusterProfile:
+    """
+    群组画像结果
+    
+    Attributes:
+        counts: 各群组客户数（Series，索引为群组编号）
+        numeric: 数值特征统计，列为 (特征, 统计量) 的 MultiIndex，
+            统计量包括 mean / std / count 及各分位数（如 q50）
+        categorical: 类别特征构成 {列名: 群组 × 类别 的占比表}
+        fingerprint: 数据指纹，用于判断缓存是否可复用
+    """
+    
+    def __init__(
+        self,
+        counts: pd.Series,
+        numeric: pd.DataFrame,
+        categorical: Dict[str, pd.DataFrame],
+        fingerprint: str = ""
+    ):
+        self.counts = counts
+        self.numeric = numeric
+        self.categorical = categorical
+        self.fingerprint = fingerprint
+    
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+    
+    def summary(self, stats: Sequence[str] = ("mean", "std", "count")) -> pd.DataFrame:
+        """
+        与 df.groupby("cluster")[numeric_cols].agg(["mean", "std", "count"]) 结构一致的摘要表
+        
+        Args:
+            stats: 需要的统计量
+        
+        Returns:
+            群组统计摘要
+        """
+        stats = list(stats)
+        mask = self.numeric.columns.get_level_values(1).isin(stats)
+        summary = self.numeric.loc[self.counts > 0, mask]
+        features = summary.columns.get_level_values(0).unique()
+        return summary.reindex(columns=pd.MultiIndex.from_product([features, stats]))
+    
+    def to_frame(self) -> pd.DataFrame:
+        """展开为一张宽表（便于导出报表）"""
+        numeric = self.numeric.copy()
+        numeric.columns = [f"{feature}_{stat}" for feature, stat in numeric.columns]
+        
+        frames = [self.counts.rename("count").to_frame(), numeric]
+        for col, mix in self.categorical.items():
+            frames.append(mix.add_prefix(f"{col}_"))
+        return pd.concat(frames, axis=1)
+
+
+class ClusterProfiler:
+    """
+    群组画像计算器
+    
+    - 计数、均值、标准差：按群组编号 bincount 累加，O(n·d)
+    - 分位数：按群组编号稳定排序一次（各列共用），每列只在群组内排序后按偏移取位置
+    - 类别构成：群组编号 × 类别编码合成一个下标后 bincount
+    
+    缺失值处理与 pandas 一致：均值、标准差、分位数忽略缺失值，count 为非缺失数量。
+    """
+    
+    DEFAULT_CATEGORICAL = ["occupation", "city_level"]
+    
+    def __init__(
+        self,
+        quantiles: Sequence[float] = (0.25, 0.5, 0.75),
+        categorical_cols: Optional[List[str]] = None
+    ):
+        self.quantiles = np.asarray(quantiles, dtype=np.float64)
+        self.categorical_cols = categorical_cols or self.DEFAULT_CATEGORICAL
+    
+    def fingerprint(self, df: pd.DataFrame, labels: np.ndarray) -> str:
+        """
+        数据指纹：行数、列名、群组标签，以及画像用到的数值列和类别列的逐行哈希
+        （群组标签不变而数据刷新时，画像缓存同样失效）
+        """
+        digest = hashlib.sha1(np.ascontiguousarray(labels, dtype=np.int64).tobytes())
+        digest.update("|".join(map(str, df.columns)).encode("utf-8"))
+        
+        used_cols = list(df.select_dtypes(include=[np.number]).columns)
+        used_cols += [col for col in self.categorical_cols if col in df.columns and col not in used_cols]
+        if used_cols:
+            digest.update(pd.util.hash_pandas_object(df[used_cols], index=False).to_numpy().tobytes())
+        return f"{len(df)}-{digest.hexdigest()}"
+    
+    def profile(
+        self,
+        df: pd.DataFrame,
+        labels: Optional[np.ndarray] = None,
+        cluster_col: str = "cluster",
+        n_clusters: Optional[int] = None,
+        numeric_cols: Optional[List[str]] = None
+    ) -> ClusterProfile:
+        """
+        计算群组画像
+        
+        Args:
+            df: 客户数据
+            labels: 群组标签，默认取 df[cluster_col]
+            cluster_col: 群组列名
+            n_clusters: 群组数，默认为最大编号 + 1
+            numeric_cols: 需要统计的数值列，默认为除群组列外的全部数值列
+        
+        Returns:
+            ClusterProfile
+        """
+        if labels is None:
+            if cluster_col not in df.columns:
+                raise ValueError(f"数据中没有 {cluster_col} 列，请先进行聚类")
+            labels = df[cluster_col].to_numpy()
+        labels = np.asarray(labels, dtype=np.int64)
+        
+        k = n_clusters or (int(labels.max()) + 1 if len(labels) else 0)
+        counts = np.bincount(labels, minlength=k)
+        index = pd.RangeIndex(k, name=cluster_col)
+        
+        if numeric_cols is None:
+            numeric_cols = [
+                c for c in df.select_dtypes(include=[np.number]).columns if c != cluster_col
+            ]
+        
+        # 按群组排序一次，之后每列只需在各群组区间内排序
+        group_order = np.argsort(labels, kind="stable")
+        bounds = np.r_[0, np.cumsum(counts)]
+        
+        numeric = {}
+        for col in numeric_cols:
+            for stat, values in self._numeric_stats(
+                df[col].to_numpy(dtype=np.float64), labels, k, group_order, bounds
+            ).items():
+                numeric[(col, stat)] = values
+        
+        categorical = {
+            col: self._category_mix(df[col], labels, k, index)
+            for col in self.categorical_cols if col in df.columns
+        }
+        
+        return ClusterProfile(
+            counts=pd.Series(counts, index=index),
+            numeric=pd.DataFrame(numeric, index=index),
+            categorical=categorical,
+            fingerprint=self.fingerprint(df, labels),
+        )
+    
+    def _numeric_stats(
+        self,
+        values: np.ndarray,
+        labels: np.ndarray,
+        k: int,
+        group_order: np.ndarray,
+        bounds: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        """单列的群组统计量"""
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        
+        n = np.bincount(labels, weights=valid, minlength=k)
+        mean = np.divide(
+            np.bincount(labels, weights=filled, minlength=k), n,
+            out=np.full(k, np.nan), where=n > 0
+        )
+        
+        # 以群组均值为中心累加平方差，避免 E[x²] - E[x]² 的精度损失
+        centered = np.where(valid, values - mean[labels], 0.0)
+        sq = np.bincount(labels, weights=centered ** 2, minlength=k)
+        std = np.sqrt(np.divide(sq, n - 1, out=np.full(k, np.nan), where=n > 1))
+        
+        stats = {"mean": mean, "std": std, "count": n.astype(np.int64)}
+        stats.update(self._quantiles(values[group_order], bounds, n.astype(np.int64)))
+        return stats
+    
+    def _quantiles(
+        self,
+        grouped: np.ndarray,
+        bounds: np.ndarray,
+        n_valid: np.ndarray
+    ) -> Dict[str, np.ndarray]:
+        """各群组区间内排序后，按位置线性插值得到分位数（缺失值排在区间末尾）"""
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            grouped[start:end].sort()
+        starts = bounds[:-1]
+        
+        # (k, q) 的插值位置
+        pos = self.quantiles[None, :] * np.maximum(n_valid - 1, 0)[:, None]
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.ceil(pos).astype(np.int64)
+        frac = pos - lo
+        
+        has_values = (n_valid > 0)[:, None]
+        lo_idx = np.where(has_values, starts[:, None] + lo, 0)
+        hi_idx = np.where(has_values, starts[:, None] + hi, 0)
+        
+        if len(grouped):
+            result = grouped[lo_idx] + frac * (grouped[hi_idx] - grouped[lo_idx])
+        else:
+            result = np.zeros(lo.shape)
+        result = np.where(has_values, result, np.nan)
+        
+        return {
+            f"q{round(q * 100):g}": result[:, i] for i, q in enumerate(self.quantiles)
+        }
+    
+    @staticmethod
+    def _category_mix(
+        series: pd.Series,
+        labels: np.ndarray,
+        k: int,
+        index: pd.Index
+    ) -> pd.DataFrame:
+        """群组 × 类别 的占比表（缺失类别不计入）"""
+        codes, categories = pd.factorize(series, sort=True)
+        valid = codes >= 0
+        m = len(categories)
+        
+        counts = np.bincount(
+            labels[valid] * m + codes[valid], minlength=k * m
+        ).reshape(k, m)
+        totals = counts.sum(axis=1, keepdims=True)
+        shares = np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0)
+        
+        return pd.DataFrame(shares, index=index, columns=pd.Index(categories, name=series.name))
@@ -3,16 +3,27 @@
 使用 K-Means 对客户进行聚类分析
 """
 
+import os
+import tempfile
+import uuid
 import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-from sklearn.cluster import KMeans
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from sklearn.metrics import silhouette_score, calinski_harabasz_score
+from sklearn.decomposition import PCA, IncrementalPCA
+from threadpoolctl import threadpool_limits
 
 from .base import BaseModel
+from .cluster_metrics import (
+    sampled_silhouette,
+    centroid_statistics,
+    chunked_calinski_harabasz,
+)
+from .cluster_profiler import ClusterProfiler, ClusterProfile
 from ..config import settings
 from ..data import FeatureEngineer
 
@@ -35,14 +46,18 @@ class CustomerClustering(BaseModel):
         self,
         name: str = "customer_clustering",
         n_clusters: int = None,
-        features: Optional[List[str]] = None
+        features: Optional[List[str]] = None,
+        eval_sample_size: int = None
     ):
         super().__init__(name)
         self.n_clusters = n_clusters or settings.DEFAULT_N_CLUSTERS
         self.features = features or self.DEFAULT_FEATURES
+        self.eval_sample_size = eval_sample_size or settings.CLUSTER_EVAL_SAMPLE_SIZE
         self.scaler = StandardScaler()
         self.pca = PCA(n_components=2)
         self.feature_engineer = FeatureEngineer()
+        self.profiler = ClusterProfiler()
+        self.projection: Optional[pd.DataFrame] = None
     
     def prepare_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -92,6 +107,11 @@ class CustomerClustering(BaseModel):
         self.model.fit(X_scaled)
         
         self.is_fitted = True
+        self._start_run()
+        
+        # 可视化投影只在训练时拟合一次
+        self.pca = PCA(n_components=2).fit(X_scaled)
+        self._build_projection(X, self.model.labels_)
         
         # 评估
         metrics = self.evaluate(X_scaled)
@@ -100,6 +120,134 @@ class CustomerClustering(BaseModel):
         
         return metrics
     
+    def fit_streaming(
+        self,
+        chunks: Callable[[], Iterable[pd.DataFrame]],
+        batch_size: int = 4096,
+        reservoir_size: int = 20000,
+        max_epochs: int = 10,
+        tol: float = 1e-3
+    ) -> Dict[str, float]:
+        """
+        流式训练聚类模型（Mini-Batch K-Means，内存占用固定）
+        
+        第一遍扫描增量拟合标准化参数并维护蓄水池样本，用样本上的 K-Means 结果
+        作为初始质心；之后逐块按 mini-batch 更新质心，直到质心位移和样本惯性收敛。
+        收敛后再扫描一遍全量数据，计算最终质心下的惯性。
+        
+        Args:
+            chunks: 返回原始数据块迭代器的函数（每轮扫描调用一次），
+                如 lambda: loader.iter_merged_chunks(100000)
+            batch_size: mini-batch 大小
+            reservoir_size: 蓄水池样本量（用于初始化和评估）
+            max_epochs: 最大扫描轮数
+            tol: 收敛阈值（标准化空间中质心最大位移）
+        
+        Returns:
+            评估指标字典：inertia 为全量数据上的惯性，sample_inertia 及其余指标
+            基于蓄水池样本（与批量模式指标口径一致）
+        """
+        rng = np.random.default_rng(42)
+        self.scaler = StandardScaler()
+        reservoir = None
+        n_seen = 0
+        
+        # 第一遍：标准化参数 + 蓄水池抽样
+        for chunk in chunks():
+            X = self.prepare_data(chunk)
+            self.scaler.partial_fit(X)
+            reservoir = self._update_reservoir(
+                reservoir, X.to_numpy(dtype=np.float64), n_seen, reservoir_size, rng
+            )
+            n_seen += len(X)
+        
+        if reservoir is None or len(reservoir) < self.n_clusters:
+            raise ValueError("样本量不足，无法完成聚类")
+        
+        sample_scaled = self.scaler.transform(pd.DataFrame(reservoir, columns=self.features))
+        
+        # 用蓄水池样本上的 K-Means 质心作为初始值
+        seed = KMeans(n_clusters=self.n_clusters, random_state=42, n_init=10).fit(sample_scaled)
+        self.model = MiniBatchKMeans(
+            n_clusters=self.n_clusters,
+            init=seed.cluster_centers_,
+            n_init=1,
+            batch_size=batch_size,
+            random_state=42
+        )
+        
+        history = []
+        centers = seed.cluster_centers_.copy()
+        ipca = IncrementalPCA(n_components=2)
+        for epoch in range(max_epochs):
+            for chunk in chunks():
+                values = self.scaler.transform(self.prepare_data(chunk))
+                for start in range(0, len(values), batch_size):
+                    batch = values[start:start + batch_size]
+                    self.model.partial_fit(batch)
+                    # 投影在第一轮扫描中增量拟合（每批样本数需不少于主成分数）
+                    if epoch == 0 and len(batch) >= ipca.n_components:
+                        ipca.partial_fit(batch)
+            
+            shift = float(np.max(np.linalg.norm(self.model.cluster_centers_ - centers, axis=1)))
+            centers = self.model.cluster_centers_.copy()
+            history.append({
+                "epoch": epoch + 1,
+                "center_shift": shift,
+                "sample_inertia": float(-self.model.score(sample_scaled)),
+            })
+            # 质心不再移动，或样本惯性不再下降时停止
+            if shift < tol or (len(history) > 1 and history[-1]["sample_inertia"] >= history[-2]["sample_inertia"]):
+                break
+        
+        # 最后一遍：全量数据在最终质心下的惯性
+        inertia = 0.0
+        for chunk in chunks():
+            inertia += float(-self.model.score(self.scaler.transform(self.prepare_data(chunk))))
+        
+        self.is_fitted = True
+        self._start_run()
+        
+        sample_labels = self.model.predict(sample_scaled)
+        self.pca = ipca
+        self._build_projection(pd.DataFrame(reservoir, columns=self.features), sample_labels)
+        
+        metrics = self.evaluate(sample_scaled, labels=sample_labels)
+        metrics["sample_inertia"] = metrics["inertia"]
+        metrics["inertia"] = inertia
+        self.metadata["metrics"] = metrics
+        self.metadata["features"] = self.features
+        self.metadata["convergence"] = history
+        self.metadata["n_samples_seen"] = n_seen
+        
+        return metrics
+    
+    @staticmethod
+    def _update_reservoir(
+        reservoir: Optional[np.ndarray],
+        values: np.ndarray,
+        n_seen: int,
+        size: int,
+        rng: np.random.Generator
+    ) -> np.ndarray:
+        """蓄水池抽样（Algorithm R 的向量化版本），保证每行被抽中的概率相同"""
+        if reservoir is None:
+            reservoir = np.empty((0, values.shape[1]))
+        
+        # 蓄水池未满时直接填充
+        n_fill = min(size - len(reservoir), len(values))
+        if n_fill > 0:
+            reservoir = np.vstack([reservoir, values[:n_fill]])
+        
+        rest = values[n_fill:]
+        if len(rest) > 0:
+            positions = n_seen + n_fill + np.arange(len(rest))
+            slots = (rng.random(len(rest)) * (positions + 1)).astype(np.int64)
+            hit = slots < size
+            reservoir[slots[hit]] = rest[hit]
+        
+        return reservoir
+    
     def predict(self, X: pd.DataFrame) -> np.ndarray:
         """
         预测客户所属群组
@@ -116,6 +264,247 @@ class CustomerClustering(BaseModel):
         X_scaled = self.scaler.transform(X)
         return self.model.predict(X_scaled)
     
+    def _get_state(self) -> Dict[str, Any]:
+        """标准化器、特征列表随模型一起保存，增量分群需要沿用同一标准化空间"""
+        state = super()._get_state()
+        state.update({
+            "scaler": self.scaler,
+            "pca": self.pca,
+            "features": self.features,
+            "n_clusters": self.n_clusters,
+            "projection": self.projection,
+        })
+        return state
+    
+    def _set_state(self, data: Dict[str, Any]) -> None:
+        super()._set_state(data)
+        # 兼容旧版本保存的模型文件（没有标准化器）
+        if "scaler" in data:
+            self.scaler = data["scaler"]
+            self.pca = data["pca"]
+            self.features = data["features"]
+            self.n_clusters = data["n_clusters"]
+            self.projection = data.get("projection")
+    
+    def build_snapshot(
+        self,
+        X: pd.DataFrame,
+        ids: Iterable,
+        labels: Optional[np.ndarray] = None,
+        id_col: str = "customer_id"
+    ) -> pd.DataFrame:
+        """
+        生成分群快照（客户 ID + 特征 + 群组），作为下次增量分群的基准
+        
+        Args:
+            X: 特征矩阵
+            ids: 客户 ID
+            labels: 群组标签，默认用当前模型预测
+            id_col: 客户 ID 列名
+        
+        Returns:
+            快照 DataFrame
+        """
+        snapshot = X[self.features].reset_index(drop=True).astype(np.float64)
+        snapshot.insert(0, id_col, np.asarray(ids))
+        snapshot["cluster"] = self.predict(X) if labels is None else np.asarray(labels)
+        return snapshot
+    
+    def save_snapshot(self, snapshot: pd.DataFrame, filepath: Optional[Path] = None) -> Path:
+        """
+        保存分群快照
+        
+        Args:
+            snapshot: build_snapshot / fit_incremental 返回的快照
+            filepath: 保存路径，默认保存到 models/saved 目录
+        
+        Returns:
+            保存的文件路径
+        """
+        if filepath is None:
+            filepath = settings.MODEL_DIR / f"{self.name}_snapshot.pkl"
+        
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        snapshot.to_pickle(filepath)
+        return filepath
+    
+    def load_snapshot(self, filepath: Optional[Path] = None) -> pd.DataFrame:
+        """
+        加载分群快照
+        
+        Args:
+            filepath: 快照文件路径
+        
+        Returns:
+            快照 DataFrame
+        """
+        if filepath is None:
+            filepath = settings.MODEL_DIR / f"{self.name}_snapshot.pkl"
+        return pd.read_pickle(filepath)
+    
+    def fit_incremental(
+        self,
+        X: pd.DataFrame,
+        ids: Iterable,
+        snapshot: pd.DataFrame,
+        id_col: str = "customer_id",
+        refit_threshold: float = 0.3,
+        max_iter: int = 10
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        增量重新分群
+        
+        沿用上次的标准化参数，以上次质心为起点：
+        - 变动客户（新增或特征变化）占比不超过 refit_threshold 时，只对变动客户重新分配，
+          质心由保留客户的累计和/计数加上变动客户增量更新（已移除客户的贡献随之扣除），
+          未变动客户保持原群组；
+        - 否则以上次质心为初始值对全量数据重新执行 K-Means，并用匈牙利算法
+          按质心距离将新群组与旧群组一一对应，保证群组编号（及 CLUSTER_LABELS）不漂移。
+        
+        Args:
+            X: 当前特征矩阵
+            ids: 与 X 对应的客户 ID
+            snapshot: 上次的分群快照
+            id_col: 客户 ID 列名
+            refit_threshold: 触发全量重算的变动客户占比
+            max_iter: 增量更新的最大迭代次数
+        
+        Returns:
+            (delta, snapshot)：群组发生变化的客户（新增/变更/移除），以及新的分群快照
+        """
+        if not self.is_fitted:
+            raise ValueError("模型尚未训练，请先加载上次的聚类模型")
+        
+        ids = np.asarray(ids)
+        k = self.n_clusters
+        previous = snapshot.set_index(id_col)
+        prev_labels = previous["cluster"].to_numpy()
+        prev_values = previous[self.features].to_numpy(dtype=np.float64)
+        values = X[self.features].to_numpy(dtype=np.float64)
+        
+        # 与上次快照对齐，识别新增、特征变化和已移除的客户
+        pos = previous.index.get_indexer(ids)
+        is_new = pos < 0
+        matched = np.where(is_new, 0, pos)
+        changed = is_new | np.any(prev_values[matched] != values, axis=1)
+        
+        removed = np.ones(len(previous), dtype=bool)
+        removed[pos[~is_new]] = False
+        
+        old_centers = self.model.cluster_centers_.copy()
+        labels = np.where(is_new, -1, prev_labels[matched])
+        
+        if changed.mean() > refit_threshold:
+            mode = "refit"
+            X_scaled = self.scaler.transform(X[self.features])
+            kmeans = KMeans(n_clusters=k, init=old_centers, n_init=1).fit(X_scaled)
+            mapping = self._match_clusters(old_centers, kmeans.cluster_centers_)
+            kmeans.cluster_centers_ = kmeans.cluster_centers_[np.argsort(mapping)]
+            kmeans.labels_ = mapping[kmeans.labels_]
+            self.model = kmeans
+            labels = kmeans.labels_
+        else:
+            mode = "incremental"
+            centers = old_centers
+            if changed.any() or removed.any():
+                # 保留客户（未变动且未移除）的累计和与计数
+                leaving = removed.copy()
+                leaving[pos[changed & ~is_new]] = True
+                stay = ~leaving
+                prev_scaled = self.scaler.transform(previous.loc[stay, self.features])
+                base_sums = _group_sums(prev_scaled, prev_labels[stay], k)
+                base_counts = np.bincount(prev_labels[stay], minlength=k)
+                
+                # 只对变动客户交替执行分配与质心更新
+                changed_scaled = (
+                    self.scaler.transform(X.loc[X.index[changed], self.features])
+                    if changed.any() else np.empty((0, len(self.features)))
+                )
+                changed_labels = None
+                for _ in range(max_iter):
+                    new_labels = self._nearest_center(changed_scaled, centers)
+                    if changed_labels is not None and np.array_equal(new_labels, changed_labels):
+                        break
+                    changed_labels = new_labels
+                    sums = base_sums + _group_sums(changed_scaled, changed_labels, k)
+                    counts = base_counts + np.bincount(changed_labels, minlength=k)
+                    centers = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+                
+                labels = labels.copy()
+                labels[changed] = changed_labels
+            self.model.cluster_centers_ = centers
+            self.model.labels_ = labels
+            self.model.inertia_ = float(np.sum((self.scaler.transform(X[self.features]) - centers[labels]) ** 2))
+        
+        self._start_run()
+        self._build_projection(X, labels)
+        self.metadata["incremental"] = {
+            "mode": mode,
+            "n_changed": int(changed.sum()),
+            "n_new": int(is_new.sum()),
+            "n_removed": int(removed.sum()),
+            "center_shift": float(np.max(np.linalg.norm(self.model.cluster_centers_ - old_centers, axis=1))),
+        }
+        
+        # 只输出群组发生变化的客户
+        prev_cluster = np.where(is_new, -1, prev_labels[matched])
+        moved = labels != prev_cluster
+        prev_col = np.concatenate([prev_cluster[moved], prev_labels[removed]])
+        new_col = np.concatenate([labels[moved], np.full(removed.sum(), -1)])
+        
+        delta = pd.DataFrame({
+            id_col: np.concatenate([ids[moved], previous.index.to_numpy()[removed]]),
+            "previous_cluster": pd.array(prev_col, dtype="Int64"),
+            "cluster": pd.array(new_col, dtype="Int64"),
+            "label": [
+                self.CLUSTER_LABELS.get(int(c), f"群组{int(c)}") if c >= 0 else None
+                for c in new_col
+            ],
+            "status": np.select([prev_col < 0, new_col < 0], ["新增", "移除"], default="变更"),
+        })
+        for col in ("previous_cluster", "cluster"):
+            delta[col] = delta[col].mask(delta[col] < 0)
+        
+        return delta, self.build_snapshot(X, ids, labels=labels, id_col=id_col)
+    
+    @staticmethod
+    def _nearest_center(X_scaled: np.ndarray, centers: np.ndarray) -> np.ndarray:
+        """最近质心分配"""
+        sq = np.sum(centers ** 2, axis=1) - 2 * X_scaled @ centers.T
+        return np.argmin(sq, axis=1)
+    
+    @staticmethod
+    def _match_clusters(old_centers: np.ndarray, new_centers: np.ndarray) -> np.ndarray:
+        """
+        匈牙利算法匹配新旧群组
+        
+        Returns:
+            mapping，mapping[新群组编号] = 对应的旧群组编号
+        """
+        cost = np.sum((new_centers[:, None, :] - old_centers[None, :, :]) ** 2, axis=2)
+        rows, cols = linear_sum_assignment(cost)
+        mapping = np.empty(len(new_centers), dtype=np.int64)
+        mapping[rows] = cols
+        return mapping
+    
+    def export_assigner(self, filepath: Optional[Path] = None) -> Path:
+        """
+        导出轻量级分群分配器（供在线服务使用，不依赖 sklearn）
+        
+        Args:
+            filepath: 保存路径，默认保存到 models/saved 目录
+        
+        Returns:
+            保存的文件路径
+        """
+        from ..serving import SegmentAssigner
+        
+        if filepath is None:
+            filepath = settings.MODEL_DIR / f"{self.name}_assigner.npz"
+        
+        return SegmentAssigner.from_clustering(self).save(filepath)
+    
     def fit_predict(self, X: pd.DataFrame) -> np.ndarray:
         """
         训练并预测
@@ -123,82 +512,133 @@ class CustomerClustering(BaseModel):
         self.fit(X)
         return self.predict(X)
     
-    def evaluate(self, X_scaled: np.ndarray) -> Dict[str, float]:
+    def evaluate(
+        self,
+        X_scaled: np.ndarray,
+        labels: Optional[np.ndarray] = None
+    ) -> Dict[str, float]:
         """
         评估聚类效果
         
+        所有指标均为线性复杂度：轮廓系数按 eval_sample_size 抽样计算并给出置信区间，
+        简化轮廓系数与 DB 指数基于质心距离计算
+        
         Args:
             X_scaled: 标准化后的特征矩阵
+            labels: X_scaled 对应的群组标签，默认使用训练时的 labels_
         
         Returns:
             评估指标字典
         """
-        labels = self.model.labels_
+        if labels is None:
+            labels = self.model.labels_
+            inertia = self.model.inertia_
+        else:
+            inertia = float(np.sum((X_scaled - self.model.cluster_centers_[labels]) ** 2))
+        
+        silhouette = sampled_silhouette(X_scaled, labels, sample_size=self.eval_sample_size)
+        centroid_metrics = centroid_statistics(X_scaled, labels, self.model.cluster_centers_)
         
         return {
-            "silhouette_score": silhouette_score(X_scaled, labels),
-            "calinski_harabasz_score": calinski_harabasz_score(X_scaled, labels),
-            "inertia": self.model.inertia_,
+            "silhouette_score": silhouette["mean"],
+            "silhouette_ci_low": silhouette["ci_low"],
+            "silhouette_ci_high": silhouette["ci_high"],
+            **centroid_metrics,
+            "calinski_harabasz_score": chunked_calinski_harabasz(X_scaled, labels),
+            "inertia": inertia,
         }
     
-    def get_cluster_summary(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _start_run(self) -> None:
+        """标记一次新的聚类结果，之前缓存的群组画像随之失效"""
+        self.metadata["run_id"] = uuid.uuid4().hex
+        self.metadata.pop("profile", None)
+    
+    def profile(self, df: Optional[pd.DataFrame] = None, cluster_col: str = "cluster") -> ClusterProfile:
         """
-        获取各群组的统计摘要
+        群组画像（按聚类结果缓存）
+        
+        画像随模型保存在 metadata 中，同一次聚类结果、同一份数据重复调用时直接复用；
+        不传数据时返回已缓存的画像（如 Dashboard 只加载模型文件）。
         
         Args:
             df: 包含 cluster 列的数据
+            cluster_col: 群组列名
         
         Returns:
-            各群组统计摘要
+            ClusterProfile
         """
-        if "cluster" not in df.columns:
-            raise ValueError("数据中没有 cluster 列，请先进行聚类")
+        cached = self.metadata.get("profile")
+        if df is None:
+            if cached is None:
+                raise ValueError("尚无缓存的群组画像，请传入包含 cluster 列的数据")
+            return cached
+        
+        if cluster_col not in df.columns:
+            raise ValueError(f"数据中没有 {cluster_col} 列，请先进行聚类")
+        
+        labels = df[cluster_col].to_numpy()
+        if cached is not None and cached.fingerprint == self.profiler.fingerprint(df, labels):
+            return cached
         
-        # 数值列统计
-        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-        if "cluster" in numeric_cols:
-            numeric_cols.remove("cluster")
+        profile = self.profiler.profile(
+            df, labels=labels, cluster_col=cluster_col, n_clusters=self.n_clusters
+        )
+        self.metadata["profile"] = profile
+        return profile
+    
+    def get_cluster_summary(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        获取各群组的统计摘要
         
-        summary = df.groupby("cluster")[numeric_cols].agg(["mean", "std", "count"])
+        Args:
+            df: 包含 cluster 列的数据
         
-        return summary
+        Returns:
+            各群组统计摘要
+        """
+        return self.profile(df).summary()
     
-    def get_cluster_profiles(self, df: pd.DataFrame) -> Dict[int, Dict]:
+    def get_cluster_profiles(self, df: Optional[pd.DataFrame] = None) -> Dict[int, Dict]:
         """
         获取各群组的画像
         
         Args:
-            df: 包含 cluster 列的数据
+            df: 包含 cluster 列的数据，默认使用缓存的画像
         
         Returns:
             各群组画像字典
         """
-        if "cluster" not in df.columns:
-            raise ValueError("数据中没有 cluster 列")
+        profile = self.profile(df)
+        total = profile.total
         
         profiles = {}
         
         for cluster_id in range(self.n_clusters):
-            cluster_data = df[df["cluster"] == cluster_id]
+            count = int(profile.counts.get(cluster_id, 0))
             
-            profile = {
-                "count": len(cluster_data),
-                "percentage": len(cluster_data) / len(df) * 100,
+            cluster_profile = {
+                "count": count,
+                "percentage": count / total * 100 if total else 0.0,
                 "label": self.CLUSTER_LABELS.get(cluster_id, f"群组{cluster_id}"),
             }
             
             # 添加各特征的均值
             for feature in self.features:
-                if feature in cluster_data.columns:
-                    profile[f"avg_{feature}"] = cluster_data[feature].mean()
+                if (feature, "mean") in profile.numeric.columns:
+                    cluster_profile[f"avg_{feature}"] = profile.numeric.at[cluster_id, (feature, "mean")]
+            
+            # 类别特征构成（如职业、城市等级）
+            for col, mix in profile.categorical.items():
+                shares = mix.loc[cluster_id]
+                cluster_profile[f"{col}_mix"] = shares[shares > 0].sort_values(ascending=False).to_dict()
             
-            profiles[cluster_id] = profile
+            profiles[cluster_id] = cluster_profile
         
         return profiles
     
     def get_pca_coordinates(self, X: pd.DataFrame) -> np.ndarray:
         """
-        获取 PCA 降维后的坐标（用于可视化）
+        获取 PCA 降维后的坐标（使用训练时拟合的投影，不重新拟合）
         
         Args:
             X: 特征矩阵
@@ -207,12 +647,69 @@ class CustomerClustering(BaseModel):
             2D 坐标数组
         """
         X_scaled = self.scaler.transform(X)
-        return self.pca.fit_transform(X_scaled)
+        # 兼容旧版本模型文件：没有拟合过的投影时补拟合一次
+        if not hasattr(self.pca, "components_"):
+            self.pca.fit(X_scaled)
+        return self.pca.transform(X_scaled)
+    
+    def get_projection_sample(self) -> pd.DataFrame:
+        """
+        训练时预先计算的分层抽样二维坐标（用于聚类散点图）
+        
+        Returns:
+            包含 pca_1、pca_2、cluster、label 列的 DataFrame
+        """
+        if self.projection is None:
+            raise ValueError("模型中没有投影样本，请先训练模型")
+        
+        sample = self.projection.copy()
+        sample["label"] = sample["cluster"].map(
+            lambda c: self.CLUSTER_LABELS.get(int(c), f"群组{int(c)}")
+        )
+        return sample
+    
+    def _build_projection(
+        self,
+        X: pd.DataFrame,
+        labels: np.ndarray,
+        sample_size: Optional[int] = None,
+        min_per_cluster: int = 50,
+        random_state: int = 42
+    ) -> None:
+        """
+        按群组分层抽样并投影到二维
+        
+        各群组按客户占比分配样本点，但至少保留 min_per_cluster 个点，
+        保证小群组在散点图中可见；只对抽中的行做标准化和投影。
+        """
+        sample_size = sample_size or settings.CLUSTER_PROJECTION_SAMPLE_SIZE
+        labels = np.asarray(labels)
+        
+        counts = np.bincount(labels, minlength=self.n_clusters)
+        quota = np.minimum(
+            counts,
+            np.maximum(np.round(sample_size * counts / max(len(labels), 1)), min_per_cluster)
+        ).astype(np.int64)
+        
+        # 随机键排序后按群组取前 quota 个，等价于各群组内无放回抽样
+        rng = np.random.default_rng(random_state)
+        order = np.lexsort((rng.random(len(labels)), labels))
+        rank = np.arange(len(labels)) - np.r_[0, np.cumsum(counts)[:-1]][labels[order]]
+        rows = np.sort(order[rank < quota[labels[order]]])
+        
+        coords = self.pca.transform(self.scaler.transform(X[self.features].iloc[rows]))
+        self.projection = pd.DataFrame({
+            "pca_1": coords[:, 0].astype(np.float32),
+            "pca_2": coords[:, 1].astype(np.float32),
+            "cluster": labels[rows],
+        })
     
     def find_optimal_clusters(
         self,
         X: pd.DataFrame,
-        max_clusters: int = 10
+        max_clusters: int = 10,
+        n_jobs: Optional[int] = None,
+        warm_start: bool = False
     ) -> Dict[int, float]:
         """
         寻找最优聚类数（肘部法则 + 轮廓系数）
@@ -220,17 +717,135 @@ class CustomerClustering(BaseModel):
         Args:
             X: 特征矩阵
             max_clusters: 最大聚类数
+            n_jobs: 并行进程数，默认使用全部 CPU
+            warm_start: 是否用 k 的质心热启动 k+1（顺序执行）
         
         Returns:
             各聚类数对应的轮廓系数
         """
-        X_scaled = self.scaler.fit_transform(X)
+        sweep = self.sweep_clusters(
+            X, max_clusters=max_clusters, n_jobs=n_jobs, warm_start=warm_start
+        )
+        return sweep["silhouette_score"].to_dict()
+    
+    def sweep_clusters(
+        self,
+        X: pd.DataFrame,
+        min_clusters: int = 2,
+        max_clusters: int = 10,
+        n_jobs: Optional[int] = None,
+        warm_start: bool = False,
+        n_init: int = 10
+    ) -> pd.DataFrame:
+        """
+        并行扫描聚类数
         
-        scores = {}
-        for k in range(2, max_clusters + 1):
-            kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-            labels = kmeans.fit_predict(X_scaled)
-            scores[k] = silhouette_score(X_scaled, labels)
+        标准化只做一次，结果写入临时 .npy 文件，各工作进程以 memmap 只读方式共享，
+        不会为每个 k 序列化一份数据。
         
-        return scores
+        Args:
+            X: 特征矩阵
+            min_clusters: 最小聚类数
+            max_clusters: 最大聚类数
+            n_jobs: 并行进程数，默认使用全部 CPU
+            warm_start: 是否用 k 的结果热启动 k+1（保留 k 的质心，并将误差最大的群组一分为二）；
+                开启后各 k 依次执行，每个 k 只需一次初始化
+            n_init: 非热启动时每个 k 的随机初始化次数
+        
+        Returns:
+            以 k 为索引的指标表（inertia、抽样轮廓系数、CH 指数、DB 指数等）
+        """
+        X_scaled = self.scaler.fit_transform(X)
+        ks = list(range(min_clusters, max_clusters + 1))
+        
+        if warm_start:
+            rows = _sweep_warm_start(X_scaled, ks, self.eval_sample_size)
+        else:
+            with tempfile.TemporaryDirectory(prefix="cluster_sweep_") as tmp_dir:
+                data_path = os.path.join(tmp_dir, "X_scaled.npy")
+                np.save(data_path, X_scaled)
+                
+                n_jobs = min(n_jobs or os.cpu_count() or 1, len(ks))
+                with ProcessPoolExecutor(
+                    max_workers=n_jobs,
+                    initializer=_init_sweep_worker,
+                    initargs=(data_path,)
+                ) as pool:
+                    rows = list(pool.map(
+                        _fit_k, ks,
+                        [n_init] * len(ks),
+                        [self.eval_sample_size] * len(ks)
+                    ))
+        
+        return pd.DataFrame(rows).set_index("k")
+
+
+def _group_sums(values: np.ndarray, labels: np.ndarray, k: int) -> np.ndarray:
+    """按群组对各列求和，返回 (k, n_features)"""
+    return np.stack(
+        [np.bincount(labels, weights=values[:, j], minlength=k) for j in range(values.shape[1])],
+        axis=1
+    ) if len(values) else np.zeros((k, values.shape[1]))
+
+
+# ===== 聚类数扫描的工作进程函数 =====
+
+_SWEEP_DATA: Optional[np.ndarray] = None
+
+
+def _init_sweep_worker(data_path: str) -> None:
+    """工作进程初始化：以 memmap 方式打开共享的标准化矩阵"""
+    global _SWEEP_DATA
+    _SWEEP_DATA = np.load(data_path, mmap_mode="r")
 
+
+def _score_k(
+    X: np.ndarray,
+    labels: np.ndarray,
+    centers: np.ndarray,
+    inertia: float,
+    eval_sample_size: int
+) -> Dict[str, float]:
+    """计算单个 k 的评估指标（只读访问 X）"""
+    return {
+        "k": len(centers),
+        "inertia": inertia,
+        "silhouette_score": sampled_silhouette(X, labels, sample_size=eval_sample_size)["mean"],
+        "calinski_harabasz_score": chunked_calinski_harabasz(X, labels),
+        **centroid_statistics(X, labels, centers),
+    }
+
+
+def _fit_k(k: int, n_init: int, eval_sample_size: int) -> Dict[str, float]:
+    """在共享矩阵上拟合单个 k（每个进程单线程，避免多进程间线程超额订阅）"""
+    with threadpool_limits(limits=1):
+        # memmap 为只读，copy_x=True（默认）时 KMeans 在工作进程内复制一份再原地中心化
+        kmeans = KMeans(n_clusters=k, random_state=42, n_init=n_init).fit(np.asarray(_SWEEP_DATA))
+        return _score_k(
+            _SWEEP_DATA, kmeans.labels_, kmeans.cluster_centers_, kmeans.inertia_, eval_sample_size
+        )
+
+
+def _sweep_warm_start(
+    X: np.ndarray,
+    ks: List[int],
+    eval_sample_size: int
+) -> List[Dict[str, float]]:
+    """依次拟合各 k，k+1 以 k 的质心为基础、将误差平方和最大的群组一分为二作为初始值"""
+    rows = []
+    kmeans = None
+    
+    for k in ks:
+        if kmeans is None:
+            kmeans = KMeans(n_clusters=k, random_state=42, n_init=10).fit(X)
+        else:
+            labels, centers = kmeans.labels_, kmeans.cluster_centers_
+            sse = np.bincount(labels, weights=np.sum((X - centers[labels]) ** 2, axis=1), minlength=len(centers))
+            worst = int(np.argmax(sse))
+            split = KMeans(n_clusters=2, random_state=42, n_init=1).fit(X[labels == worst])
+            init = np.vstack([np.delete(centers, worst, axis=0), split.cluster_centers_])
+            kmeans = KMeans(n_clusters=k, init=init, n_init=1).fit(X)
+        
+        rows.append(_score_k(X, kmeans.labels_, kmeans.cluster_centers_, kmeans.inertia_, eval_sample_size))
+    
+    return rows
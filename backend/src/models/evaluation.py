@@ -0,0 +1,262 @@
+"""
+二分类评估与阈值优化模块
+一次排序得到所有阈值下的混淆矩阵，并提供概率校准
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Optional
+
+
+class ThresholdAnalyzer:
+    """
+    阈值分析器
+    
+    对预测分数做一次降序排序并累加正负样本数，得到每个不同分数作为阈值时的
+    TP/FP；之后任意阈值的混淆矩阵、目标精确率阈值、Top-K 阈值都只需二分查找，
+    总成本为 O(n log n)，与查询多少个阈值无关。
+    """
+    
+    def __init__(self, y_true, y_score):
+        y_true = np.asarray(y_true).astype(np.int64).ravel()
+        y_score = np.asarray(y_score, dtype=np.float64).ravel()
+        
+        if len(y_true) != len(y_score):
+            raise ValueError("y_true 与 y_score 长度不一致")
+        
+        order = np.argsort(-y_score, kind="mergesort")
+        self.sorted_scores = y_score[order]
+        sorted_labels = y_true[order]
+        
+        # 每个不同分数的最后一个位置即该阈值下“预测为正”的边界
+        distinct = np.flatnonzero(np.diff(self.sorted_scores))
+        boundaries = np.r_[distinct, len(y_score) - 1] if len(y_score) else np.array([], dtype=int)
+        
+        self.thresholds = self.sorted_scores[boundaries]
+        self.tp = np.cumsum(sorted_labels)[boundaries]
+        self.fp = boundaries + 1 - self.tp
+        self.n_pos = int(sorted_labels.sum())
+        self.n_neg = len(y_true) - self.n_pos
+        self.n = len(y_true)
+    
+    def _counts_at(self, threshold: float):
+        """分数 >= threshold 判为正类时的 (TP, FP)"""
+        k = np.searchsorted(-self.thresholds, -threshold, side="right")
+        if k == 0:
+            return 0, 0
+        return int(self.tp[k - 1]), int(self.fp[k - 1])
+    
+    def confusion_at(self, threshold: float = 0.5) -> Dict[str, int]:
+        """
+        指定阈值下的混淆矩阵
+        
+        Args:
+            threshold: 分类阈值
+        
+        Returns:
+            {'tp', 'fp', 'fn', 'tn'}
+        """
+        tp, fp = self._counts_at(threshold)
+        return {
+            "tp": tp,
+            "fp": fp,
+            "fn": self.n_pos - tp,
+            "tn": self.n_neg - fp,
+        }
+    
+    def metrics_at(self, threshold: float = 0.5) -> Dict[str, float]:
+        """
+        指定阈值下的分类指标
+        
+        Args:
+            threshold: 分类阈值
+        
+        Returns:
+            accuracy / precision / recall / f1
+        """
+        cm = self.confusion_at(threshold)
+        tp, fp, fn, tn = cm["tp"], cm["fp"], cm["fn"], cm["tn"]
+        
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        
+        return {
+            "accuracy": (tp + tn) / self.n if self.n else 0.0,
+            "precision": precision,
+            "recall": recall,
+            "f1": f1,
+        }
+    
+    def curve(self) -> pd.DataFrame:
+        """
+        全部阈值下的 ROC / PR 曲线数据
+        
+        Returns:
+            每个阈值一行的 DataFrame
+        """
+        tp = self.tp.astype(np.float64)
+        fp = self.fp.astype(np.float64)
+        predicted_pos = tp + fp
+        
+        precision = np.divide(tp, predicted_pos, out=np.zeros_like(tp), where=predicted_pos > 0)
+        recall = tp / self.n_pos if self.n_pos else np.zeros_like(tp)
+        fpr = fp / self.n_neg if self.n_neg else np.zeros_like(fp)
+        f1_denom = precision + recall
+        f1 = np.divide(2 * precision * recall, f1_denom, out=np.zeros_like(tp), where=f1_denom > 0)
+        
+        return pd.DataFrame({
+            "threshold": self.thresholds,
+            "tp": self.tp,
+            "fp": self.fp,
+            "fn": self.n_pos - self.tp,
+            "tn": self.n_neg - self.fp,
+            "precision": precision,
+            "recall": recall,
+            "tpr": recall,
+            "fpr": fpr,
+            "f1": f1,
+        })
+    
+    def roc_auc(self) -> float:
+        """ROC 曲线下面积（梯形法）"""
+        if self.n_pos == 0 or self.n_neg == 0:
+            return 0.0
+        
+        tpr = np.r_[0.0, self.tp / self.n_pos]
+        fpr = np.r_[0.0, self.fp / self.n_neg]
+        return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+    
+    def average_precision(self) -> float:
+        """PR 曲线下面积（平均精确率）"""
+        if self.n_pos == 0:
+            return 0.0
+        
+        precision = self.tp / (self.tp + self.fp)
+        recall = np.r_[0.0, self.tp / self.n_pos]
+        return float(np.sum(np.diff(recall) * precision))
+    
+    def threshold_for_precision(self, target_precision: float) -> Optional[float]:
+        """
+        满足目标精确率时召回率最高的阈值
+        
+        Args:
+            target_precision: 目标精确率
+        
+        Returns:
+            阈值，无法达到目标精确率时返回 None
+        """
+        precision = self.tp / np.maximum(self.tp + self.fp, 1)
+        candidates = np.flatnonzero(precision >= target_precision)
+        if len(candidates) == 0:
+            return None
+        return float(self.thresholds[candidates[-1]])
+    
+    def threshold_for_top_k(self, k: int) -> float:
+        """
+        营销容量为 K 人时对应的阈值（分数并列时可能略多于 K 人）
+        
+        Args:
+            k: 名单容量
+        
+        Returns:
+            阈值
+        """
+        if self.n == 0:
+            raise ValueError("没有可用的分数")
+        k = int(np.clip(k, 1, self.n))
+        return float(self.sorted_scores[k - 1])
+    
+    def best_f1_threshold(self) -> float:
+        """F1 最高的阈值"""
+        f1 = self.curve()["f1"].to_numpy()
+        return float(self.thresholds[int(np.argmax(f1))])
+
+
+class ScoreCalibrator:
+    """
+    概率校准器
+    
+    支持保序回归（isotonic）和 Platt 缩放（platt）。
+    拟合结果只保存为数组/系数，预测时不依赖 sklearn，可随模型一起存为 JSON。
+    """
+    
+    METHODS = ("isotonic", "platt")
+    
+    def __init__(self, method: str = "isotonic"):
+        if method not in self.METHODS:
+            raise ValueError(f"不支持的校准方法: {method}，可选 {self.METHODS}")
+        self.method = method
+        self.params: Dict[str, Any] = {}
+    
+    def fit(self, y_score, y_true) -> "ScoreCalibrator":
+        """
+        拟合校准映射
+        
+        Args:
+            y_score: 原始预测分数
+            y_true: 真实标签
+        
+        Returns:
+            self
+        """
+        y_score = np.asarray(y_score, dtype=np.float64).ravel()
+        y_true = np.asarray(y_true, dtype=np.float64).ravel()
+        
+        if self.method == "isotonic":
+            from sklearn.isotonic import IsotonicRegression
+            
+            iso = IsotonicRegression(out_of_bounds="clip", y_min=0.0, y_max=1.0)
+            iso.fit(y_score, y_true)
+            self.params = {
+                "x": iso.X_thresholds_.tolist(),
+                "y": iso.y_thresholds_.tolist(),
+            }
+        else:
+            from sklearn.linear_model import LogisticRegression
+            
+            lr = LogisticRegression(C=1e6)
+            lr.fit(self._logit(y_score).reshape(-1, 1), y_true)
+            self.params = {
+                "a": float(lr.coef_[0, 0]),
+                "b": float(lr.intercept_[0]),
+            }
+        
+        return self
+    
+    def transform(self, y_score) -> np.ndarray:
+        """
+        将原始分数映射为校准后的概率
+        
+        Args:
+            y_score: 原始预测分数
+        
+        Returns:
+            校准后的概率
+        """
+        if not self.params:
+            raise ValueError("校准器尚未拟合，请先调用 fit()")
+        
+        y_score = np.asarray(y_score, dtype=np.float64)
+        
+        if self.method == "isotonic":
+            return np.interp(y_score, self.params["x"], self.params["y"])
+        
+        z = self.params["a"] * self._logit(y_score) + self.params["b"]
+        return 1.0 / (1.0 + np.exp(-z))
+    
+    @staticmethod
+    def _logit(p: np.ndarray) -> np.ndarray:
+        p = np.clip(p, 1e-7, 1 - 1e-7)
+        return np.log(p / (1 - p))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """导出为可 JSON 序列化的字典"""
+        return {"method": self.method, "params": self.params}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ScoreCalibrator":
+        """从字典恢复校准器"""
+        calibrator = cls(method=data["method"])
+        calibrator.params = data["params"]
+        return calibrator
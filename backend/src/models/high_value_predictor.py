@@ -3,18 +3,19 @@
 使用 LightGBM 预测客户未来是否会成为高净值客户
 """
 
+import hashlib
+import json
+import shutil
+import tempfile
 import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, Iterable, List, Optional, Tuple, Any, Union
 import lightgbm as lgb
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import (
-    accuracy_score, precision_score, recall_score,
-    f1_score, roc_auc_score, classification_report
-)
 
 from .base import BaseModel
+from .evaluation import ThresholdAnalyzer, ScoreCalibrator
 from ..config import settings
 from ..data import FeatureEngineer
 
@@ -33,17 +34,31 @@ class HighValuePredictor(BaseModel):
         "feature_fraction": 0.9,
     }
     
+    # 影响特征分箱的参数：只有这些参数相同，二进制 Dataset 才能复用
+    BIN_PARAMS = (
+        "max_bin", "max_bin_by_feature", "min_data_in_bin",
+        "bin_construct_sample_cnt", "min_data_in_leaf", "feature_pre_filter",
+        "use_missing", "zero_as_missing", "categorical_feature",
+        "linear_tree", "seed", "data_random_seed",
+    )
+    
     def __init__(
         self,
         name: str = "high_value_predictor",
         params: Optional[Dict] = None,
-        num_boost_round: int = 100
+        num_boost_round: int = 100,
+        cache_datasets: bool = False,
+        dataset_cache_dir: Optional[Path] = None
     ):
         super().__init__(name)
         self.params = {**self.DEFAULT_PARAMS, **(params or {})}
         self.num_boost_round = num_boost_round
         self.feature_names: List[str] = []
         self.feature_engineer = FeatureEngineer()
+        self.cache_datasets = cache_datasets
+        self.dataset_cache_dir = Path(dataset_cache_dir or settings.MODEL_DIR / "dataset_cache")
+        self.threshold = 0.5
+        self.calibrator: Optional[ScoreCalibrator] = None
     
     def prepare_data(
         self,
@@ -97,9 +112,17 @@ class HighValuePredictor(BaseModel):
             X, y, test_size=test_size, random_state=42
         )
         
-        # 创建 LightGBM 数据集
-        train_data = lgb.Dataset(X_train, label=y_train)
-        val_data = lgb.Dataset(X_val, label=y_val, reference=train_data)
+        # 创建 LightGBM 数据集（验证集复用训练集的分箱）
+        cache_key = self._dataset_cache_key(X, y, test_size=test_size) if self.cache_datasets else None
+        train_data = self._build_dataset(
+            X_train, y_train,
+            cache_name=cache_key and f"{cache_key}_train"
+        )
+        val_data = self._build_dataset(
+            X_val, y_val,
+            cache_name=cache_key and f"{cache_key}_valid",
+            reference=train_data
+        )
         
         # 训练模型
         self.model = lgb.train(
@@ -115,6 +138,7 @@ class HighValuePredictor(BaseModel):
         )
         
         self.is_fitted = True
+        self._reset_calibration()
         
         # 存储特征名
         if isinstance(X, pd.DataFrame):
@@ -127,26 +151,406 @@ class HighValuePredictor(BaseModel):
         
         return metrics
     
-    def predict(self, X: pd.DataFrame, threshold: float = 0.5) -> np.ndarray:
+    def fit_chunked(
+        self,
+        chunks: Iterable[pd.DataFrame],
+        test_size: float = 0.2,
+        id_col: str = "customer_id",
+        early_stopping_rounds: int = 10,
+        spill_dir: Optional[Path] = None,
+        batch_size: int = 65536
+    ) -> Dict[str, float]:
+        """
+        基于分块数据训练（数据量超过内存时使用）
+        
+        每个数据块做完特征工程后，按 customer_id 哈希划分训练/验证集并追加写入磁盘；
+        LightGBM 从磁盘文件抽样构建分箱，再分批推送全部数据，全程不需要完整数据驻留内存。
+        
+        Args:
+            chunks: 原始数据块迭代器（如 DataLoader.iter_merged_chunks()）
+            test_size: 验证集比例
+            id_col: 用于哈希划分的客户 ID 列
+            early_stopping_rounds: 早停轮数
+            spill_dir: 临时特征文件所在目录，默认使用系统临时目录
+            batch_size: 构建 Dataset 时每批推送的行数
+        
+        Returns:
+            评估指标字典
+        """
+        work_dir = Path(tempfile.mkdtemp(prefix="high_value_", dir=spill_dir))
+        
+        try:
+            train_spill, val_spill, cache_key = self._spill_chunks(
+                chunks, work_dir, test_size, id_col
+            )
+            if train_spill.n_rows == 0 or val_spill.n_rows == 0:
+                raise ValueError("训练集或验证集为空，请检查数据量或 test_size")
+            
+            train_data = self._build_dataset(
+                [train_spill.sequence(batch_size)], train_spill.labels(),
+                cache_name=cache_key and f"{cache_key}_train",
+                feature_name=self.feature_names
+            )
+            val_data = self._build_dataset(
+                [val_spill.sequence(batch_size)], val_spill.labels(),
+                cache_name=cache_key and f"{cache_key}_valid",
+                reference=train_data,
+                feature_name=self.feature_names
+            )
+            
+            self.model = lgb.train(
+                self.params,
+                train_data,
+                num_boost_round=self.num_boost_round,
+                valid_sets=[train_data, val_data],
+                valid_names=["train", "valid"],
+                callbacks=[
+                    lgb.early_stopping(stopping_rounds=early_stopping_rounds),
+                    lgb.log_evaluation(period=20),
+                ],
+            )
+            self.is_fitted = True
+            self._reset_calibration()
+            
+            metrics = self.evaluate(val_spill.features(), val_spill.labels())
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        
+        self.metadata["metrics"] = metrics
+        self.metadata["feature_names"] = self.feature_names
+        self.metadata["n_train"] = train_spill.n_rows
+        self.metadata["n_valid"] = val_spill.n_rows
+        
+        return metrics
+    
+    def _spill_chunks(
+        self,
+        chunks: Iterable[pd.DataFrame],
+        work_dir: Path,
+        test_size: float,
+        id_col: str
+    ) -> Tuple["_FeatureSpill", "_FeatureSpill", Optional[str]]:
+        """逐块做特征工程并写入磁盘，同时累积 Dataset 缓存键"""
+        hasher = hashlib.sha1() if self.cache_datasets else None
+        train_spill = val_spill = None
+        
+        for chunk in chunks:
+            X, y = self.prepare_data(chunk) if train_spill is None else self._prepare_chunk(chunk)
+            
+            if train_spill is None:
+                train_spill = _FeatureSpill(work_dir / "train", len(self.feature_names))
+                val_spill = _FeatureSpill(work_dir / "valid", len(self.feature_names))
+            
+            is_val = self._hash_split(chunk[id_col], test_size)
+            values = X.to_numpy(dtype=np.float64)
+            labels = y.to_numpy()
+            train_spill.append(values[~is_val], labels[~is_val])
+            val_spill.append(values[is_val], labels[is_val])
+            
+            if hasher is not None:
+                hasher.update(pd.util.hash_pandas_object(X, index=False).values.tobytes())
+                hasher.update(labels.astype(np.int8).tobytes())
+                hasher.update(is_val.tobytes())
+        
+        if train_spill is None:
+            raise ValueError("没有读取到任何数据块")
+        
+        train_spill.close()
+        val_spill.close()
+        
+        cache_key = None
+        if hasher is not None:
+            hasher.update(json.dumps(
+                {**self._dataset_params(), "features": self.feature_names}, sort_keys=True, default=str
+            ).encode("utf-8"))
+            cache_key = f"chunked_{hasher.hexdigest()[:20]}"
+        
+        return train_spill, val_spill, cache_key
+    
+    def _prepare_chunk(self, chunk: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+        """对后续数据块做特征工程，列顺序与首块保持一致"""
+        df = self.feature_engineer.create_high_value_features(chunk)
+        df = self.feature_engineer.create_high_value_label(df, threshold=settings.HIGH_VALUE_THRESHOLD)
+        X = df.reindex(columns=self.feature_names).fillna(0)
+        return X, df["label"]
+    
+    @staticmethod
+    def _hash_split(ids: pd.Series, test_size: float) -> np.ndarray:
+        """
+        按客户 ID 哈希划分验证集
+        
+        同一客户在任意数据块、任意次运行中都落在同一侧；
+        哈希与标签无关，各类别按相同比例进入验证集
+        """
+        hashed = pd.util.hash_pandas_object(ids.astype(str), index=False).values
+        return (hashed % 10000) < int(test_size * 10000)
+    
+    def update(
+        self,
+        X: pd.DataFrame,
+        y: pd.Series,
+        mode: str = "continue",
+        num_boost_round: int = 20,
+        decay_rate: float = 0.9,
+        test_size: float = 0.2,
+        early_stopping_rounds: int = 10,
+        init_model: Optional[Any] = None
+    ) -> Dict[str, float]:
+        """
+        基于已有模型增量更新（用于每日/每晚的快速重训）
+        
+        Args:
+            X: 最新快照的特征矩阵
+            y: 标签
+            mode: 更新方式
+                - 'continue': 在已有模型基础上追加 boosting 轮数
+                - 'refit': 树结构不变，仅用新数据更新叶子值
+            num_boost_round: continue 模式下追加的轮数
+            decay_rate: refit 模式下旧叶子值的保留比例
+            test_size: 留出集比例（用于新旧模型对比）
+            early_stopping_rounds: 早停轮数
+            init_model: 起始模型，可以是 Booster 或模型文件路径，默认使用当前模型
+        
+        Returns:
+            新模型评估指标 + 新旧模型漂移指标（更新后阈值与校准器重置，需重新调用 tune_threshold()）
+        """
+        if init_model is None:
+            if not self.is_fitted:
+                raise ValueError("没有可用于增量训练的模型，请先 fit() 或 load_model()")
+            init_model = self.model
+        elif isinstance(init_model, (str, Path)):
+            init_model = lgb.Booster(model_file=str(init_model))
+        
+        X_train, X_val, y_train, y_val = train_test_split(
+            X, y, test_size=test_size, random_state=42
+        )
+        
+        if mode == "continue":
+            train_data = self._build_dataset(X_train, y_train)
+            val_data = self._build_dataset(X_val, y_val, reference=train_data)
+            new_model = lgb.train(
+                self.params,
+                train_data,
+                num_boost_round=num_boost_round,
+                init_model=init_model,
+                valid_sets=[train_data, val_data],
+                valid_names=["train", "valid"],
+                callbacks=[
+                    lgb.early_stopping(stopping_rounds=early_stopping_rounds),
+                    lgb.log_evaluation(period=20),
+                ],
+            )
+        elif mode == "refit":
+            new_model = init_model.refit(X_train, y_train, decay_rate=decay_rate)
+        else:
+            raise ValueError(f"不支持的更新方式: {mode}，可选 'continue' 或 'refit'")
+        
+        drift = self.compare_models(init_model, new_model, X_val, y_val)
+        
+        self.model = new_model
+        self.is_fitted = True
+        self._reset_calibration()
+        if isinstance(X, pd.DataFrame):
+            self.feature_names = X.columns.tolist()
+        
+        metrics = self.evaluate(X_val, y_val)
+        self.metadata["metrics"] = metrics
+        self.metadata["feature_names"] = self.feature_names
+        self.metadata["drift"] = drift
+        self.metadata["update_mode"] = mode
+        
+        return {**metrics, **drift}
+    
+    def compare_models(
+        self,
+        old_model: lgb.Booster,
+        new_model: lgb.Booster,
+        X: pd.DataFrame,
+        y: pd.Series
+    ) -> Dict[str, float]:
+        """
+        在留出集上对比新旧模型
+        
+        Args:
+            old_model: 旧模型
+            new_model: 新模型
+            X: 留出集特征
+            y: 留出集标签
+        
+        Returns:
+            漂移指标字典（label_flip_rate 按当前校准器与阈值判定类别）
+        """
+        old_proba = old_model.predict(X)
+        new_proba = new_model.predict(X)
+        
+        # 阈值是在校准后的分数上选定的，判定类别前先做同样的校准
+        calibrate = self.calibrator.transform if self.calibrator is not None else np.asarray
+        old_label = calibrate(old_proba) >= self.threshold
+        new_label = calibrate(new_proba) >= self.threshold
+        
+        old_auc = ThresholdAnalyzer(y, old_proba).roc_auc()
+        new_auc = ThresholdAnalyzer(y, new_proba).roc_auc()
+        
+        return {
+            "old_auc": old_auc,
+            "auc_delta": new_auc - old_auc,
+            "mean_score_shift": float(new_proba.mean() - old_proba.mean()),
+            "score_psi": self._population_stability_index(old_proba, new_proba),
+            "score_correlation": float(np.corrcoef(old_proba, new_proba)[0, 1])
+            if old_proba.std() > 0 and new_proba.std() > 0 else 1.0,
+            "label_flip_rate": float(np.mean(old_label != new_label)),
+        }
+    
+    def _reset_calibration(self) -> None:
+        """模型重新训练后，旧模型上选定的阈值与校准器不再适用"""
+        self.threshold = 0.5
+        self.calibrator = None
+        self.metadata.pop("threshold", None)
+    
+    @staticmethod
+    def _population_stability_index(
+        expected: np.ndarray,
+        actual: np.ndarray,
+        bins: int = 10
+    ) -> float:
+        """计算两组概率分数分布的 PSI（[0, 1] 等宽分箱）"""
+        edges = np.linspace(0, 1, bins + 1)
+        expected_pct = np.histogram(expected, edges)[0] / len(expected)
+        actual_pct = np.histogram(actual, edges)[0] / len(actual)
+        
+        expected_pct = np.clip(expected_pct, 1e-6, None)
+        actual_pct = np.clip(actual_pct, 1e-6, None)
+        
+        return float(np.sum((actual_pct - expected_pct) * np.log(actual_pct / expected_pct)))
+    
+    def cross_validate(
+        self,
+        X: pd.DataFrame,
+        y: pd.Series,
+        nfold: int = 5,
+        early_stopping_rounds: int = 10
+    ) -> Dict[str, float]:
+        """
+        K 折交叉验证
+        
+        所有折共享同一个已分箱的 Dataset，各折只做行子集划分，不会重新分箱
+        
+        Args:
+            X: 特征矩阵
+            y: 标签
+            nfold: 折数
+            early_stopping_rounds: 早停轮数
+        
+        Returns:
+            交叉验证指标字典
+        """
+        cache_key = self._dataset_cache_key(X, y) if self.cache_datasets else None
+        full_data = self._build_dataset(X, y, cache_name=cache_key and f"{cache_key}_full")
+        
+        cv_results = lgb.cv(
+            self.params,
+            full_data,
+            num_boost_round=self.num_boost_round,
+            nfold=nfold,
+            stratified=True,
+            seed=42,
+            callbacks=[lgb.early_stopping(stopping_rounds=early_stopping_rounds, verbose=False)],
+        )
+        
+        metric = self.params.get("metric", "auc")
+        mean_curve = cv_results[f"valid {metric}-mean"]
+        std_curve = cv_results[f"valid {metric}-stdv"]
+        
+        return {
+            f"{metric}_mean": mean_curve[-1],
+            f"{metric}_std": std_curve[-1],
+            "best_iteration": len(mean_curve),
+        }
+    
+    def _dataset_params(self) -> Dict[str, Any]:
+        """获取影响分箱的参数"""
+        return {k: self.params[k] for k in self.BIN_PARAMS if k in self.params}
+    
+    def _dataset_cache_key(self, X: pd.DataFrame, y: pd.Series, **extra) -> str:
+        """
+        计算 Dataset 缓存键
+        
+        由特征矩阵内容、标签、列名以及分箱参数共同决定，
+        只修改学习率、叶子数等训练参数时缓存键不变
+        """
+        hasher = hashlib.sha1()
+        hasher.update(json.dumps([str(c) for c in X.columns]).encode("utf-8"))
+        hasher.update(pd.util.hash_pandas_object(X, index=False).values.tobytes())
+        hasher.update(pd.util.hash_pandas_object(pd.Series(np.asarray(y)), index=False).values.tobytes())
+        hasher.update(json.dumps(
+            {**self._dataset_params(), **extra}, sort_keys=True, default=str
+        ).encode("utf-8"))
+        return hasher.hexdigest()[:20]
+    
+    def _build_dataset(
+        self,
+        data: Any,
+        label: Any = None,
+        cache_name: Optional[str] = None,
+        reference: Optional[lgb.Dataset] = None,
+        feature_name: Union[List[str], str] = "auto"
+    ) -> lgb.Dataset:
+        """
+        创建 LightGBM 数据集，命中缓存时直接加载二进制文件
+        
+        Args:
+            data: 特征数据
+            label: 标签
+            cache_name: 缓存文件名（不含扩展名），为 None 时不使用缓存
+            reference: 参考数据集（复用其分箱边界）
+            feature_name: 特征名列表
+        
+        Returns:
+            LightGBM Dataset
+        """
+        params = self._dataset_params()
+        
+        if cache_name is None:
+            return lgb.Dataset(
+                data, label=label, reference=reference,
+                params=params, feature_name=feature_name
+            )
+        
+        cache_path = self.dataset_cache_dir / f"{cache_name}.bin"
+        if cache_path.exists():
+            return lgb.Dataset(str(cache_path), reference=reference, params=params)
+        
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        dataset = lgb.Dataset(
+            data, label=label, reference=reference,
+            params=params, feature_name=feature_name
+        )
+        dataset.construct().save_binary(str(cache_path))
+        
+        return dataset
+    
+    def predict(self, X: pd.DataFrame, threshold: Optional[float] = None) -> np.ndarray:
         """
         预测类别
         
         Args:
             X: 特征矩阵
-            threshold: 分类阈值
+            threshold: 分类阈值，默认使用 tune_threshold() 选定的阈值（初始为 0.5）
         
         Returns:
             预测类别数组
         """
+        threshold = self.threshold if threshold is None else threshold
         proba = self.predict_proba(X)
         return (proba >= threshold).astype(int)
     
-    def predict_proba(self, X: pd.DataFrame) -> np.ndarray:
+    def predict_proba(self, X: pd.DataFrame, calibrated: bool = True) -> np.ndarray:
         """
         预测概率
         
         Args:
             X: 特征矩阵
+            calibrated: 存在校准器时是否输出校准后的概率
         
         Returns:
             预测概率数组
@@ -154,30 +558,209 @@ class HighValuePredictor(BaseModel):
         if not self.is_fitted:
             raise ValueError("模型尚未训练，请先调用 fit() 方法")
         
-        return self.model.predict(X)
+        proba = self.model.predict(X)
+        if calibrated and self.calibrator is not None:
+            proba = self.calibrator.transform(proba)
+        
+        return proba
     
-    def evaluate(self, X: pd.DataFrame, y: pd.Series) -> Dict[str, float]:
+    def evaluate(
+        self,
+        X: pd.DataFrame,
+        y: pd.Series,
+        threshold: Optional[float] = None
+    ) -> Dict[str, float]:
         """
         评估模型
         
         Args:
             X: 特征矩阵
             y: 真实标签
+            threshold: 分类阈值，默认使用当前阈值
         
         Returns:
             评估指标字典
         """
-        y_pred = self.predict(X)
-        y_proba = self.predict_proba(X)
+        threshold = self.threshold if threshold is None else threshold
+        analyzer = ThresholdAnalyzer(y, self.predict_proba(X))
         
         return {
-            "accuracy": accuracy_score(y, y_pred),
-            "precision": precision_score(y, y_pred, zero_division=0),
-            "recall": recall_score(y, y_pred, zero_division=0),
-            "f1": f1_score(y, y_pred, zero_division=0),
-            "auc": roc_auc_score(y, y_proba) if len(np.unique(y)) > 1 else 0,
+            **analyzer.metrics_at(threshold),
+            "auc": analyzer.roc_auc(),
         }
     
+    def tune_threshold(
+        self,
+        X: pd.DataFrame,
+        y: pd.Series,
+        target_precision: Optional[float] = None,
+        top_k: Optional[int] = None,
+        calibration: Optional[str] = None
+    ) -> Dict[str, float]:
+        """
+        在留出集上选择分类阈值（可选先做概率校准）
+        
+        分数只计算一次，之后所有阈值查询都基于同一次排序结果
+        
+        Args:
+            X: 留出集特征
+            y: 留出集标签
+            target_precision: 目标精确率，取满足该精确率时召回率最高的阈值
+            top_k: 营销容量，取分数前 K 名对应的阈值
+            calibration: 校准方法 ('isotonic' 或 'platt')，None 表示不校准
+        
+        Returns:
+            选定阈值及该阈值下的评估指标；两种目标都未指定时取 F1 最优阈值
+        """
+        raw_proba = self.predict_proba(X, calibrated=False)
+        
+        if calibration is not None:
+            self.calibrator = ScoreCalibrator(method=calibration).fit(raw_proba, y)
+        
+        proba = self.calibrator.transform(raw_proba) if self.calibrator is not None else raw_proba
+        analyzer = ThresholdAnalyzer(y, proba)
+        
+        if target_precision is not None:
+            threshold = analyzer.threshold_for_precision(target_precision)
+            if threshold is None:
+                raise ValueError(f"留出集上无法达到目标精确率 {target_precision:.2%}")
+        elif top_k is not None:
+            threshold = analyzer.threshold_for_top_k(top_k)
+        else:
+            threshold = analyzer.best_f1_threshold()
+        
+        self.threshold = threshold
+        
+        result = {
+            "threshold": threshold,
+            **analyzer.metrics_at(threshold),
+            "auc": analyzer.roc_auc(),
+            "average_precision": analyzer.average_precision(),
+            "n_selected": float(sum(analyzer.confusion_at(threshold)[k] for k in ("tp", "fp"))),
+        }
+        self.metadata["threshold"] = result
+        
+        return result
+    
+    def rank_top_k(
+        self,
+        chunks: Iterable[pd.DataFrame],
+        k: int = 50000,
+        id_col: str = "customer_id",
+        attributes: Optional[pd.DataFrame] = None,
+        exclude_existing: bool = True
+    ) -> pd.DataFrame:
+        """
+        分块打分，生成 Top-K 高潜力客户名单
+        
+        每块只保留块内前 K 名，再与当前名单合并后用 argpartition 截断，
+        全量分数既不常驻内存也不做全排序，最终只对 K 名入选客户排序。
+        排序使用未校准的模型分数（保序校准如 isotonic 会把相近分数压成同一平台），
+        同分客户按 ID 升序，名单与分块顺序无关；入选客户的 score 列再换算为校准后的概率。
+        
+        Args:
+            chunks: 原始数据块迭代器
+            k: 名单容量
+            id_col: 客户 ID 列
+            attributes: 客户属性表，仅对入选客户按 id_col 关联
+            exclude_existing: 是否排除当前资产已达到高价值阈值的客户
+        
+        Returns:
+            按分数降序排列的名单（rank, customer_id, score, 以及关联的属性列）
+        """
+        if not self.is_fitted:
+            raise ValueError("模型尚未训练，请先调用 fit() 或 load_model()")
+        
+        top_ids = np.empty(0, dtype=object)
+        top_scores = np.empty(0, dtype=np.float64)
+        
+        for chunk in chunks:
+            df = self.feature_engineer.create_high_value_features(chunk)
+            if exclude_existing and "total_assets" in df.columns:
+                df = df[df["total_assets"] < settings.HIGH_VALUE_THRESHOLD]
+            if df.empty:
+                continue
+            
+            scores = self.predict_proba(df.reindex(columns=self.feature_names).fillna(0), calibrated=False)
+            chunk_ids = df[id_col].to_numpy(dtype=object)
+            local = self._top_k_indices(scores, k, chunk_ids)
+            
+            candidate_ids = np.concatenate([top_ids, chunk_ids[local]])
+            candidate_scores = np.concatenate([top_scores, scores[local]])
+            keep = self._top_k_indices(candidate_scores, k, candidate_ids)
+            top_ids, top_scores = candidate_ids[keep], candidate_scores[keep]
+        
+        # 分数降序，同分按客户 ID 升序
+        order = np.argsort(top_ids, kind="stable")
+        order = order[np.argsort(-top_scores[order], kind="stable")]
+        scores = top_scores[order]
+        if self.calibrator is not None:
+            scores = self.calibrator.transform(scores)
+        
+        ranked = pd.DataFrame({
+            "rank": np.arange(1, len(order) + 1),
+            id_col: top_ids[order],
+            "score": scores,
+        })
+        
+        if attributes is not None:
+            winners = attributes[attributes[id_col].isin(ranked[id_col])]
+            ranked = ranked.merge(winners.drop_duplicates(id_col), on=id_col, how="left")
+        
+        return ranked
+    
+    @staticmethod
+    def _top_k_indices(scores: np.ndarray, k: int, ids: np.ndarray) -> np.ndarray:
+        """
+        分数最高的 K 个位置（无序）
+        
+        与第 K 名同分的客户按 ID 升序取满名额，入选结果与分块顺序无关
+        """
+        if len(scores) <= k:
+            return np.arange(len(scores))
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        above = np.flatnonzero(scores > kth)
+        tied = np.flatnonzero(scores == kth)
+        tied = tied[np.argsort(ids[tied], kind="stable")][:k - len(above)]
+        return np.concatenate([above, tied])
+    
+    @staticmethod
+    def diff_top_k(
+        current: pd.DataFrame,
+        previous: Optional[pd.DataFrame],
+        id_col: str = "customer_id"
+    ) -> pd.DataFrame:
+        """
+        对比今日与上期名单
+        
+        Args:
+            current: 今日名单（rank_top_k 的输出）
+            previous: 上期名单，None 表示首次生成
+            id_col: 客户 ID 列
+        
+        Returns:
+            名单变化表，status 为 新进入 / 保留 / 移出
+        """
+        if previous is None or previous.empty:
+            diff = current[[id_col, "rank", "score"]].copy()
+            diff["prev_rank"] = np.nan
+            diff["rank_change"] = np.nan
+            diff["status"] = "新进入"
+            return diff
+        
+        merged = current[[id_col, "rank", "score"]].merge(
+            previous[[id_col, "rank"]].rename(columns={"rank": "prev_rank"}),
+            on=id_col, how="outer"
+        )
+        merged["rank_change"] = merged["prev_rank"] - merged["rank"]
+        merged["status"] = np.select(
+            [merged["prev_rank"].isna(), merged["rank"].isna()],
+            ["新进入", "移出"],
+            default="保留"
+        )
+        
+        return merged.sort_values(["rank", "prev_rank"], na_position="last").reset_index(drop=True)
+    
     def get_feature_importance(self, importance_type: str = "split") -> pd.DataFrame:
         """
         获取特征重要性
@@ -211,8 +794,25 @@ class HighValuePredictor(BaseModel):
         filepath.parent.mkdir(parents=True, exist_ok=True)
         
         self.model.save_model(str(filepath))
+        
+        # 阈值与校准器随模型一起保存
+        with open(self._calibration_path(filepath), "w", encoding="utf-8") as f:
+            json.dump(self.calibration_state(), f, ensure_ascii=False)
+        
         return filepath
     
+    def calibration_state(self) -> Dict[str, Any]:
+        """
+        当前阈值与校准器（可 JSON 序列化）
+        
+        Returns:
+            {'threshold', 'calibrator'}
+        """
+        return {
+            "threshold": self.threshold,
+            "calibrator": self.calibrator.to_dict() if self.calibrator else None,
+        }
+    
     def load_model(self, filepath: Optional[Path] = None) -> "HighValuePredictor":
         """
         加载 LightGBM 模型
@@ -222,6 +822,67 @@ class HighValuePredictor(BaseModel):
         
         self.model = lgb.Booster(model_file=str(filepath))
         self.is_fitted = True
+        self.feature_names = self.model.feature_name()
+        
+        calibration_path = self._calibration_path(filepath)
+        if calibration_path.exists():
+            with open(calibration_path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.threshold = data.get("threshold", 0.5)
+            if data.get("calibrator"):
+                self.calibrator = ScoreCalibrator.from_dict(data["calibrator"])
         
         return self
+    
+    @staticmethod
+    def _calibration_path(model_path: Path) -> Path:
+        """模型文件对应的阈值/校准文件路径"""
+        model_path = Path(model_path)
+        return model_path.with_name(f"{model_path.stem}.calibration.json")
+
 
+
+class _MemmapSequence(lgb.Sequence):
+    """磁盘特征矩阵的 LightGBM Sequence 封装，支持随机抽样与分批读取"""
+    
+    def __init__(self, data: np.ndarray, batch_size: int):
+        self.data = data
+        self.batch_size = batch_size
+    
+    def __getitem__(self, idx):
+        return np.asarray(self.data[idx])
+    
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+
+class _FeatureSpill:
+    """按块追加写入磁盘的特征矩阵和标签"""
+    
+    def __init__(self, prefix: Path, n_cols: int):
+        self.feature_path = prefix.with_suffix(".X.bin")
+        self.label_path = prefix.with_suffix(".y.bin")
+        self.n_cols = n_cols
+        self.n_rows = 0
+        self._feature_file = open(self.feature_path, "wb")
+        self._label_file = open(self.label_path, "wb")
+    
+    def append(self, X: np.ndarray, y: np.ndarray) -> None:
+        np.ascontiguousarray(X, dtype=np.float64).tofile(self._feature_file)
+        np.asarray(y, dtype=np.float32).tofile(self._label_file)
+        self.n_rows += len(X)
+    
+    def close(self) -> None:
+        self._feature_file.close()
+        self._label_file.close()
+    
+    def features(self) -> np.ndarray:
+        if self.n_rows == 0:
+            return np.empty((0, self.n_cols))
+        return np.memmap(self.feature_path, dtype=np.float64, mode="r", shape=(self.n_rows, self.n_cols))
+    
+    def labels(self) -> np.ndarray:
+        return np.fromfile(self.label_path, dtype=np.float32)
+    
+    def sequence(self, batch_size: int) -> _MemmapSequence:
+        return _MemmapSequence(self.features(), batch_size)
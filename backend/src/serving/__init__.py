@@ -0,0 +1,6 @@
+# 在线服务模块（只依赖 NumPy / Pandas，不加载 sklearn、LightGBM）
+from .segment_assigner import SegmentAssigner
+from .rule_index import RuleIndex
+from .explanation_store import ExplanationStore
+
+__all__ = ["SegmentAssigner", "RuleIndex", "ExplanationStore"]
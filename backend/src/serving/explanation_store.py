@@ -0,0 +1,139 @@
+"""
+客户预测解释索引
+夜间批量计算每位客户的 Top-N 影响因素，按客户 ID 排序存储，在线查询只做一次二分查找
+"""
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+
+class ExplanationStore:
+    """
+    客户解释索引
+    
+    每位客户保存预测分数以及按 |SHAP| 降序的前 N 个 (特征下标, SHAP 值)；
+    客户 ID 统一转为字符串并排序，查询时用 searchsorted 定位。
+    同一客户 ID 出现多次时保留最后一行（按输入顺序最新的记录）。
+    """
+    
+    def __init__(
+        self,
+        customer_ids: Union[List[Any], np.ndarray],
+        feature_idx: np.ndarray,
+        shap_values: np.ndarray,
+        feature_names: List[str],
+        scores: Optional[np.ndarray] = None,
+        model_version: str = ""
+    ):
+        ids = np.asarray(customer_ids).astype(str)
+        feature_idx = np.asarray(feature_idx, dtype=np.int32).reshape(len(ids), -1)
+        shap_values = np.asarray(shap_values, dtype=np.float32).reshape(len(ids), -1)
+        scores = np.full(len(ids), np.nan) if scores is None else np.asarray(scores)
+        
+        if feature_idx.shape != shap_values.shape or len(scores) != len(ids):
+            raise ValueError("客户 ID、影响因素与分数的行数不一致")
+        
+        order = np.argsort(ids, kind="stable")
+        if len(order):
+            # 稳定排序后同一 ID 的各行保持输入顺序，只保留每段的最后一行
+            sorted_ids = ids[order]
+            order = order[np.r_[sorted_ids[1:] != sorted_ids[:-1], True]]
+        self.customer_ids = ids[order]
+        self.feature_idx = feature_idx[order]
+        self.shap_values = shap_values[order]
+        self.scores = scores.astype(np.float32)[order]
+        self.feature_names = list(feature_names)
+        self.model_version = model_version
+    
+    def __len__(self) -> int:
+        return len(self.customer_ids)
+    
+    def __contains__(self, customer_id: Any) -> bool:
+        return self._position(customer_id) is not None
+    
+    def _position(self, customer_id: Any) -> Optional[int]:
+        """客户在排序数组中的位置，不存在时返回 None"""
+        key = str(customer_id)
+        pos = int(np.searchsorted(self.customer_ids, key))
+        if pos < len(self.customer_ids) and self.customer_ids[pos] == key:
+            return pos
+        return None
+    
+    def lookup(self, customer_id: Any) -> Optional[Dict[str, Any]]:
+        """
+        查询单个客户的预计算解释
+        
+        Args:
+            customer_id: 客户 ID
+        
+        Returns:
+            {'customer_id', 'score', 'factors', 'model_version', 'source'}，不存在时返回 None
+        """
+        pos = self._position(customer_id)
+        if pos is None:
+            return None
+        
+        score = float(self.scores[pos])
+        factors = [
+            {
+                "feature": self.feature_names[j],
+                "shap": float(value),
+                "direction": "正向" if value > 0 else "负向",
+            }
+            for j, value in zip(self.feature_idx[pos], self.shap_values[pos])
+        ]
+        
+        return {
+            "customer_id": str(customer_id),
+            "score": score if np.isfinite(score) else None,
+            "factors": factors,
+            "model_version": self.model_version,
+            "source": "precomputed",
+        }
+    
+    def save(self, filepath: Union[str, Path]) -> Path:
+        """
+        保存为 .npz 文件
+        
+        Args:
+            filepath: 保存路径
+        
+        Returns:
+            保存的文件路径
+        """
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        
+        np.savez(
+            filepath,
+            customer_ids=self.customer_ids,
+            feature_idx=self.feature_idx,
+            shap_values=self.shap_values,
+            scores=self.scores,
+            feature_names=np.array(self.feature_names),
+            model_version=np.array(self.model_version),
+        )
+        return filepath
+    
+    @classmethod
+    def load(cls, filepath: Union[str, Path]) -> "ExplanationStore":
+        """
+        从 .npz 文件加载
+        
+        Args:
+            filepath: 文件路径
+        
+        Returns:
+            ExplanationStore
+        """
+        with np.load(filepath, allow_pickle=False) as data:
+            return cls(
+                customer_ids=data["customer_ids"],
+                feature_idx=data["feature_idx"],
+                shap_values=data["shap_values"],
+                feature_names=data["feature_names"].tolist(),
+                scores=data["scores"],
+                model_version=str(data["model_version"]),
+            )
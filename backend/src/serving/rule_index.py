@@ -0,0 +1,262 @@
+"""
+产品推荐规则索引
+将关联规则预编译为位掩码数组，批量推荐只需按持有组合去重后做向量运算
+"""
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+class RuleIndex:
+    """
+    关联规则索引
+    
+    每条规则按后件拆分为 (前件掩码, 推荐产品, 置信度, 提升度) 记录，
+    并按 (推荐产品, 置信度降序) 排列：对某个持有组合，一个产品区间内
+    第一条“前件被持有”的记录就是该产品置信度最高的规则。
+    """
+    
+    def __init__(
+        self,
+        items: List[str],
+        antecedents: np.ndarray,
+        consequents: np.ndarray,
+        confidence: np.ndarray,
+        lift: np.ndarray,
+        names: Optional[Dict[str, str]] = None
+    ):
+        if len(items) > 62:
+            raise ValueError("规则索引最多支持 62 个产品")
+        
+        self.items = list(items)
+        self.names = names or {}
+        self._bits = np.left_shift(1, np.arange(len(self.items)), dtype=np.int64)
+        
+        antecedents = np.asarray(antecedents, dtype=np.int64)
+        consequents = np.asarray(consequents, dtype=np.int64)
+        confidence = np.asarray(confidence, dtype=np.float64)
+        lift = np.asarray(lift, dtype=np.float64)
+        
+        order = np.lexsort((-confidence, consequents))
+        self.antecedents = antecedents[order]
+        self.consequents = consequents[order]
+        self.confidence = confidence[order]
+        self.lift = lift[order]
+        
+        # 每个产品在记录数组中的区间
+        self._bounds = np.searchsorted(self.consequents, np.arange(len(self.items) + 1))
+    
+    @classmethod
+    def from_rules(
+        cls,
+        rules: pd.DataFrame,
+        items: List[str],
+        names: Optional[Dict[str, str]] = None
+    ) -> "RuleIndex":
+        """
+        由关联规则表构建（antecedents / consequents 为项集）
+        
+        Args:
+            rules: 关联规则 DataFrame
+            items: 产品列表（决定位掩码的位次）
+            names: 产品显示名称
+        
+        Returns:
+            RuleIndex
+        """
+        position = {item: j for j, item in enumerate(items)}
+        
+        antecedents, consequents, confidence, lift = [], [], [], []
+        for ante, cons, conf, lf in zip(
+            rules["antecedents"], rules["consequents"], rules["confidence"], rules["lift"]
+        ):
+            mask = sum(1 << position[item] for item in ante)
+            for item in cons:
+                antecedents.append(mask)
+                consequents.append(position[item])
+                confidence.append(conf)
+                lift.append(lf)
+        
+        return cls(items, antecedents, consequents, confidence, lift, names=names)
+    
+    def encode(self, holdings: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """
+        持有矩阵编码为位掩码
+        
+        Args:
+            holdings: 0/1 持有矩阵（DataFrame 按产品列名对齐，缺失列视为未持有）
+        
+        Returns:
+            每位客户的持有掩码
+        """
+        if isinstance(holdings, pd.DataFrame):
+            holdings = holdings.reindex(columns=self.items).fillna(0).to_numpy()
+        holdings = np.asarray(holdings)
+        if holdings.ndim == 1:
+            holdings = holdings.reshape(1, -1)
+        return (holdings > 0) @ self._bits
+    
+    def _best_rules(self, patterns: np.ndarray) -> np.ndarray:
+        """
+        每个持有组合下各产品置信度最高的可用规则
+        
+        Returns:
+            (len(patterns), n_items) 的记录下标，无可用规则为 -1
+        """
+        best = np.full((len(patterns), len(self.items)), -1, dtype=np.int64)
+        
+        for j in range(len(self.items)):
+            start, end = self._bounds[j], self._bounds[j + 1]
+            if start == end:
+                continue
+            
+            # 前件被持有、且尚未持有该产品
+            usable = (self.antecedents[None, start:end] & ~patterns[:, None]) == 0
+            usable &= (patterns[:, None] & self._bits[j]) == 0
+            
+            hit = usable.any(axis=1)
+            best[hit, j] = start + np.argmax(usable[hit], axis=1)
+        
+        return best
+    
+    def _unique_patterns(self, masks: np.ndarray):
+        """持有组合去重；产品数较少时用查找表代替排序"""
+        if len(self.items) > 20:
+            return np.unique(masks, return_inverse=True)
+        
+        present = np.bincount(masks, minlength=1 << len(self.items)) > 0
+        patterns = np.flatnonzero(present)
+        lookup = np.zeros(len(present), dtype=np.int64)
+        lookup[patterns] = np.arange(len(patterns))
+        return patterns, lookup[masks]
+    
+    def recommend_batch(
+        self,
+        holdings: Union[pd.DataFrame, np.ndarray],
+        top_n: int = 3
+    ) -> pd.DataFrame:
+        """
+        批量推荐
+        
+        客户按持有组合去重（最多 2^产品数 种），只对不重复的组合计算推荐，
+        再按组合编号展开回每位客户。
+        
+        Args:
+            holdings: 0/1 持有矩阵
+            top_n: 每位客户推荐的产品数
+        
+        Returns:
+            每位客户一行，product_i（产品名称，分类类型）与 confidence_i 列，
+            推荐不足 top_n 个时为空
+        """
+        patterns, inverse = self._unique_patterns(self.encode(holdings))
+        best = self._best_rules(patterns)
+        
+        conf = np.where(best >= 0, self.confidence[np.maximum(best, 0)], -np.inf)
+        top = np.argsort(-conf, axis=1, kind="stable")[:, :top_n]
+        top_conf = np.take_along_axis(conf, top, axis=1)
+        
+        labels = [self.names.get(item, item) for item in self.items]
+        result = {}
+        for i in range(top.shape[1]):
+            valid = np.isfinite(top_conf[:, i])
+            codes = np.where(valid, top[:, i], -1)
+            result[f"product_{i + 1}"] = pd.Categorical.from_codes(
+                codes[inverse], categories=labels
+            )
+            result[f"confidence_{i + 1}"] = np.where(valid, top_conf[:, i], np.nan)[inverse]
+        
+        return pd.DataFrame(result)
+    
+    def recommend(
+        self,
+        current_products: Iterable[str],
+        top_n: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        单个客户推荐
+        
+        Args:
+            current_products: 当前持有的产品（产品标志或显示名称）
+            top_n: 返回数量，默认返回全部
+        
+        Returns:
+            推荐产品列表（按置信度降序）
+        """
+        lookup = {name: item for item, name in self.names.items()}
+        position = {item: j for j, item in enumerate(self.items)}
+        
+        mask = 0
+        for product in current_products:
+            item = lookup.get(product, product)
+            if item in position:
+                mask |= 1 << position[item]
+        
+        best = self._best_rules(np.array([mask], dtype=np.int64))[0]
+        found = best[best >= 0]
+        found = found[np.argsort(-self.confidence[found], kind="stable")][:top_n]
+        
+        return [
+            {
+                "product": self.names.get(self.items[self.consequents[r]], self.items[self.consequents[r]]),
+                "confidence": float(self.confidence[r]),
+                "lift": float(self.lift[r]),
+                "reason": f"因为您持有 {self._format_mask(self.antecedents[r])}",
+            }
+            for r in found
+        ]
+    
+    def _format_mask(self, mask: int) -> str:
+        """位掩码格式化为可读字符串"""
+        return " + ".join(
+            self.names.get(item, item) for j, item in enumerate(self.items) if mask >> j & 1
+        )
+    
+    def save(self, filepath: Union[str, Path]) -> Path:
+        """
+        保存为 .npz 文件
+        
+        Args:
+            filepath: 保存路径
+        
+        Returns:
+            保存的文件路径
+        """
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        
+        np.savez(
+            filepath,
+            items=np.array(self.items),
+            names=np.array([self.names.get(item, item) for item in self.items]),
+            antecedents=self.antecedents,
+            consequents=self.consequents,
+            confidence=self.confidence,
+            lift=self.lift,
+        )
+        return filepath
+    
+    @classmethod
+    def load(cls, filepath: Union[str, Path]) -> "RuleIndex":
+        """
+        从 .npz 文件加载
+        
+        Args:
+            filepath: 文件路径
+        
+        Returns:
+            RuleIndex
+        """
+        with np.load(filepath, allow_pickle=False) as data:
+            items = data["items"].tolist()
+            return cls(
+                items=items,
+                antecedents=data["antecedents"],
+                consequents=data["consequents"],
+                confidence=data["confidence"],
+                lift=data["lift"],
+                names=dict(zip(items, data["names"].tolist())),
+            )
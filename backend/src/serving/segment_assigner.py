@@ -0,0 +1,198 @@
+"""
+客户分群实时分配
+将标准化参数和质心导出为数组，用一次矩阵乘法完成最近质心分配
+"""
+
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+
+class SegmentAssigner:
+    """
+    最近质心分配器
+    
+    标准化后样本 z = (x - mean) / scale 到质心 c 的距离
+    ||z - c||² = ||z||² - 2·z·c + ||c||²，其中 ||z||² 与群组无关，
+    因此只需比较 ||c||² - 2·z·c。把标准化折叠进权重后：
+        score = x · W + b,  W = -2·(c / scale)ᵀ,  b = ||c||² + 2·(mean / scale)·c
+    分配群组即 argmin(score)，整个过程是一次 float32 矩阵乘法。
+    """
+    
+    def __init__(
+        self,
+        features: List[str],
+        mean: np.ndarray,
+        scale: np.ndarray,
+        centers: np.ndarray,
+        labels: Optional[Dict[int, str]] = None
+    ):
+        self.features = list(features)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.centers = np.asarray(centers, dtype=np.float64)
+        self.labels = labels or {}
+        
+        scaled_centers = self.centers / self.scale
+        self._weights = (-2 * scaled_centers.T).astype(np.float32)
+        self._bias = (
+            np.sum(self.centers ** 2, axis=1) + 2 * scaled_centers @ self.mean
+        ).astype(np.float32)
+    
+    @property
+    def n_clusters(self) -> int:
+        return len(self.centers)
+    
+    @classmethod
+    def from_clustering(cls, clustering) -> "SegmentAssigner":
+        """
+        从训练好的 CustomerClustering 导出
+        
+        Args:
+            clustering: 已训练的 CustomerClustering 实例
+        
+        Returns:
+            SegmentAssigner
+        """
+        if not clustering.is_fitted:
+            raise ValueError("聚类模型尚未训练")
+        
+        return cls(
+            features=clustering.features,
+            mean=clustering.scaler.mean_,
+            scale=clustering.scaler.scale_,
+            centers=clustering.model.cluster_centers_,
+            labels={
+                cluster_id: clustering.CLUSTER_LABELS.get(cluster_id, f"群组{cluster_id}")
+                for cluster_id in range(len(clustering.model.cluster_centers_))
+            },
+        )
+    
+    def missing_features(self, X: pd.DataFrame) -> List[str]:
+        """
+        检查缺少的特征列
+        
+        Args:
+            X: 特征 DataFrame
+        
+        Returns:
+            X 中不存在的特征名列表
+        """
+        return [feature for feature in self.features if feature not in X.columns]
+    
+    def _to_matrix(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """
+        按特征顺序转换为 float32 矩阵
+        
+        缺少特征列时报错（否则拼错的字段名也会得到看似正常的分群结果）；
+        已有列中的空值按 0 处理，与训练时的 fillna(0) 一致
+        """
+        if isinstance(X, pd.DataFrame):
+            missing = self.missing_features(X)
+            if missing:
+                raise ValueError(f"缺少特征: {', '.join(missing)}")
+            X = X[self.features].fillna(0).to_numpy()
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != len(self.features):
+            raise ValueError(f"特征数不一致: 需要 {len(self.features)} 列，实际 {X.shape[1]} 列")
+        return X
+    
+    def assign(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """
+        分配群组
+        
+        Args:
+            X: 特征矩阵（原始尺度，列与 features 一致）
+        
+        Returns:
+            群组编号数组
+        """
+        return np.argmin(self._to_matrix(X) @ self._weights + self._bias, axis=1)
+    
+    def distances(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        """
+        标准化空间中到各质心的平方距离
+        
+        Args:
+            X: 特征矩阵
+        
+        Returns:
+            (n, k) 距离矩阵
+        """
+        X = self._to_matrix(X)
+        z = (X - self.mean.astype(np.float32)) / self.scale.astype(np.float32)
+        return np.maximum(np.sum(z ** 2, axis=1, keepdims=True) + X @ self._weights + self._bias, 0)
+    
+    def label_names(self, clusters: np.ndarray) -> List[str]:
+        """群组编号转群组名称"""
+        return [self.labels.get(int(c), f"群组{int(c)}") for c in clusters]
+    
+    def assign_chunks(
+        self,
+        chunks: Iterable[pd.DataFrame],
+        id_col: str = "customer_id"
+    ) -> Iterator[pd.DataFrame]:
+        """
+        流式分配群组
+        
+        Args:
+            chunks: 特征数据块迭代器
+            id_col: 客户 ID 列
+        
+        Yields:
+            每块的 (customer_id, cluster) 结果
+        """
+        for chunk in chunks:
+            yield pd.DataFrame({
+                id_col: chunk[id_col].to_numpy(),
+                "cluster": self.assign(chunk),
+            })
+    
+    def save(self, filepath: Union[str, Path]) -> Path:
+        """
+        保存为 .npz 文件
+        
+        Args:
+            filepath: 保存路径
+        
+        Returns:
+            保存的文件路径
+        """
+        filepath = Path(filepath)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        
+        label_ids = np.array(sorted(self.labels), dtype=np.int64)
+        np.savez(
+            filepath,
+            features=np.array(self.features),
+            mean=self.mean,
+            scale=self.scale,
+            centers=self.centers,
+            label_ids=label_ids,
+            label_names=np.array([self.labels[i] for i in label_ids]),
+        )
+        return filepath
+    
+    @classmethod
+    def load(cls, filepath: Union[str, Path]) -> "SegmentAssigner":
+        """
+        从 .npz 文件加载
+        
+        Args:
+            filepath: 文件路径
+        
+        Returns:
+            SegmentAssigner
+        """
+        with np.load(filepath, allow_pickle=False) as data:
+            return cls(
+                features=data["features"].tolist(),
+                mean=data["mean"],
+                scale=data["scale"],
+                centers=data["centers"],
+                labels=dict(zip(data["label_ids"].tolist(), data["label_names"].tolist())),
+            )
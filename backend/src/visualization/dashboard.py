@@ -16,6 +16,7 @@ class DashboardGenerator:
     def __init__(self, data_loader: DataLoader = None):
         self.loader = data_loader or DataLoader()
         self._df: Optional[pd.DataFrame] = None
+        self._clustering = None
     
     @property
     def df(self) -> pd.DataFrame:
@@ -25,8 +26,9 @@ class DashboardGenerator:
         return self._df
     
     def reload_data(self) -> None:
-        """重新加载数据"""
+        """重新加载数据（聚类模型随之重新读取）"""
         self._df = None
+        self._clustering = None
     
     def get_key_indicators(self) -> Dict[str, Any]:
         """
@@ -250,6 +252,50 @@ class DashboardGenerator:
         
         return df[occ_col].value_counts().head(10).to_dict()
     
+    def _load_clustering(self):
+        """懒加载已保存的聚类模型（加载后缓存，reload_data 时失效），尚未训练时返回 None"""
+        if self._clustering is None:
+            from ..config import settings
+            from ..models import CustomerClustering
+            
+            clustering = CustomerClustering()
+            model_path = settings.MODEL_DIR / f"{clustering.name}.pkl"
+            if model_path.exists():
+                self._clustering = clustering.load(model_path)
+        return self._clustering
+    
+    def get_cluster_profiles(self) -> Dict[int, Dict]:
+        """
+        获取客户分群画像（读取聚类模型中缓存的画像，不重新计算）
+        
+        Returns:
+            各群组画像字典，尚未训练聚类模型时返回空字典
+        """
+        clustering = self._load_clustering()
+        if clustering is None or "profile" not in clustering.metadata:
+            return {}
+        
+        return {
+            cluster_id: {
+                key: value if isinstance(value, (dict, str, int)) else float(value)
+                for key, value in profile.items()
+            }
+            for cluster_id, profile in clustering.get_cluster_profiles().items()
+        }
+    
+    def get_cluster_projection(self) -> List[Dict[str, Any]]:
+        """
+        获取聚类散点图数据（训练时预先计算的分层抽样二维坐标）
+        
+        Returns:
+            散点列表，尚未训练聚类模型时返回空列表
+        """
+        clustering = self._load_clustering()
+        if clustering is None or clustering.projection is None:
+            return []
+        
+        return clustering.get_projection_sample().round(4).to_dict("records")
+    
     def get_all_dashboard_data(self) -> Dict[str, Any]:
         """
         获取所有 Dashboard 数据
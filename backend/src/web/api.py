@@ -3,8 +3,13 @@ Web API 路由
 提供 RESTful API 接口
 """
 
+from typing import Optional
+
+import pandas as pd
 from flask import Blueprint, jsonify, request
 
+from ..config import settings
+from ..serving import ExplanationStore, RuleIndex, SegmentAssigner
 from ..visualization import DashboardGenerator
 
 api_bp = Blueprint("api", __name__, url_prefix="/api")
@@ -12,6 +17,15 @@ api_bp = Blueprint("api", __name__, url_prefix="/api")
 # 全局 Dashboard 生成器
 _dashboard: DashboardGenerator = None
 
+# 全局分群分配器
+_segment_assigner: SegmentAssigner = None
+
+# 全局产品推荐规则索引
+_rule_index: RuleIndex = None
+
+# 全局客户解释查询服务
+_explanation_service = None
+
 
 def get_dashboard() -> DashboardGenerator:
     """获取 Dashboard 生成器实例"""
@@ -21,6 +35,66 @@ def get_dashboard() -> DashboardGenerator:
     return _dashboard
 
 
+def get_segment_assigner() -> SegmentAssigner:
+    """获取分群分配器实例（从 models/saved 加载导出的质心文件）"""
+    global _segment_assigner
+    if _segment_assigner is None:
+        _segment_assigner = SegmentAssigner.load(
+            settings.MODEL_DIR / "customer_clustering_assigner.npz"
+        )
+    return _segment_assigner
+
+
+def get_rule_index() -> RuleIndex:
+    """获取产品推荐规则索引（从 models/saved 加载导出的规则文件）"""
+    global _rule_index
+    if _rule_index is None:
+        _rule_index = RuleIndex.load(settings.MODEL_DIR / "product_rule_index.npz")
+    return _rule_index
+
+
+def get_explanation_service():
+    """
+    获取客户解释查询服务
+    
+    加载高价值预测模型与 models/saved 下夜间生成的解释索引（不存在时只做现场计算）；
+    模型与 SHAP 依赖较重，首次调用时才导入
+    """
+    global _explanation_service
+    if _explanation_service is None:
+        from ..analysis import ExplanationService
+        from ..models import HighValuePredictor
+        
+        predictor = HighValuePredictor().load_model()
+        store_path = settings.MODEL_DIR / "customer_explanations.npz"
+        store = ExplanationStore.load(store_path) if store_path.exists() else None
+        
+        # 客户 ID → 行号索引只构建一次，重复 ID 取最后一行（与解释索引一致）
+        df = get_dashboard().df
+        row_of = pd.Series(range(len(df)), index=df["customer_id"].astype(str).to_numpy())
+        row_of = row_of[~row_of.index.duplicated(keep="last")]
+        
+        def load_features(customer_id: str) -> Optional[pd.DataFrame]:
+            pos = row_of.get(customer_id)
+            if pos is None:
+                return None
+            rows = df.iloc[[pos]]
+            features = predictor.feature_engineer.create_high_value_features(rows)
+            return features.reindex(columns=predictor.feature_names).fillna(0)
+        
+        _explanation_service = ExplanationService(
+            predictor.model,
+            predictor.feature_names,
+            store=store,
+            feature_loader=load_features,
+            predict=predictor.predict_proba,
+            top_n=settings.EXPLANATION_TOP_N,
+            cache_size=settings.EXPLANATION_CACHE_SIZE,
+            calibration=predictor.calibration_state()
+        )
+    return _explanation_service
+
+
 @api_bp.route("/indicators")
 def api_indicators():
     """核心指标卡片数据接口"""
@@ -101,6 +175,26 @@ def api_occupation():
         return jsonify({"error": str(e)}), 500
 
 
+@api_bp.route("/cluster_profiles")
+def api_cluster_profiles():
+    """客户分群画像接口"""
+    try:
+        data = get_dashboard().get_cluster_profiles()
+        return jsonify(data)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@api_bp.route("/cluster_projection")
+def api_cluster_projection():
+    """客户分群散点图接口"""
+    try:
+        data = get_dashboard().get_cluster_projection()
+        return jsonify(data)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @api_bp.route("/dashboard")
 def api_dashboard():
     """获取所有 Dashboard 数据"""
@@ -114,9 +208,77 @@ def api_dashboard():
 @api_bp.route("/reload", methods=["POST"])
 def api_reload():
     """重新加载数据"""
+    global _explanation_service, _segment_assigner
     try:
         get_dashboard().reload_data()
+        # 解释服务随数据一起重新加载（夜间重建的解释索引、LRU 缓存）
+        _explanation_service = None
+        # 分群分配器在下次请求时重新读取 run_clustering 导出的质心
+        _segment_assigner = None
         return jsonify({"status": "success", "message": "数据已重新加载"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+
+@api_bp.route("/segment", methods=["POST"])
+def api_segment():
+    """
+    客户分群实时分配接口
+    
+    请求体为单个客户的特征对象，或 {"customers": [...]} 形式的批量请求；
+    特征名与聚类模型一致（如 age, total_assets, monthly_income 等），缺少特征时返回 400
+    """
+    try:
+        payload = request.get_json(force=True) or {}
+        records = payload.get("customers", [payload])
+        
+        assigner = get_segment_assigner()
+        customers = pd.DataFrame.from_records(records)
+        missing = assigner.missing_features(customers)
+        if missing:
+            return jsonify({"error": f"缺少特征: {', '.join(missing)}", "missing": missing}), 400
+        clusters = assigner.assign(customers)
+        
+        ids = customers["customer_id"].tolist() if "customer_id" in customers.columns else [None] * len(customers)
+        results = [
+            {"customer_id": cid, "cluster": int(cluster), "label": label}
+            for cid, cluster, label in zip(ids, clusters, assigner.label_names(clusters))
+        ]
+        return jsonify({"results": results})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@api_bp.route("/recommend", methods=["POST"])
+def api_recommend():
+    """
+    产品推荐接口
+    
+    请求体: {"products": ["deposit_flag", ...], "top_n": 3}，
+    products 为客户当前持有的产品标志或产品名称
+    """
+    try:
+        payload = request.get_json(force=True) or {}
+        recommendations = get_rule_index().recommend(
+            payload.get("products", []),
+            top_n=payload.get("top_n")
+        )
+        return jsonify({"recommendations": recommendations})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@api_bp.route("/explain/<customer_id>")
+def api_explain(customer_id):
+    """
+    客户高价值预测解释接口
+    
+    优先返回夜间预计算的 Top-N 影响因素，未命中时现场计算该客户的单行 SHAP 值
+    """
+    try:
+        result = get_explanation_service().explain(customer_id)
+        if result is None:
+            return jsonify({"error": f"未找到客户: {customer_id}"}), 404
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
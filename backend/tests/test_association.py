@@ -0,0 +1,63 @@
+"""
+ProductAssociationAnalyzer 频繁项集挖掘测试
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from mlxtend.frequent_patterns import fpgrowth
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.analysis import ProductAssociationAnalyzer
+
+
+class WideCatalogAnalyzer(ProductAssociationAnalyzer):
+    """产品数超过位掩码上限的分析器"""
+    
+    PRODUCT_COLUMNS = [f"product_{j}_flag" for j in range(24)]
+    PRODUCT_NAMES = {}
+
+
+def _holdings(n: int = 3000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    rates = np.linspace(0.05, 0.6, len(WideCatalogAnalyzer.PRODUCT_COLUMNS))
+    # 前几个产品相关，保证存在多项的频繁项集
+    base = rng.random(n) < 0.4
+    flags = rng.random((n, len(rates))) < rates
+    flags[:, :4] |= base[:, None]
+    return pd.DataFrame(flags.astype(int), columns=WideCatalogAnalyzer.PRODUCT_COLUMNS)
+
+
+def _as_dict(itemsets: pd.DataFrame) -> dict:
+    return dict(zip(itemsets["itemsets"], itemsets["support"]))
+
+
+@pytest.mark.parametrize("engine", ["auto", "apriori", "fpgrowth"])
+def test_analyze_wide_catalog_matches_fpgrowth(engine):
+    df = _holdings()
+    analyzer = WideCatalogAnalyzer(min_support=0.05, min_lift=1.0, engine=engine)
+    assert len(analyzer.PRODUCT_COLUMNS) > analyzer.MAX_BITMASK_ITEMS
+    
+    itemsets, rules = analyzer.analyze(df)
+    expected = fpgrowth(df.astype(bool), min_support=0.05, use_colnames=True)
+    
+    actual, expected = _as_dict(itemsets), _as_dict(expected)
+    assert actual.keys() == expected.keys()
+    assert np.allclose([actual[k] for k in expected], list(expected.values()))
+    assert len(rules) > 0
+
+
+def test_weighted_basket_matches_per_customer_basket():
+    df = _holdings(seed=1)
+    analyzer = WideCatalogAnalyzer(min_support=0.05, engine="apriori")
+    
+    weighted = _as_dict(analyzer.find_frequent_itemsets(analyzer.prepare_data(df)))
+    per_customer = _as_dict(analyzer.find_frequent_itemsets(df[analyzer.PRODUCT_COLUMNS]))
+    
+    assert weighted.keys() == per_customer.keys()
+    assert np.allclose([weighted[k] for k in per_customer], list(per_customer.values()))
@@ -0,0 +1,46 @@
+"""
+CustomerClustering 增量分群测试
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.models import CustomerClustering
+
+
+def _features(n: int = 2000, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(scale=5, size=(4, len(CustomerClustering.DEFAULT_FEATURES)))
+    values = centers[rng.integers(0, 4, n)] + rng.normal(size=(n, centers.shape[1]))
+    return pd.DataFrame(values, columns=CustomerClustering.DEFAULT_FEATURES)
+
+
+def test_fit_incremental_removals_only():
+    X = _features()
+    ids = np.arange(len(X))
+    clustering = CustomerClustering(n_clusters=4)
+    clustering.fit(X)
+    snapshot = clustering.build_snapshot(X, ids)
+    
+    # 只移除客户，其余客户特征不变
+    keep = np.random.default_rng(1).random(len(X)) > 0.2
+    delta, new_snapshot = clustering.fit_incremental(X[keep], ids[keep], snapshot)
+    
+    assert clustering.metadata["incremental"]["mode"] == "incremental"
+    assert (delta["status"] == "移除").sum() == (~keep).sum()
+    
+    labels = new_snapshot["cluster"].to_numpy()
+    X_scaled = clustering.scaler.transform(X[keep])
+    expected = np.stack([X_scaled[labels == c].mean(axis=0) for c in range(4)])
+    np.testing.assert_allclose(clustering.model.cluster_centers_, expected)
+    
+    np.testing.assert_array_equal(clustering.model.labels_, labels)
+    inertia = np.sum((X_scaled - expected[labels]) ** 2)
+    assert np.isclose(clustering.model.inertia_, inertia)
+    assert np.isclose(clustering.evaluate(X_scaled)["inertia"], inertia)
@@ -0,0 +1,50 @@
+"""
+ModelExplainer 影响因素排序测试
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.analysis.explainer import _top_features
+
+
+def _sorted_top_features(values: np.ndarray, top_n: int):
+    """原实现：每行用 sorted() 按 |SHAP| 降序排序后取前 N 个"""
+    idx, vals = [], []
+    for row in values:
+        ranked = sorted(enumerate(row), key=lambda x: abs(x[1]), reverse=True)[:top_n]
+        idx.append([j for j, _ in ranked])
+        vals.append([v for _, v in ranked])
+    return np.array(idx, dtype=np.intp).reshape(len(values), -1), np.array(vals).reshape(len(values), -1)
+
+
+@pytest.mark.parametrize("top_n", [0, 1, 3, 5, 12, 20])
+@pytest.mark.parametrize("levels", [3, 7, None])
+def test_top_features_matches_sorted(top_n, levels):
+    rng = np.random.default_rng(top_n)
+    if levels is None:
+        values = rng.normal(size=(200, 12))
+    else:
+        # 取值很少，大量并列（含正负号相反的同绝对值）
+        values = rng.integers(-levels, levels + 1, size=(200, 12)).astype(float)
+    
+    idx, vals = _top_features(values, top_n)
+    expected_idx, expected_vals = _sorted_top_features(values, top_n)
+    
+    np.testing.assert_array_equal(idx, expected_idx)
+    np.testing.assert_array_equal(vals, expected_vals)
+
+
+def test_top_features_all_ties():
+    values = np.ones((4, 10))
+    values[:, ::2] = -1
+    
+    idx, _ = _top_features(values, 3)
+    
+    np.testing.assert_array_equal(idx, np.tile([0, 1, 2], (4, 1)))